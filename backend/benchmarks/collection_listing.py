@@ -0,0 +1,137 @@
+"""
+Benchmark of the collections listing.
+
+The script fills a SQLite database with many collections of a few articles
+each, then compares reading listing pages through the ORM (one lazy load of
+the articles per collection, the previous `get_collections`) with reading
+the `collection_listings` projection, and measures the incremental refresh
+done by each collection write.
+
+Usage (from the backend directory):
+    python -m benchmarks.collection_listing --collections 100000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import insert
+
+from src.api.api import COLLECTION_PER_PAGE, create_app
+from src.database.models import (
+    db,
+    Article,
+    Collection,
+    CollectionListing,
+    articles_collections,
+    refresh_collection_listings,
+)
+
+
+def timed(function, repeat):
+    """Returns the median duration of `function` over `repeat` calls, in ms."""
+    durations = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--collections", type=int, default=100_000)
+    parser.add_argument("--articles", type=int, default=10_000)
+    parser.add_argument("--per-collection", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.environ.setdefault("LOG_FILE", os.path.join(directory, "file.log"))
+    app = create_app(
+        {"SQLALCHEMY_DATABASE_URI": f"sqlite:///{directory}/listing.db"}
+    )
+    rng = random.Random(42)
+
+    with app.app_context():
+        db.session.execute(
+            insert(Article),
+            [
+                {"title": f"Article {n}", "content": "Content", "author": "bench"}
+                for n in range(args.articles)
+            ],
+        )
+        db.session.execute(
+            insert(Collection),
+            [
+                {"title": f"Collection {n}", "description": "Benchmark"}
+                for n in range(args.collections)
+            ],
+        )
+        article_ids = [article_id for (article_id,) in db.session.query(Article.id)]
+        collection_ids = [
+            collection_id for (collection_id,) in db.session.query(Collection.id)
+        ]
+        db.session.execute(
+            insert(articles_collections),
+            [
+                {"article_id": article_id, "collection_id": collection_id}
+                for collection_id in collection_ids
+                for article_id in rng.sample(article_ids, args.per_collection)
+            ],
+        )
+        started = time.perf_counter()
+        refresh_collection_listings()
+        db.session.commit()
+        full_refresh = time.perf_counter() - started
+
+        pages = args.collections // COLLECTION_PER_PAGE
+        first, middle, last = 1, max(pages // 2, 1), max(pages, 1)
+        print(
+            f"{args.collections} collections of {args.per_collection} articles, "
+            f"{COLLECTION_PER_PAGE} per page (median of {args.repeat})"
+        )
+        print(f"  full refresh of the projection : {full_refresh * 1000:8.0f} ms")
+        for page in (first, middle, last):
+
+            def orm_page():
+                collections = (
+                    Collection.query.order_by(Collection.id)
+                    .limit(COLLECTION_PER_PAGE)
+                    .offset((page - 1) * COLLECTION_PER_PAGE)
+                    .all()
+                )
+                return [collection.response() for collection in collections]
+
+            def listing_page():
+                return CollectionListing.page(page, COLLECTION_PER_PAGE)
+
+            orm = timed(orm_page, args.repeat)
+            listing = timed(listing_page, args.repeat)
+            print(
+                f"  page {page:4d}: ORM {orm:8.1f} ms, projection {listing:6.1f} ms "
+                f"({orm / listing:.0f}x)"
+            )
+
+        client = app.test_client()
+        http = timed(lambda: client.get(f"/api/collections?page={middle}"), args.repeat)
+        print(f"  GET /api/collections?page={middle}  : {http:8.1f} ms")
+
+        refreshes = []
+        for collection_id in rng.sample(collection_ids, 200):
+            started = time.perf_counter()
+            refresh_collection_listings([collection_id])
+            db.session.commit()
+            refreshes.append(time.perf_counter() - started)
+        print(
+            f"  incremental refresh per write  : "
+            f"{statistics.median(refreshes) * 1000:8.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
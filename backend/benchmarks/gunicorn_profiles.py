@@ -0,0 +1,175 @@
+"""
+Benchmark matrix of the gunicorn concurrency profiles.
+
+For each profile of `src/concurrency.py` the script starts gunicorn with
+`src/gunicorn_conf.py` against a throw-away SQLite database seeded with
+articles, drives it with keep-alive HTTP clients for a fixed duration and
+reports throughput and latency percentiles.
+
+SQLite keeps the benchmark self-contained but makes every query CPU-bound;
+point `--database-url` at PostgreSQL to see the profiles overlap database
+round trips.
+
+Usage (from the backend directory):
+    python benchmarks/gunicorn_profiles.py --clients 32 --duration 10
+"""
+
+import argparse
+import http.client
+import os
+import random
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILES = ("sync", "gthread", "gevent")
+
+
+def free_port():
+    """Returns a TCP port that is free on localhost."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(port, timeout=60):
+    """Blocks until the server answers HTTP requests."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            connection.request("GET", "/api/articles")
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("The server did not start")
+
+
+def seed(database_file, articles):
+    """Inserts `articles` demo articles directly into the SQLite database."""
+    with sqlite3.connect(database_file) as connection:
+        connection.executemany(
+            "INSERT INTO articles (title, content, author, version) "
+            "VALUES (?, ?, ?, 1)",
+            [
+                (f"Article {number}", "lorem ipsum " * 200, "bench")
+                for number in range(articles)
+            ],
+        )
+
+
+def client(port, paths, deadline, latencies, errors):
+    """Sends requests on one keep-alive connection until the deadline."""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            connection.request("GET", random.choice(paths))
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(repr(e))
+            connection.close()
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+
+
+def run_profile(name, args, env):
+    """Starts gunicorn with the profile and returns its measurements."""
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "src/gunicorn_conf.py"],
+        cwd=BACKEND_DIR,
+        env=dict(env, GUNICORN_PROFILE=name, PORT=str(port)),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_server(port)
+        paths = [f"/api/articles/{number}" for number in range(1, args.articles + 1)]
+        if args.include_listing:
+            paths.append("/api/articles")
+
+        latencies, errors = [], []
+        deadline = time.perf_counter() + args.duration
+        threads = [
+            threading.Thread(
+                target=client, args=(port, paths, deadline, latencies, errors)
+            )
+            for _ in range(args.clients)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    return {
+        "requests/s": len(latencies) / args.duration,
+        "p50 ms": statistics.median(latencies) * 1000,
+        "p99 ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "errors": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--articles", type=int, default=100)
+    parser.add_argument("--include-listing", action="store_true")
+    parser.add_argument("--database-url")
+    parser.add_argument("--profiles", nargs="+", default=PROFILES, choices=PROFILES)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="profiles-bench-")
+    env = dict(
+        os.environ,
+        JOB_WORKERS="0",
+        # Recycling drops keep-alive connections mid-run, keep it out of the numbers
+        GUNICORN_MAX_REQUESTS="0",
+        LOG_FILE=os.path.join(workdir, "file.log"),
+        DATABASE_URL=args.database_url or f"sqlite:///{workdir}/bench.db",
+    )
+    if args.database_url is None:
+        # Let the app create the schema once, then seed it
+        subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "from src.api.api import create_app; create_app()",
+            ],
+            cwd=BACKEND_DIR,
+            env=env,
+            check=True,
+        )
+        seed(os.path.join(workdir, "bench.db"), args.articles)
+
+    print(f"{args.clients} clients, {args.duration:.0f} s per profile")
+    print(
+        f"{'profile':<10}{'requests/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}"
+    )
+    for name in args.profiles:
+        result = run_profile(name, args, env)
+        print(
+            f"{name:<10}{result['requests/s']:>12.1f}{result['p50 ms']:>10.1f}"
+            f"{result['p99 ms']:>10.1f}{result['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark of the article revision history.
+
+The script edits one long article many times in an in-memory SQLite
+database, compacting the history after each edit like the background job
+does, then reports the storage used by the revisions compared to full
+copies, and the latency of rebuilding revisions.
+
+Usage (from the backend directory):
+    python -m benchmarks.revisions --edits 1000 --paragraphs 400
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from src.api.api import create_app
+from src.database.delta import compress
+from src.database.models import db, Article, ArticleRevision
+from src.database.revisions import (
+    SNAPSHOT_INTERVAL,
+    compact_revisions,
+    get_revision_content,
+)
+
+
+def paragraph(rng):
+    """Returns a random paragraph of Markdown-like text."""
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "blog", "water", "article"]
+    return " ".join(rng.choice(words) for _ in range(rng.randint(20, 60))) + "\n"
+
+
+def edit(content, rng):
+    """Applies a typical edit: rewrite, insert or delete a paragraph."""
+    lines = content.splitlines(keepends=True)
+    position = rng.randrange(len(lines))
+    action = rng.random()
+    if action < 0.6:
+        lines[position] = paragraph(rng)
+    elif action < 0.9 or len(lines) < 2:
+        lines.insert(position, paragraph(rng))
+    else:
+        del lines[position]
+    return "".join(lines)
+
+
+def percentile(values, fraction):
+    """Returns the value at `fraction` of the sorted values."""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--edits", type=int, default=1000)
+    parser.add_argument("--paragraphs", type=int, default=400)
+    parser.add_argument("--samples", type=int, default=500)
+    args = parser.parse_args()
+
+    os.environ.setdefault("LOG_FILE", os.path.join(tempfile.mkdtemp(), "file.log"))
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"})
+    rng = random.Random(42)
+
+    with app.app_context():
+        content = "".join(paragraph(rng) for _ in range(args.paragraphs))
+        article = Article(title="Long post", content=content, author="bench")
+        article.insert()
+        article_id = article.id
+
+        raw_bytes = len(content.encode("utf-8"))
+        compressed_bytes = len(compress(content))
+        compaction = []
+        for _ in range(args.edits):
+            content = edit(content, rng)
+            raw_bytes += len(content.encode("utf-8"))
+            compressed_bytes += len(compress(content))
+            Article.update_if_version(
+                article_id, None, title="Long post", content=content, author="bench"
+            )
+            started = time.perf_counter()
+            compact_revisions(article_id)
+            compaction.append(time.perf_counter() - started)
+
+        stored_bytes = (
+            db.session.query(db.func.sum(db.func.length(ArticleRevision.data)))
+            .filter(ArticleRevision.article_id == article_id)
+            .scalar()
+        )
+        revisions = args.edits + 1
+
+        latencies = []
+        for number in [rng.randint(1, revisions) for _ in range(args.samples)]:
+            started = time.perf_counter()
+            rebuilt = get_revision_content(article_id, number)
+            latencies.append(time.perf_counter() - started)
+            assert rebuilt is not None
+        assert get_revision_content(article_id, revisions) == content
+
+    print(f"{revisions} revisions of a {len(content) / 1024:.0f} KiB article,")
+    print(f"full snapshot every {SNAPSHOT_INTERVAL} revisions")
+    print(f"  full copies, raw        : {raw_bytes / 1024 / 1024:8.2f} MiB")
+    print(f"  full copies, compressed : {compressed_bytes / 1024 / 1024:8.2f} MiB")
+    print(
+        f"  deltas + snapshots      : {stored_bytes / 1024 / 1024:8.2f} MiB "
+        f"({raw_bytes / stored_bytes:.0f}x smaller than raw copies)"
+    )
+    print(
+        f"  rebuild latency         : p50 {statistics.median(latencies) * 1000:.2f} ms, "
+        f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms, "
+        f"max {max(latencies) * 1000:.2f} ms"
+    )
+    print(
+        f"  compaction per edit     : p50 {statistics.median(compaction) * 1000:.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Benchmark of idle Server-Sent Events connections held by one gunicorn worker.
+
+The script starts the API under a single gunicorn worker backed by a
+throw-away SQLite database, opens many `/api/events` streams that stay idle,
+and reports the resident memory of the worker before and after, i.e. the
+memory cost of one idle connection.
+
+Usage (from the backend directory, Linux only because RSS is read from /proc):
+    python benchmarks/sse_connections.py --connections 1000 --worker-class gevent
+"""
+
+import argparse
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def rss_kb(pid):
+    """Returns the resident set size of a process in kB."""
+    with open(f"/proc/{pid}/status", encoding="utf-8") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    raise RuntimeError(f"No VmRSS for pid {pid}")
+
+
+def worker_pid(master_pid, timeout=30):
+    """Returns the pid of the single worker forked by the gunicorn master."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat", encoding="utf-8") as stat:
+                    fields = stat.read().rsplit(")", 1)[1].split()
+            except OSError:
+                continue
+            if int(fields[1]) == master_pid:
+                return int(entry)
+        time.sleep(0.1)
+    raise RuntimeError("The gunicorn worker did not start")
+
+
+def wait_for_port(port, timeout=30):
+    """Blocks until the server accepts connections."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("The server did not start")
+
+
+def open_stream(port):
+    """Opens an SSE stream and returns its socket once the first message arrived."""
+    sock = socket.create_connection(("127.0.0.1", port), timeout=30)
+    sock.sendall(
+        b"GET /api/events HTTP/1.1\r\nHost: localhost\r\n"
+        b"Accept: text/event-stream\r\n\r\n"
+    )
+    received = b""
+    while b"retry:" not in received:
+        chunk = sock.recv(4096)
+        if not chunk:
+            raise RuntimeError("The stream was closed by the server")
+        received += chunk
+    if not received.startswith(b"HTTP/1.1 200"):
+        raise RuntimeError(received.split(b"\r\n", 1)[0].decode())
+    return sock
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--worker-class", default="gevent")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--settle", type=float, default=3.0)
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = min(hard, max(soft, args.connections * 2 + 256))
+    resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+
+    workdir = tempfile.mkdtemp(prefix="sse-bench-")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{workdir}/bench.db")
+    command = [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "--pythonpath",
+        BACKEND_DIR,
+        "--workers",
+        "1",
+        "--worker-class",
+        args.worker_class,
+        "--threads",
+        str(args.threads),
+        "--worker-connections",
+        str(args.connections + 100),
+        "--bind",
+        f"127.0.0.1:{args.port}",
+        "src.api.api:create_app()",
+    ]
+    server = subprocess.Popen(
+        command,
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    sockets = []
+    try:
+        wait_for_port(args.port)
+        pid = worker_pid(server.pid)
+
+        # The first stream starts the broadcaster thread, keep it out of the delta
+        sockets.append(open_stream(args.port))
+        time.sleep(args.settle)
+        baseline = rss_kb(pid)
+
+        started = time.perf_counter()
+        for _ in range(args.connections):
+            sockets.append(open_stream(args.port))
+        elapsed = time.perf_counter() - started
+        time.sleep(args.settle)
+        loaded = rss_kb(pid)
+
+        alive = sum(1 for sock in sockets[1:] if sock.fileno() != -1)
+        per_connection = (loaded - baseline) / args.connections
+        print(f"worker class          : {args.worker_class} (threads={args.threads})")
+        print(f"idle connections held : {alive}")
+        print(f"time to open all      : {elapsed:.2f} s")
+        print(f"worker RSS baseline   : {baseline / 1024:.1f} MiB")
+        print(f"worker RSS loaded     : {loaded / 1024:.1f} MiB")
+        print(f"memory per connection : {per_connection:.1f} kB")
+    finally:
+        for sock in sockets:
+            sock.close()
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Benchmark of the startup cost of the API.
+
+Two measurements are taken, each in fresh processes against a throw-away
+SQLite database:
+
+- in-process: the time to import `src.api.api`, to run `create_app()` and to
+  serve the first request through the test client;
+- gunicorn: the time from launching gunicorn until the first HTTP response,
+  with and without `--preload`, which is what autoscaling waits for.
+
+Usage (from the backend directory):
+    python benchmarks/startup.py --runs 5 --workers 4
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.request import urlopen
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IN_PROCESS = """
+import json, time
+started = time.perf_counter()
+from src.api.api import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+response = app.test_client().get("/api/articles")
+served = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({
+    "import": imported - started,
+    "create_app": created - imported,
+    "first_request": served - created,
+    "total": served - started,
+}))
+"""
+
+
+def in_process_run(env, workdir):
+    """Returns the phase timings of one fresh interpreter."""
+    output = subprocess.run(
+        [sys.executable, "-c", IN_PROCESS],
+        cwd=workdir,
+        env=dict(env, PYTHONPATH=BACKEND_DIR),
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def free_port():
+    """Returns a TCP port that is free on localhost."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def gunicorn_run(env, workdir, workers, preload):
+    """Returns the seconds from launching gunicorn to the first response."""
+    port = free_port()
+    command = [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "--pythonpath",
+        BACKEND_DIR,
+        "--workers",
+        str(workers),
+        "--bind",
+        f"127.0.0.1:{port}",
+    ]
+    if preload:
+        command.append("--preload")
+    command.append("src.api.api:create_app()")
+
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        command,
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                with urlopen(f"http://127.0.0.1:{port}/api/articles", timeout=5):
+                    return time.perf_counter() - started
+            except OSError:
+                if time.perf_counter() - started > 60:
+                    raise RuntimeError("gunicorn did not answer within 60 s")
+                time.sleep(0.01)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="startup-bench-")
+    env = dict(
+        os.environ, DATABASE_URL=f"sqlite:///{workdir}/bench.db", JOB_WORKERS="0"
+    )
+
+    print("in-process, median of", args.runs, "runs (ms)")
+    for label, create_all in (("DB_CREATE_ALL=1", "1"), ("DB_CREATE_ALL=0", "0")):
+        runs = [
+            in_process_run(dict(env, DB_CREATE_ALL=create_all), workdir)
+            for _ in range(args.runs)
+        ]
+        phases = {
+            phase: statistics.median(run[phase] for run in runs) * 1000
+            for phase in runs[0]
+        }
+        print(
+            f"  {label}: "
+            + ", ".join(f"{phase} {value:.1f}" for phase, value in phases.items())
+        )
+
+    print(f"gunicorn with {args.workers} workers, launch to first response (ms)")
+    for preload in (False, True):
+        runs = [
+            gunicorn_run(env, workdir, args.workers, preload) for _ in range(args.runs)
+        ]
+        label = "--preload" if preload else "no preload"
+        print(f"  {label}: median {statistics.median(runs) * 1000:.1f}")
+
+
+if __name__ == "__main__":
+    main()
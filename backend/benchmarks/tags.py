@@ -0,0 +1,119 @@
+"""
+Benchmark of the tag filters and facets of the articles listing.
+
+The script fills a SQLite database with many articles, each with a few tags
+drawn from a Zipf-like distribution (some tags are much more frequent than
+others), then measures `GET /api/articles` with and without tag filters,
+which also computes the facets of the filter, and the tag counts read from
+`Tag.article_count` against counting `article_tags`.
+
+Usage (from the backend directory):
+    python -m benchmarks.tags --articles 100000 --tags 500
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import func, insert, select
+
+from src.api.api import create_app
+from src.database.models import db, Article, Tag, article_tags
+from src.database.tags import refresh_tag_counts, tag_facets
+
+
+def timed(function, repeat):
+    """Returns the median duration of `function` over `repeat` calls, in ms."""
+    durations = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--articles", type=int, default=100_000)
+    parser.add_argument("--tags", type=int, default=500)
+    parser.add_argument("--per-article", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.environ.setdefault("LOG_FILE", os.path.join(directory, "file.log"))
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{directory}/tags.db"})
+    rng = random.Random(42)
+    names = [f"tag-{number}" for number in range(args.tags)]
+    weights = [1 / (rank + 1) for rank in range(args.tags)]
+
+    with app.app_context():
+        db.session.execute(
+            insert(Article),
+            [
+                {"title": f"Article {n}", "content": "Content", "author": "bench"}
+                for n in range(args.articles)
+            ],
+        )
+        db.session.execute(insert(Tag), [{"name": name} for name in names])
+        tag_ids = dict(db.session.execute(select(Tag.name, Tag.id)).all())
+        rows = set()
+        for (article_id,) in db.session.execute(select(Article.id)):
+            for name in rng.choices(names, weights, k=args.per_article):
+                rows.add((article_id, tag_ids[name]))
+        db.session.execute(
+            insert(article_tags),
+            [
+                {"article_id": article_id, "tag_id": tag_id}
+                for article_id, tag_id in rows
+            ],
+        )
+        refresh_tag_counts()
+        db.session.commit()
+
+        print(
+            f"{args.articles} articles, {args.tags} tags, {args.per_article} per "
+            f"article (median of {args.repeat})"
+        )
+        client = app.test_client()
+        for label, query in (
+            ("no filter", ""),
+            ("frequent tag", "?tags=tag-0"),
+            ("rare tag", f"?tags=tag-{args.tags - 1}"),
+            ("frequent AND frequent", "?tags=tag-0,tag-1"),
+            ("frequent AND rare", f"?tags=tag-0,tag-{args.tags - 1}"),
+            ("frequent OR frequent", "?tags=tag-0,tag-1&match=any"),
+        ):
+            matched = len(client.get(f"/api/articles{query}").get_json()["articles"])
+            duration = timed(lambda: client.get(f"/api/articles{query}"), args.repeat)
+            print(
+                f"  {label:22s}: {duration:7.1f} ms, {matched:4d} articles on the "
+                f"first page (/api/articles{query})"
+            )
+
+        def counted_facets():
+            count = func.count(article_tags.c.article_id)
+            return db.session.execute(
+                select(Tag.name, count)
+                .join(article_tags, article_tags.c.tag_id == Tag.id)
+                .group_by(Tag.id, Tag.name)
+                .order_by(count.desc())
+                .limit(20)
+            ).all()
+
+        print(
+            f"  facets from the precomputed counts    : "
+            f"{timed(tag_facets, args.repeat):7.2f} ms"
+        )
+        print(
+            f"  facets counted from article_tags      : "
+            f"{timed(counted_facets, args.repeat):7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Benchmark of the multi-tenant routing.
+
+The script runs the API in `database` mode on SQLite files, one per blog,
+and compares the latency of `GET /api/articles` with a single-blog
+deployment:
+- single: `TENANT_MODE=single`, no routing.
+- hot: every request for the same blog, its engine stays cached.
+- mixed: requests spread over all the blogs, more blogs than the engine LRU
+  holds, so engines are created and disposed along the way.
+
+It then creates articles from concurrent threads, each request for a random
+blog, and checks that every blog lists exactly its own articles and that a
+token issued for one blog is rejected by the others.
+
+Tokens are not verified by the benchmark: the bearer token is the name of
+the blog it was issued for.
+
+Usage (from the backend directory):
+    python -m benchmarks.tenants --tenants 50 --engines 16
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+parser.add_argument("--tenants", type=int, default=50)
+parser.add_argument("--engines", type=int, default=16)
+parser.add_argument("--requests", type=int, default=2000)
+parser.add_argument("--writes", type=int, default=1000)
+parser.add_argument("--threads", type=int, default=8)
+args = parser.parse_args()
+
+directory = tempfile.mkdtemp()
+# Read when the modules are imported
+os.environ["TENANT_ENGINES_MAX"] = str(args.engines)
+os.environ.setdefault("LOG_FILE", os.path.join(directory, "file.log"))
+
+import src.auth.auth as auth  # noqa: E402
+import src.database.tenants as tenants  # noqa: E402
+from src.api.api import create_app  # noqa: E402
+from src.database.models import create_tenant  # noqa: E402
+
+PERMISSIONS = ["post:articles"]
+auth.verify_decode_jwt = lambda token: {
+    "permissions": PERMISSIONS,
+    auth.TENANT_CLAIM: token,
+}
+
+
+def timed_requests(client, hosts):
+    """Returns the p50 and p99 latencies of GET /api/articles, in ms."""
+    durations = []
+    for host in hosts:
+        started = time.perf_counter()
+        res = client.get("/api/articles", headers={"Host": host})
+        durations.append(time.perf_counter() - started)
+        assert res.status_code == 200, res.get_json()
+    durations.sort()
+    return (
+        statistics.median(durations) * 1000,
+        durations[int(len(durations) * 0.99)] * 1000,
+    )
+
+
+def main():
+    rng = random.Random(42)
+    names = [f"blog_{number}" for number in range(args.tenants)]
+
+    os.environ["TENANT_MODE"] = "single"
+    single = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{directory}/single.db"})
+    single_latency = timed_requests(
+        single.test_client(), ["localhost"] * args.requests
+    )
+
+    os.environ.update(
+        {
+            "TENANT_MODE": "database",
+            "TENANT_HOST_SUFFIX": ".blogs.test",
+            "TENANT_DATABASE_URL": f"sqlite:///{directory}/{{tenant}}.db",
+        }
+    )
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{directory}/app.db"})
+    with app.app_context():
+        for name in names:
+            create_tenant(name)
+    client = app.test_client()
+
+    def host(name):
+        return f"{name.replace('_', '-')}.blogs.test"
+
+    hot = timed_requests(client, [host(names[0])] * args.requests)
+
+    engines_created = Counter()
+    create_engine = tenants._create_tenant_engine
+
+    def counted_create_engine(name):
+        engines_created[name] += 1
+        return create_engine(name)
+
+    tenants._create_tenant_engine = counted_create_engine
+    tenants.dispose_tenant_engines()
+    mixed = timed_requests(
+        client, [host(rng.choice(names)) for _ in range(args.requests)]
+    )
+
+    print(
+        f"GET /api/articles, {args.tenants} blogs, LRU of {args.engines} engines "
+        f"({args.requests} requests)"
+    )
+    for label, (p50, p99) in (
+        ("single", single_latency),
+        ("hot", hot),
+        ("mixed", mixed),
+    ):
+        print(f"  {label:6s}: p50 {p50:6.2f} ms, p99 {p99:6.2f} ms")
+    print(
+        f"  engines created by the mixed run: {sum(engines_created.values())}, "
+        f"cached at the end: {len(tenants._engines)}"
+    )
+    tenants._create_tenant_engine = create_engine
+
+    created = Counter()
+
+    def write(name):
+        res = client.post(
+            "/api/articles",
+            json={"title": f"Article of {name}", "content": "Content", "author": name},
+            headers={"Host": host(name), "Authorization": f"Bearer {name}"},
+        )
+        assert res.status_code == 200, res.get_json()
+        created[name] += 1
+
+    writes = [rng.choice(names) for _ in range(args.writes)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as pool:
+        list(pool.map(write, writes))
+    elapsed = time.perf_counter() - started
+    print(
+        f"  {args.writes} concurrent writes from {args.threads} threads: "
+        f"{args.writes / elapsed:6.0f} writes/s"
+    )
+
+    leaks = 0
+    for name in names:
+        res = client.get("/api/articles?count=exact", headers={"Host": host(name)})
+        data = res.get_json()
+        titles = {article["title"] for article in data["articles"]}
+        if data["total"] != created[name] or titles - {f"Article of {name}"}:
+            leaks += 1
+    print(f"  blogs listing foreign or missing articles: {leaks}")
+
+    other = names[1]
+    res = client.post(
+        "/api/articles",
+        json={"title": "Intruder", "content": "Content", "author": other},
+        headers={"Host": host(names[0]), "Authorization": f"Bearer {other}"},
+    )
+    print(f"  token of {other} on {names[0]}: {res.status_code}")
+
+
+if __name__ == "__main__":
+    main()
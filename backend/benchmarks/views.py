@@ -0,0 +1,163 @@
+"""
+Benchmark of the article view counters.
+
+The script fills a SQLite database with articles and compares the latency
+of `GET /api/articles/<id>`:
+- none: views are not counted.
+- coalesced: views are added up in memory (`ViewCounter`), the default.
+- per read: every read commits its own `UPDATE ... SET views = views + 1`.
+
+It runs the reads from one thread, then from several threads reading the
+same popular article, and measures one flush of views spread over many
+articles and the `?sort=popular` listing with and without its index.
+
+Usage (from the backend directory):
+    python -m benchmarks.views --articles 100000 --threads 8
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import insert, select, text
+
+from src.api.api import create_app
+from src.database.models import db, Article
+from src.database.views import flush_views
+
+
+def latencies(client, article_ids, threads):
+    """Returns the p50 and p99 latencies of reading articles, in ms, and the reads/s."""
+
+    def read(article_id):
+        started = time.perf_counter()
+        client.get(f"/api/articles/{article_id}")
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        durations = sorted(pool.map(read, article_ids))
+    elapsed = time.perf_counter() - started
+    return (
+        statistics.median(durations) * 1000,
+        durations[int(len(durations) * 0.99)] * 1000,
+        len(durations) / elapsed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--articles", type=int, default=100_000)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.environ.setdefault("LOG_FILE", os.path.join(directory, "file.log"))
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{directory}/views.db"})
+    rng = random.Random(42)
+    counter = app.extensions["view_counter"]
+    record = counter.record
+
+    def record_per_read(article_id):
+        with app.app_context():
+            flush_views({article_id: 1})
+            db.session.commit()
+
+    modes = {
+        "none": lambda article_id: None,
+        "coalesced": record,
+        "per read": record_per_read,
+    }
+
+    with app.app_context():
+        db.session.execute(
+            insert(Article),
+            [
+                {
+                    "title": f"Article {n}",
+                    "content": "Content",
+                    "author": "bench",
+                    "views": int(rng.paretovariate(1.2)),
+                }
+                for n in range(args.articles)
+            ],
+        )
+        # Statistics, as autovacuum keeps them on PostgreSQL: without them SQLite
+        # takes `deleted_at IS NULL` for selective and prefers its index
+        db.session.execute(text("ANALYZE"))
+        db.session.commit()
+
+    client = app.test_client()
+    spread = [rng.randint(1, args.articles) for _ in range(args.reads)]
+    popular = [1] * args.reads
+    # Warms up the page cache and the application before measuring
+    latencies(client, spread, 1)
+    print(f"GET /api/articles/<id>, {args.articles} articles, {args.reads} reads")
+    for label, article_ids, threads in (
+        ("1 thread, random articles", spread, 1),
+        (f"{args.threads} threads, one article", popular, args.threads),
+    ):
+        print(f"  {label}")
+        for mode, function in modes.items():
+            counter.record = function
+            p50, p99, throughput = latencies(client, article_ids, threads)
+            print(
+                f"    {mode:10s}: p50 {p50:6.2f} ms, p99 {p99:6.2f} ms, "
+                f"{throughput:6.0f} reads/s"
+            )
+    counter.record = record
+    counter.flush()
+
+    for articles in (100, 1000, 10_000):
+        deltas = {
+            article_id: rng.randint(1, 5)
+            for article_id in rng.sample(range(1, args.articles + 1), articles)
+        }
+        started = time.perf_counter()
+        with app.app_context():
+            flush_views(deltas)
+            db.session.commit()
+        print(
+            f"  flush of {articles:5d} articles: "
+            f"{(time.perf_counter() - started) * 1000:7.1f} ms"
+        )
+
+    def popular_page():
+        """Returns the query plan and median duration of the popular listing."""
+        durations = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            client.get("/api/articles?sort=popular&count=none")
+            durations.append(time.perf_counter() - started)
+        with app.app_context():
+            query = (
+                select(Article.id)
+                .where(Article.deleted_at.is_(None))
+                .order_by(Article.views.desc(), Article.id)
+                .limit(10)
+            )
+            plan = db.session.execute(
+                text(f"EXPLAIN QUERY PLAN {query}"), {"param_1": 10}
+            ).all()
+        return statistics.median(durations) * 1000, [row[-1] for row in plan]
+
+    for label in ("with the index", "without the index"):
+        if label == "without the index":
+            with app.app_context():
+                db.session.execute(text("DROP INDEX ix_articles_popular"))
+                db.session.commit()
+        duration, plan = popular_page()
+        print(
+            f"  GET /api/articles?sort=popular {label:17s}: {duration:6.2f} ms, "
+            f"{'; '.join(plan)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
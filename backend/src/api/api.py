@@ -13,7 +13,12 @@ and configure the necessary
 environment settings for the database connection and authentication.
 """
 
-from flask import Flask, request, jsonify, abort
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import click
+from flask import Flask, Response, request, jsonify, abort, stream_with_context
 from flask_cors import CORS
 from sqlalchemy.exc import SQLAlchemyError
 from loguru import logger
@@ -24,14 +29,214 @@ from src.database.models import (
     db_drop_and_create_all,
     Article,
     Collection,
+    CollectionListing,
+    ChangeEvent,
+    ArticleRevision,
+    Tag,
+    Tenant,
+    activate_tenant,
+    articles_collections,
+    create_tenant,
+    load_renderings,
+    load_tags,
+    refresh_collection_listings,
+)
+from src.database.counts import COUNT_MODES, count_rows
+from src.database.migrations import upgrade_db
+from src.database.purge import purge_deleted_articles, purge_unused_renderings
+from src.database.tags import (
+    TAG_FILTER_MAX,
+    TAG_MATCHES,
+    parse_tags,
+    refresh_tag_counts,
+    tag_facets,
+    tagged_article_ids,
 )
+from src.database.revisions import get_revision_content
+from src.database.views import ViewCounter
+from src.jobs.queue import JobWorkerPool, JOB_WORKERS, enqueue, queue_stats
+from src.jobs.tasks import register_tasks
 from src.auth.auth import requires_auth
+from src.settings import getenv
+from src.api.events import (
+    ChangeBroadcaster,
+    EVENTS_BUSY_RETRY_AFTER,
+    stream_changes,
+)
+from src.concurrency import max_event_streams
+from src.database.tenants import (
+    NoTenantSelected,
+    current_tenant,
+    multi_tenant,
+    set_tenant,
+    tenant_context,
+    tenant_from_host,
+    valid_tenant_name,
+)
 
-logger.add("file.log", format="{time} - {level} - {message}")
 
 ARTICLES_PER_PAGE = 1000
+ARTICLE_SORTS = ("id", "popular")
 COLLECTION_PER_PAGE = 1000
 
+CHANGES_PER_PAGE = 500
+CHANGES_MAX_WAIT = 30
+# Days the outbox entries are kept, see `flask prune-changes`
+CHANGES_RETENTION_DAYS = float(getenv("CHANGES_RETENTION_DAYS", "7"))
+
+
+_log_sink = None
+
+
+def configure_logging():
+    """Adds the log file sink, once per process, when the first app is created."""
+    global _log_sink
+    if _log_sink is None:
+        _log_sink = logger.add(
+            getenv("LOG_FILE", "file.log"), format="{time} - {level} - {message}"
+        )
+
+
+def if_match_version():
+    """
+    Reads the version expected by the client from the `If-Match` header.
+
+    Returns:
+        int: The expected version, or None when the header is missing or `*`.
+    """
+    if not request.if_match or request.if_match.star_tag:
+        return None
+
+    etags = request.if_match.as_set(include_weak=True)
+    if len(etags) != 1:
+        abort(422, description="If-Match must hold a single version")
+    try:
+        return int(etags.pop())
+    except ValueError:
+        abort(422, description="If-Match must hold a version number")
+
+
+def page_number():
+    """
+    Returns the page requested with the `page` query parameter.
+
+    Returns:
+        int: The page number, 1 (the default) or more.
+    """
+    page = request.args.get("page", 1, type=int)
+    if page < 1:
+        abort(422, description="page must be 1 or more")
+    return page
+
+
+def count_mode():
+    """
+    Returns the count mode requested with the `count` query parameter.
+
+    Returns:
+        str: "none" (the default), "exact" or "estimate".
+    """
+    mode = request.args.get("count", "none")
+    if mode not in COUNT_MODES:
+        abort(422, description=f"count must be one of {', '.join(COUNT_MODES)}")
+    return mode
+
+
+def article_sort():
+    """
+    Returns the order requested with the `sort` query parameter.
+
+    Returns:
+        str: "id" (the default) or "popular", the most viewed first.
+    """
+    sort = request.args.get("sort", "id")
+    if sort not in ARTICLE_SORTS:
+        abort(422, description=f"sort must be one of {', '.join(ARTICLE_SORTS)}")
+    return sort
+
+
+def tag_filter():
+    """
+    Returns the tag filter requested with the `tags` and `match` query parameters.
+
+    Returns:
+        tuple: The normalized tag names, None without a filter, and the match
+            mode, "all" (the default) or "any".
+    """
+    match = request.args.get("match", "all")
+    if match not in TAG_MATCHES:
+        abort(422, description=f"match must be one of {', '.join(TAG_MATCHES)}")
+    value = request.args.get("tags")
+    if value is None:
+        return None, match
+    try:
+        names = parse_tags(value.split(","))
+    except ValueError as e:
+        abort(422, description=str(e))
+    if len(names) > TAG_FILTER_MAX:
+        abort(422, description=f"Filter on at most {TAG_FILTER_MAX} tags")
+    return names, match
+
+
+def body_tags(body):
+    """
+    Returns the normalized `tags` of a request body.
+
+    Returns:
+        list: The tag names, or None when the body has no `tags`.
+    """
+    tags = body.get("tags")
+    if tags is None:
+        return None
+    if not isinstance(tags, list):
+        abort(422, description="tags must be a list of names")
+    try:
+        return parse_tags(tags)
+    except ValueError as e:
+        abort(422, description=str(e))
+
+
+def body_article_ids(body):
+    """
+    Returns the `article_ids` of a request body.
+
+    Returns:
+        list: The article IDs, or None when the body has no `article_ids`.
+    """
+    article_ids = body.get("article_ids")
+    if article_ids is None:
+        return None
+    if not isinstance(article_ids, list) or not all(
+        isinstance(article_id, int) for article_id in article_ids
+    ):
+        abort(422, description="article_ids must be a list of article IDs")
+    return article_ids
+
+
+def each_tenant():
+    """
+    Selects every hosted blog in turn, for maintenance commands.
+
+    Yields:
+        str: The name of the selected blog, or None once for a single blog.
+    """
+    if not multi_tenant():
+        yield None
+        return
+    names = [name for (name,) in db.session.query(Tenant.name).order_by(Tenant.name)]
+    for name in names:
+        with tenant_context(name):
+            yield name
+        # Never let the identity map of one blog leak into the next
+        db.session.remove()
+
+
+def versioned_response(body, version):
+    """Returns a JSON response carrying `version` as its ETag."""
+    response = jsonify(body)
+    response.set_etag(str(version))
+    return response
+
 
 def create_app(test_config=None):
     """
@@ -48,45 +253,227 @@ def create_app(test_config=None):
     Returns:
         Flask: The configured Flask application instance.
     """
+    configure_logging()
+    register_tasks()
     app = Flask(__name__)
-    CORS(app)
+    CORS(app, expose_headers=["ETag"])
 
     if test_config is None:
         setup_db(app)
+        if JOB_WORKERS > 0:
+            job_pool = JobWorkerPool(app)
+            app.extensions["job_pool"] = job_pool
+
+            @app.before_request
+            def start_job_workers():
+                # Started lazily so that no thread runs in a preloading master
+                job_pool.ensure_started()
     else:
         database_path = test_config.get("SQLALCHEMY_DATABASE_URI")
         setup_db(app, db_path=database_path)
         with app.app_context():
             db_drop_and_create_all()
 
+    view_counter = ViewCounter(app)
+    app.extensions["view_counter"] = view_counter
+
+    # One broadcaster per blog, created by its first subscriber
+    broadcasters = {}
+    broadcasters_lock = threading.Lock()
+    app.extensions["change_broadcasters"] = broadcasters
+
+    def change_broadcaster():
+        """Returns the broadcaster of the blog of the request."""
+        tenant = current_tenant()
+        if tenant is None and multi_tenant():
+            # Its polling thread would never read a head to wait on
+            raise NoTenantSelected("No tenant selected to stream the changes of")
+        with broadcasters_lock:
+            if tenant not in broadcasters:
+                broadcasters[tenant] = ChangeBroadcaster(app, tenant=tenant)
+            return broadcasters[tenant]
+
+    # Streams hold a request thread each, except under gevent
+    stream_limit = max_event_streams()
+    stream_slots = (
+        None if stream_limit is None else threading.BoundedSemaphore(stream_limit)
+    )
+
+    if multi_tenant():
+
+        @app.before_request
+        def select_tenant():
+            """Selects the blog named by the host, if any."""
+            set_tenant(None)
+            tenant = tenant_from_host(request.host)
+            if tenant is not None and not activate_tenant(tenant):
+                abort(404, description=f"Blog {tenant} not found")
+
+        @app.teardown_request
+        def clear_tenant(error):
+            # Worker threads serve many requests, for different blogs
+            set_tenant(None)
+
+    @app.cli.command("create-tenant")
+    @click.argument("name")
+    def create_tenant_command(name):
+        """Register a blog and create its tables (multi-tenant mode)."""
+        if not multi_tenant():
+            raise click.UsageError("TENANT_MODE is single, there is one blog")
+        if not valid_tenant_name(name):
+            raise click.BadParameter(
+                "lowercase letters, digits and underscores, starting with a letter"
+            )
+        create_tenant(name)
+        logger.info(f"Created tenant {name}")
+
+    @app.cli.command("upgrade-db")
+    def upgrade_db_command():
+        """Add the tables, columns and indexes an existing database lacks."""
+        if multi_tenant():
+            # The tenant registry and the job queue, shared by every blog
+            created = upgrade_db()
+            logger.info(f"Upgraded the shared tables, created {created}")
+        for tenant in each_tenant():
+            created = upgrade_db()
+            logger.info(f"Upgraded the database ({tenant}), created {created}")
+
+    @app.cli.command("purge-articles")
+    def purge_articles():
+        """Remove soft-deleted articles and their collection memberships."""
+        for tenant in each_tenant():
+            purged = purge_deleted_articles()
+            logger.info(f"Purged {purged} soft-deleted articles ({tenant})")
+            purged = purge_unused_renderings()
+            logger.info(f"Purged {purged} unused renderings ({tenant})")
+
+    @app.cli.command("refresh-listings")
+    def refresh_listings():
+        """Rebuild the listing rows of every collection."""
+        for tenant in each_tenant():
+            refresh_collection_listings()
+            db.session.commit()
+            logger.info(f"Refreshed the collection listings ({tenant})")
+
+    @app.cli.command("refresh-tag-counts")
+    def refresh_tag_counts_command():
+        """Recompute the article counts of every tag."""
+        for tenant in each_tenant():
+            refresh_tag_counts()
+            db.session.commit()
+            logger.info(f"Refreshed the tag counts ({tenant})")
+
+    @app.cli.command("prune-changes")
+    @click.option(
+        "--days",
+        type=float,
+        default=CHANGES_RETENTION_DAYS,
+        show_default=True,
+        help="Keep the changes of the last DAYS days.",
+    )
+    def prune_changes(days):
+        """Delete the change feed entries older than the retention window."""
+        before = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+        for tenant in each_tenant():
+            pruned = ChangeEvent.prune(before)
+            logger.info(f"Pruned {pruned} change feed entries ({tenant})")
+
+    @app.cli.command("jobs-worker")
+    def jobs_worker():
+        """Run the background job workers in the foreground (sidecar mode)."""
+        pool = JobWorkerPool(app, concurrency=max(JOB_WORKERS, 1))
+        pool.start()
+        logger.info(f"Running {pool.concurrency} job workers")
+        try:
+            while True:
+                time.sleep(60)
+                logger.info(f"Job queue: {queue_stats()}")
+        except KeyboardInterrupt:
+            pool.stop()
+
+    @app.cli.command("jobs-stats")
+    def jobs_stats():
+        """Print the depth of the background job queue."""
+        print(queue_stats())
+
     @app.route("/api/articles", methods=["GET"])
     def get_articles():
         """
         Retrieve a paginated list of articles.
 
+        Every article comes with the excerpt and the reading time of its
+        content, read from the rendering cache, and with its tags. The
+        `facets` are the most frequent tags among the articles of the filter.
+        `last_seq` is the change feed cursor to stream the changes after the
+        listing from (`/api/events?since=`).
+
         Query parameters:
             page (int): The page number for pagination (default is 1).
+            count (str): "none" (default), "exact" or "estimate", how the
+                `total` number of articles is computed, if at all.
+            tags (str): Comma-separated tag names to filter the articles on.
+            match (str): "all" (default) for the articles having every tag,
+                "any" for the articles having at least one.
+            sort (str): "id" (default), or "popular" for the most viewed
+                articles first.
 
         Returns:
-            tuple: A JSON response containing a success status and the list of articles.
+            tuple: A JSON response containing a success status, the list of
+                articles, the tag facets and the change feed cursor.
         """
-        page = request.args.get("page", 1)
-        articles = Article.query.paginate(page=page, per_page=ARTICLES_PER_PAGE).items
+        page = page_number()
+        mode = count_mode()
+        tags, match = tag_filter()
+        sort = article_sort()
+        # Read before the listing: the changes after it may already be in the
+        # listing, which replaying them leaves as is, but none is missed
+        last_seq = ChangeEvent.head()
+
+        if sort == "popular":
+            query = Article.query.order_by(Article.views.desc(), Article.id)
+        else:
+            query = Article.query.order_by(Article.id)
+        matching = db.select(Article.id).where(Article.deleted_at.is_(None))
+        count_key = "articles"
+        if tags is not None:
+            tagged = tagged_article_ids(tags, match)
+            query = query.filter(Article.id.in_(tagged))
+            matching = matching.where(Article.id.in_(tagged))
+            count_key = f"articles:{match}:{','.join(sorted(tags))}"
+
+        # Past the last page is an empty page, as for the collections
+        articles = query.paginate(
+            page=page, per_page=ARTICLES_PER_PAGE, count=False, error_out=False
+        ).items
+        renderings = load_renderings(articles)
+        article_tags = load_tags(articles)
 
-        return (
-            jsonify(
+        body = {
+            "success": True,
+            "articles": [
                 {
-                    "success": True,
-                    "articles": [article.response() for article in articles],
+                    **article.response(),
+                    **renderings[article.id].response(),
+                    "tags": article_tags[article.id],
                 }
-            ),
-            200,
-        )
+                for article in articles
+            ],
+            "facets": tag_facets(matching if tags is not None else None),
+            "last_seq": last_seq,
+        }
+        if mode != "none":
+            body["count"] = mode
+            body["total"] = count_rows(matching, mode, count_key)
+        return jsonify(body), 200
 
     @app.route("/api/articles/<int:article_id>", methods=["GET"])
     def get_article(article_id):
         """
-        Retrieve a specific article by its ID.
+        Retrieve a specific article by its ID, counting one view of it.
+
+        Query parameters:
+            format (str): "html" to also get the content rendered to sanitized
+                HTML, as `content_html`.
 
         Parameters:
             article_id (int): The ID of the article to retrieve.
@@ -98,8 +485,23 @@ def create_app(test_config=None):
         if article is None:
             abort(404, description=f"ID {article_id} not found")
 
+        view_counter.record(article_id)
+        rendering = load_renderings([article])[article.id]
+        tags = load_tags([article])[article.id]
+        html = request.args.get("format") == "html"
+
         return (
-            jsonify({"success": True, "article": article.response()}),
+            versioned_response(
+                {
+                    "success": True,
+                    "article": {
+                        **article.response(),
+                        **rendering.response(html),
+                        "tags": tags,
+                    },
+                },
+                article.version,
+            ),
             200,
         )
 
@@ -107,7 +509,7 @@ def create_app(test_config=None):
     @requires_auth(permission="post:articles")
     def create_article():
         """
-        Create a new article.
+        Create a new article, with the optional list of `tags` of the body.
 
         Returns:
             tuple: A JSON response containing a success status and the ID of the created article.
@@ -121,11 +523,12 @@ def create_app(test_config=None):
 
         if not title or not content or not author:
             abort(422)
+        tags = body_tags(body) or []
 
         article = Article(title=title, content=content, author=author)
 
         try:
-            article.insert()
+            article.insert(tags)
         except SQLAlchemyError as e:
             db.session.rollback()
             logger.error(f"Error trying to insert a new article, {e}")
@@ -142,11 +545,16 @@ def create_app(test_config=None):
         """
         Update an existing article.
 
+        When the `If-Match` header holds the version the client read, the
+        update only applies if nobody modified the article in the meantime.
+        The tags are replaced when the body has `tags`.
+
         Parameters:
             article_id (int): The ID of the article to update.
 
         Returns:
-            tuple: A JSON response containing a success status and the ID of the updated article.
+            tuple: A JSON response containing a success status, the ID and the
+                new version of the updated article.
         """
         body = request.get_json()
         logger.info(f"Body of the article request: {body}")
@@ -160,17 +568,19 @@ def create_app(test_config=None):
                 422,
                 description="The body must have the three attributes title, content, and author",
             )
+        tags = body_tags(body)
 
-        article = Article.query.filter(Article.id == article_id).one_or_none()
-        if article is None:
-            abort(404, description=f"ID {article_id} not found")
-
-        article.title = title
-        article.content = content
-        article.author = author
+        expected_version = if_match_version()
 
         try:
-            article.update()
+            version = Article.update_if_version(
+                article_id,
+                expected_version,
+                tags=tags,
+                title=title,
+                content=content,
+                author=author,
+            )
         except SQLAlchemyError as e:
             db.session.rollback()
             logger.error(f"Error trying to update an existing article, {e}")
@@ -178,7 +588,26 @@ def create_app(test_config=None):
         finally:
             db.session.close()
 
-        return jsonify({"success": True, "id": article_id}), 200
+        if version is None:
+            # Only the failure path pays for telling a conflict from a miss
+            exists = Article.query.filter(Article.id == article_id).count()
+            if expected_version is not None and exists:
+                abort(412, description=f"Article ID {article_id} was modified")
+            abort(404, description=f"ID {article_id} not found")
+
+        try:
+            enqueue("compact_revisions", article_id=article_id)
+        except SQLAlchemyError as e:
+            # The revision stays a full copy until the next edit compacts it
+            db.session.rollback()
+            logger.error(f"Error trying to enqueue the compaction of revisions, {e}")
+
+        return (
+            versioned_response(
+                {"success": True, "id": article_id, "version": version}, version
+            ),
+            200,
+        )
 
     @app.route("/api/articles/<int:article_id>", methods=["DELETE"])
     @requires_auth(permission="delete:articles")
@@ -186,6 +615,9 @@ def create_app(test_config=None):
         """
         Delete an article by its ID.
 
+        The article is soft-deleted and disappears from every read route at
+        once; its collection memberships are purged in the background.
+
         Parameters:
             article_id (int): The ID of the article to delete.
 
@@ -198,41 +630,131 @@ def create_app(test_config=None):
             abort(404, description=f"Article ID {article_id} not found")
 
         try:
-            article.delete()
+            deleted = article.delete()
         except SQLAlchemyError as e:
             logger.error(f"Error trying to delete an existing article, {e}")
             abort(500, description="Error deleting article.")
+        if not deleted:
+            # Deleted by a concurrent request since it was read
+            abort(404, description=f"Article ID {article_id} not found")
+
+        try:
+            enqueue("purge_article", article_id=article_id)
+        except SQLAlchemyError as e:
+            # The article is already hidden, `flask purge-articles` catches up
+            db.session.rollback()
+            logger.error(f"Error trying to enqueue the purge of an article, {e}")
 
         return jsonify({"success": True, "delete": article_id}), 200
 
-    @app.route("/api/collections", methods=["GET"])
-    def get_collections():
+    @app.route("/api/articles/<int:article_id>/revisions", methods=["GET"])
+    def get_article_revisions(article_id):
         """
-        Retrieve a paginated list of collections.
+        Retrieve the revision history of an article, without contents.
 
-        Query parameters:
-            page (int): The page number for pagination (default is 1).
+        Parameters:
+            article_id (int): The ID of the article.
 
         Returns:
-            tuple: A JSON response containing a success status and the list of collections.
+            tuple: A JSON response containing a success status and the revisions,
+                oldest first.
         """
-        page = request.args.get("page", 1)
-        collections = Collection.query.paginate(
-            page=page, per_page=COLLECTION_PER_PAGE
-        ).items
+        article = Article.query.filter(Article.id == article_id).one_or_none()
+        if article is None:
+            abort(404, description=f"ID {article_id} not found")
 
         return (
             jsonify(
                 {
                     "success": True,
-                    "collections": [
-                        collection.response() for collection in collections
+                    "revisions": [
+                        revision.response() for revision in article.revisions
                     ],
                 }
             ),
             200,
         )
 
+    @app.route(
+        "/api/articles/<int:article_id>/revisions/<int:number>", methods=["GET"]
+    )
+    def get_article_revision(article_id, number):
+        """
+        Retrieve one revision of an article, with its content.
+
+        Parameters:
+            article_id (int): The ID of the article.
+            number (int): The revision number, i.e. the version of the article.
+
+        Returns:
+            tuple: A JSON response containing a success status and the revision.
+        """
+        article = Article.query.filter(Article.id == article_id).one_or_none()
+        if article is None:
+            abort(404, description=f"ID {article_id} not found")
+
+        revision = ArticleRevision.query.filter(
+            ArticleRevision.article_id == article_id,
+            ArticleRevision.number == number,
+        ).one_or_none()
+        content = get_revision_content(article_id, number)
+        if revision is None or content is None:
+            abort(404, description=f"Revision {number} of ID {article_id} not found")
+
+        return (
+            jsonify(
+                {
+                    "success": True,
+                    "revision": {**revision.response(), "content": content},
+                }
+            ),
+            200,
+        )
+
+    @app.route("/api/tags", methods=["GET"])
+    def get_tags():
+        """
+        Retrieve the tags of at least one article, with their article counts.
+
+        Returns:
+            tuple: A JSON response containing a success status and the tags,
+                by name.
+        """
+        tags = Tag.query.filter(Tag.article_count > 0).order_by(Tag.name).all()
+        return jsonify({"success": True, "tags": [tag.response() for tag in tags]}), 200
+
+    @app.route("/api/collections", methods=["GET"])
+    def get_collections():
+        """
+        Retrieve a paginated list of collections.
+
+        Collections are read from the `collection_listings` projection, one
+        precomputed row per collection, instead of loading the articles of
+        every collection. `last_seq` is the change feed cursor of the listing,
+        as for the articles.
+
+        Query parameters:
+            page (int): The page number for pagination (default is 1).
+            count (str): "none" (default), "exact" or "estimate", how the
+                `total` number of collections is computed, if at all.
+
+        Returns:
+            tuple: A JSON response containing a success status, the list of
+                collections and the change feed cursor.
+        """
+        page = page_number()
+        mode = count_mode()
+        last_seq = ChangeEvent.head()
+        collections = CollectionListing.page(page, COLLECTION_PER_PAGE)
+
+        body = {"success": True, "collections": collections, "last_seq": last_seq}
+        if mode != "none":
+            body["count"] = mode
+            body["total"] = count_rows(
+                db.select(CollectionListing.collection_id), mode, "collections"
+            )
+        return jsonify(body), 200
+
     @app.route("/api/collections/<int:collection_id>", methods=["GET"])
     def get_collection(collection_id):
         """
@@ -251,7 +773,10 @@ def create_app(test_config=None):
             abort(404, description=f"ID {collection_id} not found")
 
         return (
-            jsonify({"success": True, "collection": collection.response()}),
+            versioned_response(
+                {"success": True, "collection": collection.response()},
+                collection.version,
+            ),
             200,
         )
 
@@ -269,7 +794,7 @@ def create_app(test_config=None):
 
         title = body.get("title")
         description = body.get("description")
-        article_ids = body.get("article_ids")
+        article_ids = body_article_ids(body)
 
         if not title or not description:
             abort(
@@ -279,9 +804,11 @@ def create_app(test_config=None):
 
         collection = Collection(title=title, description=description)
 
-        # Fetching the articles of the collection
+        # Fetching the articles of the collection, in the requested order
         if article_ids is not None:
             articles = Article.query.filter(Article.id.in_(article_ids)).all()
+            order = {article_id: index for index, article_id in enumerate(article_ids)}
+            articles.sort(key=lambda article: order[article.id])
             collection.articles.extend(articles)
         try:
             collection.insert()
@@ -301,45 +828,127 @@ def create_app(test_config=None):
         """
         Update an existing collection.
 
+        When the `If-Match` header holds the version the client read, the
+        update only applies if nobody modified the collection in the meantime.
+
         Parameters:
             collection_id (int): The ID of the collection to update.
 
         Returns:
-            tuple: A JSON response containing a success status and the ID of the updated collection.
+            tuple: A JSON response containing a success status, the ID and the
+                new version of the updated collection.
         """
         body = request.get_json()
         logger.info(f"Body of the collection request: {body}")
 
         title = body.get("title")
         description = body.get("description")
-        article_ids = body.get("article_ids")
+        article_ids = body_article_ids(body)
 
         if not title or not description:
             abort(422)
 
-        collection = Collection.query.filter(
-            Collection.id == collection_id
-        ).one_or_none()
-        if collection is None:
+        expected_version = if_match_version()
+
+        try:
+            version = Collection.update_if_version(
+                collection_id,
+                expected_version,
+                article_ids,
+                title=title,
+                description=description,
+            )
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error(f"Error trying to update an existing collection, {e}")
+            abort(500, description="Error updating collection.")
+        finally:
+            db.session.close()
+
+        if version is None:
+            # Only the failure path pays for telling a conflict from a miss
+            exists = Collection.query.filter(Collection.id == collection_id).count()
+            if expected_version is not None and exists:
+                abort(412, description=f"Collection ID {collection_id} was modified")
             abort(404, description=f"ID {collection_id} not found")
 
-        # Fetching the articles of the collection
-        articles = Article.query.filter(Article.id.in_(article_ids)).all()
+        return (
+            versioned_response(
+                {"success": True, "id": collection_id, "version": version}, version
+            ),
+            200,
+        )
+
+    @app.route("/api/collections/<int:collection_id>/order", methods=["PATCH"])
+    @requires_auth(permission="patch:collections")
+    def order_collection(collection_id):
+        """
+        Move one article of a collection.
+
+        The article is placed right after `after_id`, or first when `after_id`
+        is null, by updating its own position only. The `If-Match` header is
+        honoured as for the other collection updates.
+
+        Parameters:
+            collection_id (int): The ID of the collection to reorder.
+
+        Returns:
+            tuple: A JSON response containing a success status, the ID and the
+                new version of the collection.
+        """
+        body = request.get_json()
+        logger.info(f"Body of the collection order request: {body}")
 
-        collection.title = title
-        collection.description = description
-        collection.articles = articles
+        article_id = body.get("article_id")
+        after_id = body.get("after_id")
+
+        if not isinstance(article_id, int) or not (
+            after_id is None or isinstance(after_id, int)
+        ):
+            abort(
+                422,
+                description="The body must have an article_id and an after_id, which can be null",
+            )
+        if after_id == article_id:
+            abort(422, description="An article cannot be moved after itself")
+
+        members = {article_id} if after_id is None else {article_id, after_id}
+        found = db.session.execute(
+            db.select(articles_collections.c.article_id).where(
+                articles_collections.c.collection_id == collection_id,
+                articles_collections.c.article_id.in_(members),
+            )
+        ).scalars()
+        if set(found) != members:
+            if Collection.query.filter(Collection.id == collection_id).count() == 0:
+                abort(404, description=f"ID {collection_id} not found")
+            abort(
+                422,
+                description=f"The articles must belong to collection ID {collection_id}",
+            )
+
+        expected_version = if_match_version()
 
         try:
-            collection.update()
+            version = Collection.move_article(
+                collection_id, expected_version, article_id, after_id
+            )
         except SQLAlchemyError as e:
             db.session.rollback()
-            logger.error(f"Error trying to update an existing collection, {e}")
-            abort(500, description="Error updating collection.")
+            logger.error(f"Error trying to reorder an existing collection, {e}")
+            abort(500, description="Error reordering collection.")
         finally:
             db.session.close()
 
-        return jsonify({"success": True, "id": collection_id}), 200
+        if version is None:
+            abort(412, description=f"Collection ID {collection_id} was modified")
+
+        return (
+            versioned_response(
+                {"success": True, "id": collection_id, "version": version}, version
+            ),
+            200,
+        )
 
     @app.route("/api/collections/<int:collection_id>", methods=["DELETE"])
     @requires_auth(permission="delete:collections")
@@ -368,6 +977,117 @@ def create_app(test_config=None):
 
         return jsonify({"success": True, "delete": collection_id}), 200
 
+    @app.route("/api/changes", methods=["GET"])
+    def get_changes():
+        """
+        Retrieve the change feed of articles and collections.
+
+        Consumers keep the `last_seq` of the previous response and pass it
+        back as `since`. When there is nothing new, the request is held open
+        (long-poll) for up to `wait` seconds until a change is committed,
+        waiting on the process-wide `ChangeBroadcaster` without a connection.
+
+        Query parameters:
+            since (int): Only return changes after this sequence number (default is 0).
+            limit (int): The maximum number of changes returned (default is 500).
+            wait (float): Seconds to wait for new changes (default is 0, max is 30).
+
+        Returns:
+            tuple: A JSON response containing a success status, the changes and
+                the sequence number to resume from.
+        """
+        since = request.args.get("since", 0, type=int)
+        limit = request.args.get("limit", CHANGES_PER_PAGE, type=int)
+        wait = request.args.get("wait", 0, type=float)
+
+        if since < 0 or limit < 1:
+            abort(422, description="since must be positive and limit at least 1")
+        limit = min(limit, CHANGES_PER_PAGE)
+        deadline = time.monotonic() + min(max(wait, 0), CHANGES_MAX_WAIT)
+
+        changes = [change.response() for change in ChangeEvent.since(since, limit)]
+        if not changes and time.monotonic() < deadline:
+            # Release the connection while idle so long-polls do not pin the pool
+            db.session.close()
+            broadcaster = change_broadcaster()
+            while not changes and time.monotonic() < deadline:
+                changes = broadcaster.wait(since, deadline - time.monotonic())
+                if changes is None:
+                    # Older than the buffer of the broadcaster, read the outbox
+                    changes = [
+                        change.response() for change in ChangeEvent.since(since, limit)
+                    ]
+            changes = changes[:limit]
+
+        last_seq = changes[-1]["seq"] if changes else since
+
+        return (
+            jsonify({"success": True, "changes": changes, "last_seq": last_seq}),
+            200,
+        )
+
+    @app.route("/api/events", methods=["GET"])
+    def get_events():
+        """
+        Stream the change feed as Server-Sent Events.
+
+        Created and updated entities are pushed as `patch` events and deleted
+        ones as `invalidate` events, each with the outbox sequence number as
+        its event ID. Browsers resume after a disconnect by sending the
+        `Last-Event-ID` header, which takes precedence over `since`.
+
+        Unless the API runs with the gevent profile, each stream holds a
+        request thread, so a worker answers 503 with a `Retry-After` header
+        beyond `max_event_streams()` open streams.
+
+        Query parameters:
+            since (int, optional): Resume after this sequence number
+                (default is to only stream changes committed from now on).
+
+        Returns:
+            Response: A `text/event-stream` response that stays open.
+        """
+        since = request.headers.get("Last-Event-ID", request.args.get("since"))
+        if since is not None:
+            try:
+                since = int(since)
+            except ValueError:
+                abort(422, description="since must be a sequence number")
+            if since < 0:
+                abort(422, description="since must be a sequence number")
+
+        broadcaster = change_broadcaster()
+        if stream_slots is not None and not stream_slots.acquire(blocking=False):
+            abort(503, description="Too many event streams, retry later")
+
+        response = Response(
+            stream_with_context(stream_changes(broadcaster, since)),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        if stream_slots is not None:
+            response.call_on_close(stream_slots.release)
+        return response
+
+    @app.route("/api/jobs/stats", methods=["GET"])
+    @requires_auth(permission="get:jobs")
+    def get_jobs_stats():
+        """
+        Retrieve the depth of the background job queue.
+
+        Returns:
+            tuple: A JSON response containing a success status and the number
+                of jobs per status.
+        """
+        return jsonify({"success": True, "jobs": queue_stats()}), 200
+
+    @app.errorhandler(NoTenantSelected)
+    def no_tenant(error):
+        return (
+            jsonify({"success": False, "error": 404, "message": "No blog selected"}),
+            404,
+        )
+
     @app.errorhandler(401)
     def request_malformed_authorization(error):
         description = getattr(
@@ -385,6 +1105,11 @@ def create_app(test_config=None):
         description = getattr(error, "description", "not found")
         return jsonify({"success": False, "error": 404, "message": description}), 404
 
+    @app.errorhandler(412)
+    def precondition_failed(error):
+        description = getattr(error, "description", "precondition failed")
+        return jsonify({"success": False, "error": 412, "message": description}), 412
+
     @app.errorhandler(422)
     def unprocessable(error):
         description = getattr(error, "description", "unprocessable")
@@ -395,6 +1120,15 @@ def create_app(test_config=None):
         description = getattr(error, "description", "Error processing the request")
         return jsonify({"success": False, "error": 500, "message": description}), 500
 
+    @app.errorhandler(503)
+    def service_unavailable(error):
+        description = getattr(error, "description", "Service unavailable")
+        return (
+            jsonify({"success": False, "error": 503, "message": description}),
+            503,
+            {"Retry-After": str(EVENTS_BUSY_RETRY_AFTER)},
+        )
+
     @app.errorhandler(400)
     def jwt_lacks_permissions(error):
         description = getattr(error, "description", "Permissions are not in JWT")
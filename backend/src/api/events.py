@@ -0,0 +1,192 @@
+"""
+Server-Sent Events support for the MyBlog API.
+
+This module pushes the change feed (the `change_events` outbox) to browsers
+over a single long-lived HTTP response per client, so the SPA can patch its
+listings in place instead of re-fetching them.
+
+A single `ChangeBroadcaster` per process (per blog and process in a
+multi-tenant deployment) polls the outbox and fans new entries out to every
+connected client through a condition variable. The broadcasters of a process
+take turns on `BROADCASTER_CONNECTIONS` connections, so streaming many blogs
+does not outgrow the pool sized in `src.concurrency`. Idle connections therefore
+cost one waiting thread (or greenlet under the gevent worker) and no database
+queries; the database is only read again by a client that reconnects with a
+`Last-Event-ID` older than the in-memory buffer.
+
+Classes:
+- ChangeBroadcaster: Polls the outbox and wakes up the streams waiting on it.
+
+Functions:
+- format_event(change): Serializes an outbox entry as an SSE message.
+- stream_changes(broadcaster, since): Yields SSE messages for a client.
+"""
+
+import json
+import threading
+from collections import deque
+
+from loguru import logger
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.concurrency import BROADCASTER_CONNECTIONS
+from src.database.models import db, ChangeEvent
+from src.database.tenants import tenant_context
+
+EVENTS_POLL_INTERVAL = 0.5
+EVENTS_BUFFER_SIZE = 1000
+EVENTS_HEARTBEAT_INTERVAL = 15
+EVENTS_RETRY_MS = 3000
+EVENTS_CATCH_UP_PAGE = 500
+# Seconds a client refused for lack of a free stream waits before retrying
+EVENTS_BUSY_RETRY_AFTER = 30
+
+# Connections the broadcasters of all blogs poll through, see `src.concurrency`
+_poll_slots = threading.BoundedSemaphore(BROADCASTER_CONNECTIONS)
+
+
+class ChangeBroadcaster:
+    """
+    Polls the outbox in a background thread and broadcasts new entries.
+
+    The thread is started lazily by the first subscriber, so workers that
+    never serve `/api/events` never poll the database.
+
+    Attributes:
+        app (Flask): The application whose database is polled.
+        tenant (str): The blog whose outbox is polled, None for a single blog.
+        poll_interval (float): Seconds between two polls of the outbox.
+
+    Methods:
+        head(): Returns the latest sequence number known to the broadcaster.
+        wait(after_seq, timeout): Blocks until entries after `after_seq` are available.
+        stop(): Stops the polling thread.
+    """
+
+    def __init__(
+        self,
+        app,
+        tenant=None,
+        poll_interval=EVENTS_POLL_INTERVAL,
+        buffer_size=EVENTS_BUFFER_SIZE,
+    ):
+        self.app = app
+        self.tenant = tenant
+        self.poll_interval = poll_interval
+        self._buffer = deque(maxlen=buffer_size)
+        self._condition = threading.Condition()
+        self._last_seq = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def _start(self):
+        """Starts the polling thread once and waits for the initial head."""
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="change-broadcaster", daemon=True
+                )
+                self._thread.start()
+        with self._condition:
+            self._condition.wait_for(lambda: self._last_seq is not None)
+
+    def _run(self):
+        """Polls the outbox until stopped, logging and retrying on database errors."""
+        while not self._stopped.is_set():
+            try:
+                self._poll()
+            except SQLAlchemyError as e:
+                logger.error(f"Error trying to poll the change feed, {e}")
+            self._stopped.wait(self.poll_interval)
+
+    def stop(self):
+        """Stops the polling thread, e.g. when a test discards its app."""
+        self._stopped.set()
+
+    def _poll(self):
+        """Reads the entries committed since the last poll and wakes up waiters."""
+        with _poll_slots, self.app.app_context(), tenant_context(self.tenant):
+            try:
+                if self._last_seq is None:
+                    head = ChangeEvent.head()
+                    changes = []
+                else:
+                    head = self._last_seq
+                    changes = [
+                        change.response()
+                        for change in ChangeEvent.since(head, EVENTS_CATCH_UP_PAGE)
+                    ]
+            finally:
+                db.session.remove()
+
+        with self._condition:
+            self._buffer.extend(changes)
+            self._last_seq = changes[-1]["seq"] if changes else head
+            self._condition.notify_all()
+
+    def head(self):
+        """Returns the latest sequence number known to the broadcaster."""
+        self._start()
+        return self._last_seq
+
+    def wait(self, after_seq, timeout):
+        """
+        Returns the buffered entries after `after_seq`, waiting up to `timeout`.
+
+        Returns None when `after_seq` is older than the buffer, in which case
+        the caller must catch up from the database first.
+        """
+        self._start()
+        with self._condition:
+            self._condition.wait_for(lambda: self._last_seq > after_seq, timeout)
+            if self._buffer and self._buffer[0]["seq"] > after_seq + 1:
+                return None
+            if not self._buffer and self._last_seq > after_seq:
+                return None
+            return [change for change in self._buffer if change["seq"] > after_seq]
+
+
+def format_event(change):
+    """
+    Serializes an outbox entry as an SSE message.
+
+    Created and updated entities are sent as `patch` events carrying the new
+    state, deleted ones as `invalidate` events carrying only the identity.
+    """
+    event = "invalidate" if change["op"] == "deleted" else "patch"
+    data = json.dumps(change, separators=(",", ":"))
+    return f"id: {change['seq']}\nevent: {event}\ndata: {data}\n\n"
+
+
+def stream_changes(broadcaster, since=None):
+    """
+    Yields the SSE messages of one client connection.
+
+    Parameters:
+        broadcaster (ChangeBroadcaster): The process-wide broadcaster.
+        since (int, optional): Resume after this sequence number. Defaults to
+            the current head, i.e. only changes committed from now on.
+    """
+    cursor = broadcaster.head() if since is None else since
+    yield f"retry: {EVENTS_RETRY_MS}\n\n"
+
+    while True:
+        changes = broadcaster.wait(cursor, EVENTS_HEARTBEAT_INTERVAL)
+        if changes is None:
+            # The client is behind the in-memory buffer, replay from the outbox
+            try:
+                changes = [
+                    change.response()
+                    for change in ChangeEvent.since(cursor, EVENTS_CATCH_UP_PAGE)
+                ]
+            finally:
+                db.session.remove()
+
+        if not changes:
+            yield ": keep-alive\n\n"
+            continue
+
+        for change in changes:
+            yield format_event(change)
+        cursor = changes[-1]["seq"]
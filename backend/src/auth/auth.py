@@ -1,20 +1,23 @@
-import os
 import json
+import time
 from urllib.request import urlopen
 from functools import wraps
 from flask import request, abort
 
-from dotenv import load_dotenv
-
-from jose import jwt
-
-
-# Loading env vars which will be used
-# in authentication
-load_dotenv()
-AUTH0_DOMAIN = os.getenv("AUTH0_DOMAIN")
-ALGORITHMS = [os.getenv("ALGORITHMS")]
-API_AUDIENCE = os.getenv("API_AUDIENCE")
+from src.database.models import activate_tenant
+from src.database.tenants import current_tenant, multi_tenant
+from src.settings import getenv
+
+# Env vars which will be used in authentication
+AUTH0_DOMAIN = getenv("AUTH0_DOMAIN")
+ALGORITHMS = [getenv("ALGORITHMS", "RS256")]
+API_AUDIENCE = getenv("API_AUDIENCE")
+# Seconds the signing keys of the Auth0 domain are trusted before fetching them again
+JWKS_TTL = float(getenv("JWKS_TTL", "600"))
+# Minimum seconds between two fetches caused by tokens signed with an unknown key
+JWKS_MIN_REFRESH = float(getenv("JWKS_MIN_REFRESH", "30"))
+# Custom claim naming the blog a token was issued for, in multi-tenant mode
+TENANT_CLAIM = getenv("TENANT_CLAIM", "https://myblog/tenant")
 
 """
 AuthError Exception
@@ -104,22 +107,84 @@ def check_permissions(permission, payload):
     return True
 
 
-def verify_decode_jwt(token):
+def check_tenant(payload):
     """
-    Checking the recivied jwt
+    Checking the blog of the token in a multi-tenant deployment
+
+    The token must name, in its tenant claim, the blog selected from the host
+    of the request, or select the blog itself when the host names none.
     """
-    jsonurl = urlopen(f"https://{AUTH0_DOMAIN}/.well-known/jwks.json")
-    jwks = json.loads(jsonurl.read())
-    unverified_header = jwt.get_unverified_header(token)
-    rsa_key = {}
+    if not multi_tenant():
+        return True
 
-    if "kid" not in unverified_header:
+    claim = payload.get(TENANT_CLAIM)
+    tenant = current_tenant()
+    if claim is None or (tenant is not None and claim != tenant):
         raise AuthError(
-            {"code": "invalid_header", "description": "Authorization malformed."}, 401
+            {"code": "invalid_tenant", "description": "Token not valid for this blog."},
+            403,
         )
+    if tenant is None and not activate_tenant(claim):
+        raise AuthError(
+            {"code": "invalid_tenant", "description": "Blog not found."}, 404
+        )
+    return True
+
+
+# (expiry, key set) of the cached JWKS, or (None, key set) when installed by use_jwks
+_jwks = (0, None)
+# When a token with an unknown key ID last fetched the keys
+_jwks_refreshed_at = None
+
+
+def use_jwks(jwks):
+    """
+    Replacing the signing keys of the Auth0 domain
+
+    Tests install the JWKS of a local key, so tokens are verified without
+    network access. None fetches the keys from Auth0 again.
+    """
+    global _jwks, _jwks_refreshed_at
+    _jwks = (None, jwks) if jwks is not None else (0, None)
+    _jwks_refreshed_at = None
+
+
+def get_jwks(refresh=False):
+    """
+    Getting the signing keys of the Auth0 domain, cached for JWKS_TTL seconds
+
+    With refresh, the keys are fetched again unless a refresh already did
+    less than JWKS_MIN_REFRESH seconds ago, so that the keys rotated by Auth0
+    are found at once while tokens with made-up key IDs cannot flood the domain.
+    """
+    global _jwks, _jwks_refreshed_at
+    expiry, jwks = _jwks
+    if expiry is None:
+        return jwks
+    now = time.monotonic()
+    if refresh:
+        if (
+            _jwks_refreshed_at is not None
+            and now < _jwks_refreshed_at + JWKS_MIN_REFRESH
+        ):
+            return jwks
+        _jwks_refreshed_at = now
+    elif expiry > now:
+        return jwks
+
+    jsonurl = urlopen(f"https://{AUTH0_DOMAIN}/.well-known/jwks.json")
+    jwks = json.loads(jsonurl.read())
+    _jwks = (time.monotonic() + JWKS_TTL, jwks)
+    return jwks
 
+
+def find_rsa_key(jwks, kid):
+    """
+    Getting the signing key of a key ID from a JWKS, empty when not found
+    """
+    rsa_key = {}
     for key in jwks["keys"]:
-        if key["kid"] == unverified_header["kid"]:
+        if key["kid"] == kid:
             rsa_key = {
                 "kty": key["kty"],
                 "kid": key["kid"],
@@ -127,6 +192,28 @@ def verify_decode_jwt(token):
                 "n": key["n"],
                 "e": key["e"],
             }
+    return rsa_key
+
+
+def verify_decode_jwt(token):
+    """
+    Checking the recivied jwt
+    """
+    # Imported on first use, workers that never authenticate do not pay for it
+    from jose import jwt
+
+    jwks = get_jwks()
+    unverified_header = jwt.get_unverified_header(token)
+
+    if "kid" not in unverified_header:
+        raise AuthError(
+            {"code": "invalid_header", "description": "Authorization malformed."}, 401
+        )
+
+    rsa_key = find_rsa_key(jwks, unverified_header["kid"])
+    if not rsa_key:
+        # The keys may have been rotated since they were fetched
+        rsa_key = find_rsa_key(get_jwks(refresh=True), unverified_header["kid"])
     if rsa_key:
         try:
             payload = jwt.decode(
@@ -181,6 +268,7 @@ def requires_auth(permission=""):
             token = get_token_auth_header()
             payload = verify_decode_jwt(token)
             check_permissions(permission, payload)
+            check_tenant(payload)
             return f(*args, **kwargs)
 
         return wrapper
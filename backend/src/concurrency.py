@@ -0,0 +1,149 @@
+"""
+Concurrency profile of the MyBlog backend.
+
+The gunicorn configuration (`src/gunicorn_conf.py`) and the database engine
+(`src.database.models.setup_db`) both derive their numbers from this module,
+so the number of request threads per worker and the size of the connection
+pool can never disagree.
+
+Profiles, selected with `GUNICORN_PROFILE`:
+- sync: one request at a time per worker, `2 * CPUs + 1` workers.
+- gthread: `GUNICORN_THREADS` (default 4) request threads per worker,
+  `CPUs + 1` workers.
+- gevent: `GUNICORN_WORKER_CONNECTIONS` (default 1000) greenlets per worker,
+  one worker per CPU. Required to hold many `/api/events` streams, the
+  other profiles keep at most half of their threads for them.
+
+Every number can be overridden through its environment variable.
+
+Functions:
+- cpu_count(): Returns the CPUs available to the process, honouring cgroup quotas.
+- profile(): Returns the worker settings of the selected profile.
+- db_engine_options(): Returns the pool settings matching the profile.
+- max_event_streams(): Returns how many `/api/events` streams a worker may hold.
+"""
+
+import math
+import os
+
+from src.settings import getenv
+
+PROFILES = {
+    "sync": {"worker_class": "sync", "threads": 1},
+    "gthread": {"worker_class": "gthread", "threads": 4},
+    "gevent": {"worker_class": "gevent", "threads": 1},
+}
+DEFAULT_PROFILE = "gthread"
+DEFAULT_WORKER_CONNECTIONS = 1000
+# Connections of a gevent worker, greenlets beyond it wait for a free one
+DEFAULT_GEVENT_POOL_SIZE = 10
+# Connections of the background threads, on top of the request threads and
+# the job workers: the change broadcasters of every blog poll through
+# `BROADCASTER_CONNECTIONS` connections at most (see `src.api.events`), and the
+# view counter flushes through one
+BROADCASTER_CONNECTIONS = 1
+VIEW_COUNTER_CONNECTIONS = 1
+BACKGROUND_CONNECTIONS = BROADCASTER_CONNECTIONS + VIEW_COUNTER_CONNECTIONS
+
+
+def cpu_count():
+    """
+    Returns the number of CPUs available to the process.
+
+    Containers often see every CPU of the host while being limited by a
+    cgroup quota, so the quota in `/sys/fs/cgroup/cpu.max` wins when set.
+    """
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+
+    try:
+        with open("/sys/fs/cgroup/cpu.max", encoding="utf-8") as cpu_max:
+            quota, period = cpu_max.read().split()
+        if quota != "max":
+            count = min(count, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return count
+
+
+def profile():
+    """
+    Returns the worker settings of the profile selected by `GUNICORN_PROFILE`.
+
+    Returns:
+        dict: The `name`, `worker_class`, `workers`, `threads` and
+            `worker_connections` of the profile.
+    """
+    name = getenv("GUNICORN_PROFILE", DEFAULT_PROFILE)
+    if name not in PROFILES:
+        raise ValueError(
+            f"Unknown GUNICORN_PROFILE {name}, use one of {list(PROFILES)}"
+        )
+
+    cpus = cpu_count()
+    default_workers = {"sync": 2 * cpus + 1, "gthread": cpus + 1, "gevent": cpus}
+    threads = PROFILES[name]["threads"]
+    if name == "gthread":
+        threads = int(getenv("GUNICORN_THREADS", str(threads)))
+
+    return {
+        "name": name,
+        "worker_class": PROFILES[name]["worker_class"],
+        "workers": int(getenv("GUNICORN_WORKERS", str(default_workers[name]))),
+        "threads": threads,
+        "worker_connections": int(
+            getenv("GUNICORN_WORKER_CONNECTIONS", str(DEFAULT_WORKER_CONNECTIONS))
+        ),
+    }
+
+
+def db_engine_options():
+    """
+    Returns the SQLAlchemy pool settings matching the selected profile.
+
+    A worker gets one connection per request thread plus the background
+    threads (job workers, change broadcasters and view counter). When
+    `DB_MAX_CONNECTIONS` is set, the pools of all workers together never
+    exceed it.
+
+    Returns:
+        dict: The `pool_size` and `max_overflow` engine options.
+    """
+    settings = profile()
+    if settings["worker_class"] == "gevent":
+        concurrency = int(getenv("DB_POOL_SIZE", str(DEFAULT_GEVENT_POOL_SIZE)))
+    else:
+        concurrency = settings["threads"]
+    job_workers = int(getenv("JOB_WORKERS", "2"))
+    pool_size = concurrency + job_workers + BACKGROUND_CONNECTIONS
+
+    max_connections = getenv("DB_MAX_CONNECTIONS")
+    if max_connections is not None:
+        per_worker = max(1, int(max_connections) // settings["workers"])
+        pool_size = min(pool_size, per_worker)
+
+    return {"pool_size": pool_size, "max_overflow": 0}
+
+
+def max_event_streams():
+    """
+    Returns how many `/api/events` streams a worker may hold at once.
+
+    A stream holds its request thread for as long as the tab stays open, so
+    under the sync and gthread profiles at most half of the threads of a
+    worker stream and the others keep serving the API. A gevent worker holds
+    a stream in a greenlet and has no limit. `EVENTS_MAX_STREAMS` overrides
+    the limit.
+
+    Returns:
+        int: The number of streams, None for no limit.
+    """
+    max_streams = getenv("EVENTS_MAX_STREAMS")
+    if max_streams is not None:
+        return int(max_streams)
+    settings = profile()
+    if settings["worker_class"] == "gevent":
+        return None
+    return settings["threads"] // 2
@@ -0,0 +1,134 @@
+"""
+Row counts for the pagination metadata of the listings.
+
+An exact `COUNT(*)` reads every row, which gets expensive on large tables,
+so listings only count when the client asks for it (`?count=`):
+- none: no total.
+- exact: a `COUNT(*)` of the query.
+- estimate: on PostgreSQL, the number of rows the planner expects for the
+  query (`EXPLAIN`, based on `pg_class.reltuples` and the column
+  statistics), cached for `COUNT_ESTIMATE_TTL` seconds. Small estimates and
+  other databases fall back to an exact count, which is cheap there.
+
+Every tag filter is a query of its own, so the cache keeps the
+`COUNT_ESTIMATE_CACHE_SIZE` most recent estimates at most.
+
+Functions:
+- exact_count(statement): Returns the number of rows of a select.
+- estimate_count(statement, key): Returns the planner estimate of a select.
+- count_rows(statement, mode, key): Returns the total for a count mode.
+"""
+
+import threading
+import time
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects import postgresql
+
+from src.database.models import db
+from src.database.tenants import current_tenant
+from src.settings import getenv
+
+COUNT_MODES = ("none", "exact", "estimate")
+COUNT_ESTIMATE_TTL = float(getenv("COUNT_ESTIMATE_TTL", "30"))
+# Below this estimate, an exact count is as cheap as the planner statistics
+COUNT_EXACT_BELOW = 10_000
+COUNT_ESTIMATE_CACHE_SIZE = 1000
+
+# Oldest first, so expired entries are at the front
+_estimates = {}
+_estimates_lock = threading.Lock()
+
+
+def exact_count(statement):
+    """
+    Returns the number of rows of a select.
+
+    Parameters:
+        statement (Select): The select to count.
+
+    Returns:
+        int: The number of rows.
+    """
+    return db.session.execute(
+        select(func.count()).select_from(statement.subquery())
+    ).scalar()
+
+
+def _planner_rows(statement):
+    """Returns the number of rows PostgreSQL expects for a select."""
+    # The SQL string no longer goes through the schema translation of the
+    # engine, so the schema of the blog (schema mode) is rendered here
+    translate = db.session.get_bind().get_execution_options().get(
+        "schema_translate_map"
+    )
+    sql = statement.compile(
+        dialect=postgresql.dialect(),
+        schema_translate_map=translate,
+        render_schema_translate=translate is not None,
+        compile_kwargs={"literal_binds": True},
+    )
+    plan = db.session.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def estimate_count(statement, key):
+    """
+    Returns the planner estimate of the number of rows of a select.
+
+    Estimates are cached per `key` for `COUNT_ESTIMATE_TTL` seconds, so a
+    burst of listing requests runs one EXPLAIN, and the least recently
+    computed ones are dropped beyond `COUNT_ESTIMATE_CACHE_SIZE` keys.
+    Without PostgreSQL, or when the table is small, the exact count is
+    returned instead.
+
+    Parameters:
+        statement (Select): The select to count.
+        key (str): The cache key of the select, e.g. the name of the listing.
+
+    Returns:
+        int: The estimated number of rows.
+    """
+    if db.session.get_bind().dialect.name != "postgresql":
+        return exact_count(statement)
+
+    # Blogs of a multi-tenant deployment have tables of their own
+    key = (current_tenant(), key)
+    now = time.monotonic()
+    with _estimates_lock:
+        cached = _estimates.get(key)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
+    estimate = _planner_rows(statement)
+    if estimate < COUNT_EXACT_BELOW:
+        # Also covers tables never analyzed, whose estimate is meaningless
+        estimate = exact_count(statement)
+    with _estimates_lock:
+        _estimates.pop(key, None)
+        _estimates[key] = (now + COUNT_ESTIMATE_TTL, estimate)
+        # Drops the expired entries and the oldest ones beyond the size
+        while len(_estimates) > COUNT_ESTIMATE_CACHE_SIZE or (
+            _estimates and next(iter(_estimates.values()))[0] <= now
+        ):
+            del _estimates[next(iter(_estimates))]
+    return estimate
+
+
+def count_rows(statement, mode, key):
+    """
+    Returns the total of a listing for a count mode.
+
+    Parameters:
+        statement (Select): The select of every row of the listing.
+        mode (str): One of `COUNT_MODES`.
+        key (str): The cache key of estimates.
+
+    Returns:
+        int: The total, or None when `mode` is "none".
+    """
+    if mode == "exact":
+        return exact_count(statement)
+    if mode == "estimate":
+        return estimate_count(statement, key)
+    return None
@@ -0,0 +1,66 @@
+"""
+Compressed text deltas used by the article revision history.
+
+A delta is the list of operations turning one version of a text into the
+next, line by line: copy a range of lines of the previous version, or
+insert new text. Operations are serialized as JSON and compressed with zlib,
+and full snapshots use the same compression.
+
+Functions:
+- compress(text): Compresses a full text.
+- decompress(data): Restores a text compressed by `compress`.
+- make_delta(old, new): Returns the compressed delta from `old` to `new`.
+- apply_delta(old, delta): Returns the text obtained by applying `delta` to `old`.
+"""
+
+import json
+import zlib
+from difflib import SequenceMatcher
+
+COMPRESSION_LEVEL = 9
+
+
+def compress(text):
+    """Compresses a full text."""
+    return zlib.compress(text.encode("utf-8"), COMPRESSION_LEVEL)
+
+
+def decompress(data):
+    """Restores a text compressed by `compress`."""
+    return zlib.decompress(data).decode("utf-8")
+
+
+def make_delta(old, new):
+    """
+    Returns the compressed delta turning `old` into `new`.
+
+    Operations are `[start, end]` to copy lines `start:end` of `old` and a
+    string to insert text, so unchanged lines cost a few bytes whatever
+    their length.
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    operations = []
+    matcher = SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == "equal":
+            operations.append([old_start, old_end])
+        elif new_start < new_end:
+            operations.append("".join(new_lines[new_start:new_end]))
+    return zlib.compress(
+        json.dumps(operations, separators=(",", ":")).encode("utf-8"),
+        COMPRESSION_LEVEL,
+    )
+
+
+def apply_delta(old, delta):
+    """Returns the text obtained by applying a delta made by `make_delta` to `old`."""
+    old_lines = old.splitlines(keepends=True)
+    parts = []
+    for operation in json.loads(zlib.decompress(delta)):
+        if isinstance(operation, str):
+            parts.append(operation)
+        else:
+            start, end = operation
+            parts.extend(old_lines[start:end])
+    return "".join(parts)
@@ -0,0 +1,112 @@
+"""
+Schema upgrades of existing databases.
+
+`db.create_all()` creates the missing tables but never alters a table that
+already exists, so the columns and indexes added to existing tables after
+their creation are listed here, oldest first, and added by `upgrade_db()`
+with plain `ALTER TABLE ... ADD COLUMN` and `CREATE INDEX` statements.
+Every step first checks the database, so the upgrade can run again safely,
+e.g. before each deploy:
+
+    flask --app "src.api.api:create_app()" upgrade-db
+
+New columns are added with their server default, if any, which fills the
+existing rows; the code handles the remaining legacy values (e.g.
+`load_renderings`).
+
+Functions:
+- upgrade_db(): Creates the missing tables, columns and indexes of the current blog.
+"""
+
+import sqlalchemy as sa
+
+from src.database.models import db
+from src.database.tenants import SHARED_TABLES, current_tenant, multi_tenant
+
+# Columns added to existing tables, as (table, column)
+ADDED_COLUMNS = [
+    ("articles", "deleted_at"),
+    ("articles", "version"),
+    ("collections", "version"),
+    ("articles", "content_hash"),
+    ("articles_collections", "position"),
+    ("jobs", "tenant"),
+    ("articles", "views"),
+]
+
+# Indexes added to existing tables, as (table, index)
+ADDED_INDEXES = [
+    ("articles", "ix_articles_deleted_at"),
+    ("articles_collections", "ix_articles_collections_collection_position"),
+    ("articles", "ix_articles_popular"),
+]
+
+
+def _upgraded_tables():
+    """
+    Returns the tables `upgrade_db` upgrades in the current context.
+
+    In a multi-tenant deployment, the tables of the current blog, or the
+    shared tables when no blog is selected.
+    """
+    if not multi_tenant():
+        return db.metadata.sorted_tables
+    shared = current_tenant() is None
+    return [
+        table
+        for table in db.metadata.sorted_tables
+        if (table.name in SHARED_TABLES) == shared
+    ]
+
+
+def _add_column(connection, table, column):
+    """Adds a column to a table of the database of `connection`."""
+    preparer = connection.dialect.identifier_preparer
+    name = preparer.quote(table.name)
+    schema = connection.schema_for_object(table)
+    if schema is not None:
+        name = f"{preparer.quote_schema(schema)}.{name}"
+    definition = sa.schema.CreateColumn(column).compile(dialect=connection.dialect)
+    connection.execute(sa.text(f"ALTER TABLE {name} ADD COLUMN {definition}"))
+
+
+def upgrade_db():
+    """
+    Creates the missing tables, columns and indexes of the current blog.
+
+    Each table is upgraded in its own transaction, on the database (or schema)
+    the session routes it to.
+
+    Returns:
+        list: The names of the tables, columns and indexes created.
+    """
+    tables = _upgraded_tables()
+    created = []
+    for table in tables:
+        with db.session.get_bind(clause=table).begin() as connection:
+            schema = connection.schema_for_object(table)
+            inspector = sa.inspect(connection)
+            if not inspector.has_table(table.name, schema=schema):
+                table.create(connection)
+                created.append(table.name)
+                continue
+
+            columns = {
+                column["name"]
+                for column in inspector.get_columns(table.name, schema=schema)
+            }
+            for table_name, column_name in ADDED_COLUMNS:
+                if table_name == table.name and column_name not in columns:
+                    _add_column(connection, table, table.c[column_name])
+                    created.append(f"{table.name}.{column_name}")
+
+            indexes = {
+                index["name"]
+                for index in inspector.get_indexes(table.name, schema=schema)
+            }
+            for table_name, index_name in ADDED_INDEXES:
+                if table_name == table.name and index_name not in indexes:
+                    index = next(i for i in table.indexes if i.name == index_name)
+                    index.create(connection)
+                    created.append(index_name)
+    return created
@@ -2,40 +2,100 @@
 Database Setup and Models for MyBlog Application
 
 This module handles the setup of the SQLAlchemy database for the MyBlog application,
-including configuration, initialization, and table creation. It defines the 
-data models for articles and collections, along with their relationships, 
-and provides methods for database operations such as insertion, updating, 
+including configuration, initialization, and table creation. It defines the
+data models for articles and collections, along with their relationships,
+and provides methods for database operations such as insertion, updating,
 and deletion of records.
 
 Key functionalities include:
-- Loading environment variables for database connection.
-- Setting up the database for the Flask application.
+- Setting up the database for the Flask application, with fork-safe engines.
 - Creating and managing many-to-many relationships between articles and collections.
 - Methods for CRUD operations on articles and collections.
+- Soft deletion of articles, hidden from every ORM query by default.
 
 Classes:
 - Article: Represents an article with title, content, author, and timestamps.
 - Collection: Represents a collection of articles with a title and description.
+- ChangeEvent: Represents an outbox entry describing one article/collection mutation.
+- Job: Represents a unit of background work in the job queue.
+- ArticleRevision: Represents one version of the content of an article.
+- RenderedContent: Represents the cached HTML rendering of an article content.
+- CollectionListing: Represents the precomputed listing row of a collection.
+- Tenant: Represents a blog hosted by a multi-tenant deployment.
+- Tag: Represents a tag of articles, with its precomputed article count.
 
 Functions:
 - setup_db(app, db_path): Configures and initializes the database for the Flask app.
 - db_drop_and_create_all(): Drops all tables and recreates them with demo data.
+- record_change(entity, entity_id, op, payload): Adds an outbox entry to the session.
+- record_revision(article_id, number, title, content, author): Adds a revision
+  to the session.
+- record_rendering(content): Renders a content unless it is cached.
+- load_renderings(articles): Returns the renderings of articles, rendering
+  legacy rows on the fly.
+- refresh_collection_listings(collection_ids): Recomputes the listing rows of
+  collections.
+- record_tags(article_id, names): Replaces the tags of an article, keeping the
+  tag counts.
+- load_tags(articles): Returns the tag names of articles.
+- create_tenant(name): Registers a blog and creates its tables.
+- activate_tenant(name): Selects a registered blog for the current context.
 """
 
 import os
+import time
+import weakref
+from collections import defaultdict
+from itertools import takewhile
 from flask_sqlalchemy import SQLAlchemy
-from dotenv import load_dotenv
+from sqlalchemy import bindparam, event, insert, delete, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, with_loader_criteria
 
+from src.settings import getenv
+from src.concurrency import db_engine_options
+from src.database.delta import compress
+from src.database.render import content_hash, render_content
+from src.database.tenants import (
+    SHARED_TABLES,
+    TenantSession,
+    current_tenant,
+    dispose_tenant_engines,
+    multi_tenant,
+    set_tenant,
+    tenant_engine,
+    tenant_mode,
+    tenant_schema,
+    valid_tenant_name,
+)
+
+# Sessions route each statement to the database of the current blog
+db = SQLAlchemy(session_options={"class_": TenantSession})
+
+# Applications whose engines must not reuse the parent's connections after a fork
+_apps = weakref.WeakSet()
+
+
+def _dispose_engines_after_fork():
+    """
+    Drops the pooled connections inherited from the parent process.
+
+    With `gunicorn --preload` the application (and possibly some connections)
+    is created in the master before the workers are forked. Sharing a socket
+    between processes corrupts the connection, so every child starts with
+    empty pools; `close=False` leaves the parent's connections untouched.
+    """
+    for app in list(_apps):
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+    dispose_tenant_engines(close=False)
 
-# Loading env vars which will be used
-# in the database connection
-load_dotenv()
 
-database_path = os.getenv("DATABASE_URL")
-db = SQLAlchemy()
+os.register_at_fork(after_in_child=_dispose_engines_after_fork)
 
 
-def setup_db(app, db_path=database_path):
+def setup_db(app, db_path=None, create_all=None):
     """
     Sets up the database for the given Flask application.
 
@@ -45,14 +105,26 @@ def setup_db(app, db_path=database_path):
     Parameters:
         app (Flask): The Flask application instance to configure for database access.
         db_path (str, optional): The database URI to connect to.
-            Defaults to the value of `database_path`.
+            Defaults to the `DATABASE_URL` environment variable.
+        create_all (bool, optional): Whether to create the missing tables.
+            Defaults to the `DB_CREATE_ALL` environment variable, or True.
     """
+    if db_path is None:
+        db_path = getenv("DATABASE_URL")
+    if create_all is None:
+        create_all = getenv("DB_CREATE_ALL", "1") != "0"
+
     app.config["SQLALCHEMY_DATABASE_URI"] = db_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    if db_path and not db_path.startswith("sqlite"):
+        # Sized from the same profile as the gunicorn workers
+        app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", db_engine_options())
     db.app = app
     db.init_app(app)
-    with app.app_context():
-        db.create_all()
+    _apps.add(app)
+    if create_all:
+        with app.app_context():
+            db.create_all()
 
 
 def db_drop_and_create_all():
@@ -65,6 +137,9 @@ def db_drop_and_create_all():
     """
     db.drop_all()
     db.create_all()
+    if multi_tenant():
+        # Demo rows belong to a blog, see `create_tenant`
+        return
 
     # add one demo row which is helping in POSTMAN test
     article = Article(title="water", content="about water", author="me")
@@ -73,20 +148,428 @@ def db_drop_and_create_all():
     collection = Collection(
         title="my water collection", description="about water and water"
     )
-    article.insert()
     collection.articles.extend([article])
     collection.insert()
 
 
+# Arbitrary key of the advisory lock serializing outbox writes on PostgreSQL;
+# in schema mode the hash of the blog is the second key of its own lock
+OUTBOX_LOCK_KEY = 26026
+
+
+def record_change(entity, entity_id, op, payload=None):
+    """
+    Adds an outbox entry for a mutation to the current session.
+
+    The entry is committed together with the mutation it describes, so the
+    change feed never reports a write that was rolled back nor misses one
+    that was committed. On PostgreSQL the outbox writes are serialized with a
+    transaction-level advisory lock, which guarantees that sequence numbers
+    become visible in increasing order and consumers never skip an entry.
+    Blogs sharing a database (schema mode) each lock their own outbox only.
+
+    Parameters:
+        entity (str): The kind of the changed entity ("article" or "collection").
+        entity_id (int): The ID of the changed entity.
+        op (str): The mutation ("created", "updated" or "deleted").
+        payload (dict, optional): The state of the entity after the mutation.
+    """
+    if db.session.get_bind().dialect.name == "postgresql":
+        if tenant_mode() == "schema":
+            db.session.execute(
+                text("SELECT pg_advisory_xact_lock(:key, hashtext(:tenant))"),
+                {"key": OUTBOX_LOCK_KEY, "tenant": current_tenant()},
+            )
+        else:
+            db.session.execute(
+                text("SELECT pg_advisory_xact_lock(:key)"), {"key": OUTBOX_LOCK_KEY}
+            )
+    db.session.add(
+        ChangeEvent(entity=entity, entity_id=entity_id, op=op, payload=payload)
+    )
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _hide_deleted_articles(execute_state):
+    """
+    Adds the default `deleted_at IS NULL` criterion to every ORM select.
+
+    The criterion is propagated to the lazy loads of relationships, so
+    `Collection.articles` also skips soft-deleted articles. Queries that need
+    the deleted rows opt out with `.execution_options(include_deleted=True)`.
+    """
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.is_relationship_load
+        and not execute_state.execution_options.get("include_deleted", False)
+    ):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(
+                Article,
+                lambda cls: cls.deleted_at.is_(None),
+                include_aliases=True,
+            )
+        )
+
+
+def record_revision(article_id, number, title, content, author):
+    """
+    Adds a revision of an article to the current session.
+
+    The content is stored as a compressed full copy so that writes need no
+    access to the previous version; `src.database.revisions` turns it into a
+    delta afterwards, in a background job.
+
+    Parameters:
+        article_id (int): The ID of the article.
+        number (int): The revision number, which is the version of the article.
+        title (str): The title of the article in this revision.
+        content (str): The content of the article in this revision.
+        author (str): The author of the article in this revision.
+    """
+    db.session.add(
+        ArticleRevision(
+            article_id=article_id,
+            number=number,
+            kind="full",
+            title=title,
+            author=author,
+            data=compress(content),
+        )
+    )
+
+
+def _insert_ignore(model):
+    """Returns an INSERT of `model` skipping the rows whose key already exists."""
+    dialect = db.session.get_bind(mapper=model).dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(model).on_conflict_do_nothing()
+    return insert(model).prefix_with("IGNORE")
+
+
+def record_rendering(content):
+    """
+    Renders a content unless its rendering is already cached.
+
+    Renderings are keyed by the hash of the content, so articles sharing a
+    content, and edits that only change the title, reuse the same row. The
+    row is added in the current transaction; two writers rendering the same
+    new content at once both succeed.
+
+    Parameters:
+        content (str): The Markdown content of an article.
+
+    Returns:
+        dict: The `content_hash`, `excerpt` and `reading_time` of the content.
+    """
+    key = content_hash(content)
+    rendering = db.session.get(RenderedContent, key)
+    if rendering is None:
+        rendered = render_content(content)
+        db.session.execute(
+            _insert_ignore(RenderedContent).values(content_hash=key, **rendered)
+        )
+        excerpt, reading_time = rendered["excerpt"], rendered["reading_time"]
+    else:
+        excerpt, reading_time = rendering.excerpt, rendering.reading_time
+    return {"content_hash": key, "excerpt": excerpt, "reading_time": reading_time}
+
+
+def load_renderings(articles):
+    """
+    Returns the cached renderings of articles, with one query.
+
+    Legacy rows, written before contents were rendered, have no
+    `content_hash`: they are rendered on the fly and the result is stored,
+    so only the first read pays for it.
+
+    Parameters:
+        articles (list): The articles to render.
+
+    Returns:
+        dict: The RenderedContent of each article, by article ID.
+    """
+    keys = {
+        article.id: article.content_hash or content_hash(article.content)
+        for article in articles
+    }
+    renderings = {
+        rendering.content_hash: rendering
+        for rendering in RenderedContent.query.filter(
+            RenderedContent.content_hash.in_(set(keys.values()))
+        )
+    }
+
+    stale = [
+        article
+        for article in articles
+        if article.content_hash is None or keys[article.id] not in renderings
+    ]
+    for article in stale:
+        key = keys[article.id]
+        if key not in renderings:
+            record_rendering(article.content)
+            renderings[key] = db.session.get(RenderedContent, key)
+        # Writers always set the hash, so a NULL one still matches this content
+        db.session.execute(
+            update(Article)
+            .where(Article.id == article.id, Article.content_hash.is_(None))
+            .values(content_hash=key, updated_at=Article.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+    if stale:
+        db.session.commit()
+
+    return {article.id: renderings[keys[article.id]] for article in articles}
+
+
+def refresh_collection_listings(collection_ids=None):
+    """
+    Recomputes the listing rows of collections in the current session.
+
+    Called in the same transaction as every write to a collection or to its
+    memberships, so the `collection_listings` table is never behind the
+    collections. Soft-deleted articles are left out.
+
+    Parameters:
+        collection_ids (list, optional): The IDs of the collections to refresh.
+            Defaults to every collection.
+    """
+    collections = select(
+        Collection.id, Collection.title, Collection.description, Collection.version
+    )
+    memberships = (
+        select(articles_collections.c.collection_id, articles_collections.c.article_id)
+        .join(Article, Article.id == articles_collections.c.article_id)
+        .where(Article.deleted_at.is_(None))
+        .order_by(
+            articles_collections.c.collection_id,
+            articles_collections.c.position,
+            articles_collections.c.article_id,
+        )
+    )
+    stale = delete(CollectionListing)
+    if collection_ids is not None:
+        collection_ids = sorted(set(collection_ids))
+        if not collection_ids:
+            return
+        collections = collections.where(Collection.id.in_(collection_ids))
+        memberships = memberships.where(
+            articles_collections.c.collection_id.in_(collection_ids)
+        )
+        stale = stale.where(CollectionListing.collection_id.in_(collection_ids))
+
+    article_ids = defaultdict(list)
+    for collection_id, article_id in db.session.execute(memberships):
+        article_ids[collection_id].append(article_id)
+    rows = [
+        {
+            "collection_id": collection_id,
+            "title": title,
+            "description": description,
+            "version": version,
+            "article_count": len(article_ids[collection_id]),
+            "article_ids": article_ids[collection_id],
+        }
+        for collection_id, title, description, version in db.session.execute(
+            collections
+        )
+    ]
+
+    db.session.execute(stale)
+    if rows:
+        db.session.execute(insert(CollectionListing), rows)
+
+
+# Distance between the positions of consecutive articles of a collection
+POSITION_GAP = 1024
+
+
+def _assign_positions(collection_id, article_ids):
+    """
+    Numbers the memberships of a collection in the order of `article_ids`.
+
+    Positions are `POSITION_GAP` apart, so that an article can later be moved
+    between two others by updating its own row only.
+    """
+    if not article_ids:
+        return
+    db.session.execute(
+        update(articles_collections)
+        .where(
+            articles_collections.c.collection_id == collection_id,
+            articles_collections.c.article_id == bindparam("member_id"),
+        )
+        .values(position=bindparam("member_position")),
+        [
+            {"member_id": article_id, "member_position": (index + 1) * POSITION_GAP}
+            for index, article_id in enumerate(article_ids)
+        ],
+    )
+
+
+def _renumber_positions(collection_id):
+    """Spreads the positions of a collection `POSITION_GAP` apart again."""
+    article_ids = db.session.execute(
+        select(articles_collections.c.article_id)
+        .where(articles_collections.c.collection_id == collection_id)
+        .order_by(articles_collections.c.position, articles_collections.c.article_id)
+    ).scalars()
+    _assign_positions(collection_id, list(article_ids))
+
+
+def _position_after(collection_id, article_id, after_id):
+    """
+    Returns a free position right after `after_id`, or first when it is None.
+
+    Only the two neighbours are read, through the `(collection_id, position)`
+    index. When they are adjacent, or when legacy rows share a position, the
+    collection is renumbered first, which gaps make rare.
+    """
+    members = articles_collections.c
+    others = [members.collection_id == collection_id, members.article_id != article_id]
+
+    lower = None
+    if after_id is not None:
+        lower = db.session.execute(
+            select(members.position).where(
+                members.collection_id == collection_id, members.article_id == after_id
+            )
+        ).scalar()
+        tied = db.session.execute(
+            select(members.article_id)
+            .where(*others, members.article_id != after_id, members.position == lower)
+            .limit(1)
+        ).scalar()
+        if tied is not None:
+            _renumber_positions(collection_id)
+            return _position_after(collection_id, article_id, after_id)
+
+    following = select(db.func.min(members.position)).where(*others)
+    if lower is not None:
+        following = following.where(members.position > lower)
+    upper = db.session.execute(following).scalar()
+
+    if lower is None and upper is None:
+        return POSITION_GAP
+    if lower is None:
+        return upper - POSITION_GAP
+    if upper is None:
+        return lower + POSITION_GAP
+    if upper - lower > 1:
+        return (lower + upper) // 2
+    _renumber_positions(collection_id)
+    return _position_after(collection_id, article_id, after_id)
+
+
 articles_collections = db.Table(
     "articles_collections",
     db.Column("article_id", db.Integer, db.ForeignKey("articles.id"), primary_key=True),
     db.Column(
         "collection_id", db.Integer, db.ForeignKey("collections.id"), primary_key=True
     ),
+    # Rank of the article in the collection, see POSITION_GAP
+    db.Column("position", db.BigInteger, nullable=False, default=0, server_default="0"),
+    # Ordered reads of a collection are index-only scans
+    db.Index(
+        "ix_articles_collections_collection_position",
+        "collection_id",
+        "position",
+        "article_id",
+    ),
 )
 
 
+# Both directions of the tag index: the primary key serves the tags of an
+# article, the index the articles of a tag (`?tags=` filters and facets)
+article_tags = db.Table(
+    "article_tags",
+    db.Column("article_id", db.Integer, db.ForeignKey("articles.id"), primary_key=True),
+    db.Column("tag_id", db.Integer, db.ForeignKey("tags.id"), primary_key=True),
+    db.Index("ix_article_tags_tag_article", "tag_id", "article_id"),
+)
+
+
+def record_tags(article_id, names):
+    """
+    Replaces the tags of an article in the current session.
+
+    Missing tags are created, and `Tag.article_count` is incremented or
+    decremented for the tags added or removed, in the same transaction, so
+    counts are never read from `article_tags`.
+
+    Parameters:
+        article_id (int): The ID of a live article.
+        names (list): The normalized tag names (see `src.database.tags`).
+
+    Returns:
+        list: The tag names of the article, sorted.
+    """
+    names = sorted(set(names))
+    if names:
+        db.session.execute(_insert_ignore(Tag), [{"name": name} for name in names])
+    wanted = {
+        tag_id
+        for (tag_id,) in db.session.execute(select(Tag.id).where(Tag.name.in_(names)))
+    }
+    current = {
+        tag_id
+        for (tag_id,) in db.session.execute(
+            select(article_tags.c.tag_id).where(article_tags.c.article_id == article_id)
+        )
+    }
+    added, removed = wanted - current, current - wanted
+
+    if removed:
+        db.session.execute(
+            delete(article_tags).where(
+                article_tags.c.article_id == article_id,
+                article_tags.c.tag_id.in_(removed),
+            )
+        )
+        db.session.execute(
+            update(Tag)
+            .where(Tag.id.in_(removed))
+            .values(article_count=Tag.article_count - 1)
+        )
+    if added:
+        db.session.execute(
+            insert(article_tags),
+            [{"article_id": article_id, "tag_id": tag_id} for tag_id in added],
+        )
+        db.session.execute(
+            update(Tag)
+            .where(Tag.id.in_(added))
+            .values(article_count=Tag.article_count + 1)
+        )
+    return names
+
+
+def load_tags(articles):
+    """
+    Returns the tag names of articles, with one query.
+
+    Parameters:
+        articles (list): The articles.
+
+    Returns:
+        dict: The sorted tag names of each article, by article ID.
+    """
+    tags = {article.id: [] for article in articles}
+    if tags:
+        for article_id, name in db.session.execute(
+            select(article_tags.c.article_id, Tag.name)
+            .join(Tag, Tag.id == article_tags.c.tag_id)
+            .where(article_tags.c.article_id.in_(tags.keys()))
+            .order_by(Tag.name)
+        ):
+            tags[article_id].append(name)
+    return tags
+
+
 class Article(db.Model):
     """
     Represents an article in the MyBlog application.
@@ -98,13 +581,23 @@ class Article(db.Model):
         author (str): The author of the article.
         created_at (datetime): The timestamp when the article was created.
         updated_at (datetime): The timestamp when the article was last updated.
+        deleted_at (datetime): The timestamp when the article was soft-deleted.
+        version (int): The version of the article, incremented on every update.
+        content_hash (str): The key of the rendering of the content.
+        views (int): The number of reads of the article, flushed periodically
+            by `src.database.views`.
         collections (list): The collections associated with the article.
+        revisions (list): The revisions of the article, one per version.
 
     Methods:
-        insert(): Adds the article to the database and commits the session.
+        insert(tags): Adds the article to the database and commits the session.
         update(): Commits any changes made to the article.
-        delete(): Removes the article from the database and commits the session.
+        update_if_version(article_id, version, tags, **values): Updates an
+            article with a single conditional UPDATE and commits the session.
+        delete(): Marks the article as deleted and commits the session.
         response(): Returns a dictionary representation of the article.
+
+    Every mutation also writes a ChangeEvent in the same transaction.
     """
 
     __tablename__ = "articles"
@@ -119,6 +612,23 @@ class Article(db.Model):
         default=db.func.current_timestamp(),
         onupdate=db.func.current_timestamp(),
     )
+    deleted_at = db.Column(db.DateTime, index=True)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    content_hash = db.Column(db.String(64))
+    views = db.Column(db.BigInteger, nullable=False, default=0, server_default="0")
+
+    # `?sort=popular` reads the first page of this index of the live articles.
+    # Partial, as PostgreSQL cannot return the rows of a range on
+    # `deleted_at IS NULL` already sorted on the next columns
+    __table_args__ = (
+        db.Index(
+            "ix_articles_popular",
+            views.desc(),
+            id,
+            postgresql_where=deleted_at.is_(None),
+            sqlite_where=deleted_at.is_(None),
+        ),
+    )
 
     # Many-to-Many relationship with Collection
     collections = db.relationship(
@@ -127,19 +637,134 @@ class Article(db.Model):
         back_populates="articles",
     )
 
-    def insert(self):
-        """Adds the article to the database and commits the session."""
+    revisions = db.relationship(
+        "ArticleRevision",
+        back_populates="article",
+        lazy="dynamic",
+        order_by="ArticleRevision.number",
+    )
+
+    def insert(self, tags=()):
+        """Adds the article to the database, tagged with `tags`, and commits the session."""
+        rendering = record_rendering(self.content)
+        self.content_hash = rendering.pop("content_hash")
         db.session.add(self)
+        db.session.flush()
+        tags = record_tags(self.id, tags)
+        record_revision(self.id, self.version, self.title, self.content, self.author)
+        record_change(
+            "article",
+            self.id,
+            "created",
+            {**self.response(), **rendering, "tags": tags},
+        )
         db.session.commit()
 
     def update(self):
         """Commits any changes made to the article."""
+        rendering = record_rendering(self.content)
+        self.content_hash = rendering.pop("content_hash")
+        self.version = Article.version + 1
+        db.session.flush()
+        record_revision(self.id, self.version, self.title, self.content, self.author)
+        record_change("article", self.id, "updated", {**self.response(), **rendering})
         db.session.commit()
 
+    @classmethod
+    def update_if_version(cls, article_id, version, tags=None, **values):
+        """
+        Updates an article with a single conditional UPDATE and commits the session.
+
+        The row is only updated when it is not deleted and, if `version` is
+        given, when its version still matches, so concurrent editors cannot
+        overwrite each other and no SELECT is needed beforehand.
+
+        Parameters:
+            article_id (int): The ID of the article to update.
+            version (int): The version the client read, or None to skip the check.
+            tags (list, optional): The new tag names, None to keep the tags.
+            **values: The new column values.
+
+        Returns:
+            int: The new version, or None when no article matched.
+        """
+        conditions = [cls.id == article_id, cls.deleted_at.is_(None)]
+        if version is not None:
+            conditions.append(cls.version == version)
+
+        rendering = {}
+        if "content" in values:
+            rendering = record_rendering(values["content"])
+            values["content_hash"] = rendering.pop("content_hash")
+
+        new_version = db.session.execute(
+            update(cls)
+            .where(*conditions)
+            .values(
+                version=cls.version + 1,
+                updated_at=db.func.current_timestamp(),
+                **values,
+            )
+            .returning(cls.version)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if new_version is None:
+            db.session.rollback()
+            return None
+
+        payload = {"id": article_id, **values, **rendering, "version": new_version}
+        payload.pop("content_hash", None)
+        if tags is not None:
+            payload["tags"] = record_tags(article_id, tags)
+        if {"title", "content", "author"} <= values.keys():
+            record_revision(
+                article_id,
+                new_version,
+                values["title"],
+                values["content"],
+                values["author"],
+            )
+        record_change("article", article_id, "updated", payload)
+        db.session.commit()
+        return new_version
+
     def delete(self):
-        """Removes the article from the database and commits the session."""
-        db.session.delete(self)
+        """
+        Marks the article as deleted and commits the session.
+
+        The row and its collection memberships are left in place so the
+        request does not depend on the article fan-out; they are removed in
+        bounded batches by `purge_deleted_articles()`. Its tags stop counting
+        at once. The soft delete is a conditional UPDATE, so of concurrent
+        deletes of the article only one updates the tag counts and records
+        the change.
+
+        Returns:
+            bool: Whether the article was deleted by this call.
+        """
+        deleted = db.session.execute(
+            update(Article)
+            .where(Article.id == self.id, Article.deleted_at.is_(None))
+            .values(deleted_at=db.func.current_timestamp())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not deleted:
+            db.session.rollback()
+            return False
+        db.session.execute(
+            update(Tag)
+            .where(
+                Tag.id.in_(
+                    select(article_tags.c.tag_id).where(
+                        article_tags.c.article_id == self.id
+                    )
+                )
+            )
+            .values(article_count=Tag.article_count - 1)
+        )
+        record_change("article", self.id, "deleted", {"id": self.id})
         db.session.commit()
+        return True
 
     def response(self):
         """Returns a dictionary representation of the article."""
@@ -148,6 +773,8 @@ class Article(db.Model):
             "title": self.title,
             "content": self.content,
             "author": self.author,
+            "version": self.version,
+            "views": self.views,
         }
 
     def __repr__(self):
@@ -164,13 +791,21 @@ class Collection(db.Model):
         description (str): A description of the collection.
         created_at (datetime): The timestamp when the collection was created.
         updated_at (datetime): The timestamp when the collection was last updated.
-        articles (list): The articles associated with the collection.
+        version (int): The version of the collection, incremented on every update.
+        articles (list): The articles associated with the collection, in order.
 
     Methods:
         insert(): Adds the collection to the database and commits the session.
         update(): Commits any changes made to the collection.
+        update_if_version(collection_id, version, article_ids, **values): Updates
+            a collection with a single conditional UPDATE and commits the session.
+        move_article(collection_id, version, article_id, after_id): Moves one
+            article of a collection and commits the session.
         delete(): Removes the collection from the database and commits the session.
         response(): Returns a dictionary representation of the collection, including article IDs.
+
+    Every mutation also writes a ChangeEvent and refreshes the
+    CollectionListing of the collection in the same transaction.
     """
 
     __tablename__ = "collections"
@@ -184,26 +819,169 @@ class Collection(db.Model):
         default=db.func.current_timestamp(),
         onupdate=db.func.current_timestamp(),
     )
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
 
     # Many-to-Many relationship with Article
     articles = db.relationship(
         "Article",
         secondary=articles_collections,
         back_populates="collections",
+        order_by=[articles_collections.c.position, articles_collections.c.article_id],
     )
 
     def insert(self):
         """Adds the collection to the database and commits the session."""
         db.session.add(self)
+        db.session.flush()
+        _assign_positions(self.id, [article.id for article in self.articles])
+        refresh_collection_listings([self.id])
+        record_change("collection", self.id, "created", self.response())
         db.session.commit()
 
     def update(self):
         """Commits any changes made to the collection."""
+        self.version = Collection.version + 1
+        db.session.flush()
+        _assign_positions(self.id, [article.id for article in self.articles])
+        refresh_collection_listings([self.id])
+        record_change("collection", self.id, "updated", self.response())
         db.session.commit()
 
+    @classmethod
+    def update_if_version(cls, collection_id, version, article_ids, **values):
+        """
+        Updates a collection with a single conditional UPDATE and commits the session.
+
+        The collection row is only updated when, if `version` is given, its
+        version still matches. Its memberships are then replaced by the live
+        articles among `article_ids`, in that order, in the same transaction.
+
+        Parameters:
+            collection_id (int): The ID of the collection to update.
+            version (int): The version the client read, or None to skip the check.
+            article_ids (list): The IDs of the articles of the collection, None
+                to keep its articles.
+            **values: The new column values.
+
+        Returns:
+            int: The new version, or None when no collection matched.
+        """
+        conditions = [cls.id == collection_id]
+        if version is not None:
+            conditions.append(cls.version == version)
+
+        new_version = db.session.execute(
+            update(cls)
+            .where(*conditions)
+            .values(
+                version=cls.version + 1,
+                updated_at=db.func.current_timestamp(),
+                **values,
+            )
+            .returning(cls.version)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if new_version is None:
+            db.session.rollback()
+            return None
+
+        payload = {"id": collection_id, **values, "version": new_version}
+        if article_ids is not None:
+            article_ids = list(dict.fromkeys(article_ids))
+            live = {
+                article_id
+                for (article_id,) in db.session.query(Article.id).filter(
+                    Article.id.in_(article_ids)
+                )
+            }
+            article_ids = [
+                article_id for article_id in article_ids if article_id in live
+            ]
+            db.session.execute(
+                delete(articles_collections).where(
+                    articles_collections.c.collection_id == collection_id
+                )
+            )
+            if article_ids:
+                db.session.execute(
+                    insert(articles_collections),
+                    [
+                        {
+                            "article_id": article_id,
+                            "collection_id": collection_id,
+                            "position": (index + 1) * POSITION_GAP,
+                        }
+                        for index, article_id in enumerate(article_ids)
+                    ],
+                )
+            payload["article_ids"] = article_ids
+
+        refresh_collection_listings([collection_id])
+        record_change("collection", collection_id, "updated", payload)
+        db.session.commit()
+        return new_version
+
+    @classmethod
+    def move_article(cls, collection_id, version, article_id, after_id=None):
+        """
+        Moves an article of a collection and commits the session.
+
+        The article gets a position between `after_id` and the article that
+        follows it, so only its own membership row is updated, whatever the
+        size of the collection. The version of the collection is bumped
+        first, which also serializes concurrent moves in the same collection.
+
+        Parameters:
+            collection_id (int): The ID of the collection.
+            version (int): The version the client read, or None to skip the check.
+            article_id (int): The ID of the article to move, a member of the collection.
+            after_id (int, optional): The ID of the member to move the article
+                after. Defaults to None, which moves the article first.
+
+        Returns:
+            int: The new version, or None when no collection matched.
+        """
+        conditions = [cls.id == collection_id]
+        if version is not None:
+            conditions.append(cls.version == version)
+
+        new_version = db.session.execute(
+            update(cls)
+            .where(*conditions)
+            .values(version=cls.version + 1, updated_at=db.func.current_timestamp())
+            .returning(cls.version)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if new_version is None:
+            db.session.rollback()
+            return None
+
+        position = _position_after(collection_id, article_id, after_id)
+        db.session.execute(
+            update(articles_collections)
+            .where(
+                articles_collections.c.collection_id == collection_id,
+                articles_collections.c.article_id == article_id,
+            )
+            .values(position=position)
+        )
+        refresh_collection_listings([collection_id])
+
+        listing = db.session.get(
+            CollectionListing, collection_id, populate_existing=True
+        )
+        record_change("collection", collection_id, "updated", listing.response())
+        db.session.commit()
+        return new_version
+
     def delete(self):
         """Removes the collection from the database and commits the session."""
+        collection_id = self.id
         db.session.delete(self)
+        db.session.flush()
+        refresh_collection_listings([collection_id])
+        # Rows first, outbox lock last, as in every other write
+        record_change("collection", collection_id, "deleted", {"id": collection_id})
         db.session.commit()
 
     def response(self):
@@ -213,7 +991,460 @@ class Collection(db.Model):
             "title": self.title,
             "description": self.description,
             "article_ids": [article.id for article in self.articles],
+            "version": self.version,
         }
 
     def __repr__(self):
         return f"<Collection {self.id} : {self.title}>"
+
+
+class ChangeEvent(db.Model):
+    """
+    Represents an entry of the transactional outbox.
+
+    One entry is written in the same transaction as every insert, update and
+    delete of an article or a collection. Entries are ordered by `seq`, which
+    downstream consumers use as a cursor to tail the change feed.
+
+    Attributes:
+        seq (int): The monotonically increasing sequence number of the entry.
+        entity (str): The kind of the changed entity ("article" or "collection").
+        entity_id (int): The ID of the changed entity.
+        op (str): The mutation ("created", "updated" or "deleted").
+        payload (dict): The state of the entity after the mutation.
+        created_at (datetime): The timestamp when the entry was written.
+
+    Methods:
+        head(): Returns the sequence number of the latest entry.
+        since(seq, limit): Returns the entries written after the given sequence number.
+        prune(before, batch_size): Deletes the entries written before a date.
+        response(): Returns a dictionary representation of the entry.
+    """
+
+    __tablename__ = "change_events"
+
+    seq = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(40), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(20), nullable=False)
+    payload = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    @classmethod
+    def head(cls):
+        """Returns the sequence number of the latest entry, 0 when there is none."""
+        return db.session.query(db.func.max(cls.seq)).scalar() or 0
+
+    @classmethod
+    def since(cls, seq, limit):
+        """Returns at most `limit` entries with a sequence number above `seq`."""
+        return cls.query.filter(cls.seq > seq).order_by(cls.seq).limit(limit).all()
+
+    @classmethod
+    def prune(cls, before, batch_size=1000):
+        """
+        Deletes the entries written before `before`, oldest first, and commits.
+
+        Entries are read in primary key order, `batch_size` per transaction,
+        until one is recent enough. The latest entry is always kept: SQLite
+        hands out the highest deleted key again, which would move the
+        sequence numbers back under the cursors of the consumers.
+
+        Parameters:
+            before (datetime): The UTC time before which entries are deleted.
+            batch_size (int, optional): Maximum number of entries deleted per
+                transaction.
+
+        Returns:
+            int: The number of entries deleted.
+        """
+        head = cls.head()
+        pruned = 0
+        while True:
+            rows = db.session.execute(
+                select(cls.seq, cls.created_at)
+                .where(cls.seq < head)
+                .order_by(cls.seq)
+                .limit(batch_size)
+            ).all()
+            # Entries are written in order, stop at the first recent one
+            old = [seq for seq, _ in takewhile(lambda row: row[1] < before, rows)]
+            if old:
+                db.session.execute(delete(cls).where(cls.seq.between(old[0], old[-1])))
+                pruned += len(old)
+            db.session.commit()
+            if len(old) < batch_size:
+                return pruned
+
+    def response(self):
+        """Returns a dictionary representation of the entry."""
+        return {
+            "seq": self.seq,
+            "entity": self.entity,
+            "entity_id": self.entity_id,
+            "op": self.op,
+            "payload": self.payload,
+        }
+
+    def __repr__(self):
+        return f"<ChangeEvent {self.seq} : {self.op} {self.entity} {self.entity_id}>"
+
+
+class Job(db.Model):
+    """
+    Represents a unit of background work in the job queue.
+
+    Jobs are claimed by the worker pool of `src.jobs.queue`. A job that is
+    still running after the visibility timeout is considered abandoned and
+    can be claimed again, until its attempts run out. Successful jobs are
+    deleted, failed ones are kept for inspection.
+
+    Attributes:
+        id (int): The unique identifier for the job.
+        name (str): The name of the registered task to run.
+        payload (dict): The keyword arguments of the task.
+        status (str): "queued", "running" or "failed".
+        attempts (int): The number of times the job was claimed.
+        max_attempts (int): The number of attempts before the job fails.
+        run_at (datetime): The UTC time before which the job is not claimed.
+        locked_at (datetime): The UTC time when the job was last claimed.
+        last_error (str): The error raised by the last attempt.
+        tenant (str): The blog the job runs for, None for a single blog.
+        created_at (datetime): The timestamp when the job was enqueued.
+
+    Methods:
+        response(): Returns a dictionary representation of the job.
+    """
+
+    __tablename__ = "jobs"
+    __table_args__ = (db.Index("ix_jobs_status_run_at", "status", "run_at"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(80), nullable=False)
+    payload = db.Column(db.JSON)
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False)
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    tenant = db.Column(db.String(40))
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    def response(self):
+        """Returns a dictionary representation of the job."""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "tenant": self.tenant,
+            "payload": self.payload,
+            "status": self.status,
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+        }
+
+    def __repr__(self):
+        return f"<Job {self.id} : {self.name} {self.status}>"
+
+
+class ArticleRevision(db.Model):
+    """
+    Represents one version of an article.
+
+    Revision numbers are the versions of the article. The content is stored
+    zlib-compressed, either in full (`kind` "full") or as a delta against the
+    previous revision (`kind` "delta"). Revisions 1, 1 + N, 1 + 2N, ... stay
+    full snapshots, so rebuilding any revision applies at most N - 1 deltas
+    (see `src.database.revisions`).
+
+    Attributes:
+        id (int): The unique identifier for the revision.
+        article_id (int): The ID of the article.
+        number (int): The revision number, unique per article.
+        kind (str): "full" or "delta".
+        title (str): The title of the article in this revision.
+        author (str): The author of the article in this revision.
+        data (bytes): The compressed content or delta.
+        created_at (datetime): The timestamp when the revision was recorded.
+
+    Methods:
+        response(): Returns a dictionary representation of the revision, without content.
+    """
+
+    __tablename__ = "article_revisions"
+    __table_args__ = (
+        db.UniqueConstraint("article_id", "number", name="uq_article_revisions"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    article_id = db.Column(db.Integer, db.ForeignKey("articles.id"), nullable=False)
+    number = db.Column(db.Integer, nullable=False)
+    kind = db.Column(db.String(10), nullable=False)
+    title = db.Column(db.String(120), nullable=False)
+    author = db.Column(db.String(80), nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    article = db.relationship("Article", back_populates="revisions")
+
+    def response(self):
+        """Returns a dictionary representation of the revision, without content."""
+        return {
+            "number": self.number,
+            "title": self.title,
+            "author": self.author,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
+
+    def __repr__(self):
+        return f"<ArticleRevision {self.article_id}.{self.number} : {self.kind}>"
+
+
+class RenderedContent(db.Model):
+    """
+    Represents the rendering of an article content, cached by content hash.
+
+    Rows are immutable: a new content gets a new hash, hence a new row, and
+    `RENDER_VERSION` is part of the hash so changing the renderer invalidates
+    every row at once (see `src.database.render`).
+
+    Attributes:
+        content_hash (str): The hash of the content, primary key.
+        html (str): The sanitized HTML rendering of the Markdown content.
+        excerpt (str): The beginning of the content as plain text.
+        reading_time (int): The estimated reading time in minutes.
+        created_at (datetime): The timestamp when the content was rendered.
+
+    Methods:
+        response(html): Returns a dictionary representation of the rendering.
+    """
+
+    __tablename__ = "rendered_contents"
+
+    content_hash = db.Column(db.String(64), primary_key=True)
+    html = db.Column(db.Text, nullable=False)
+    excerpt = db.Column(db.Text, nullable=False)
+    reading_time = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    def response(self, html=False):
+        """Returns the excerpt and reading time, and the HTML when `html` is set."""
+        response = {"excerpt": self.excerpt, "reading_time": self.reading_time}
+        if html:
+            response["content_html"] = self.html
+        return response
+
+    def __repr__(self):
+        return f"<RenderedContent {self.content_hash[:12]}>"
+
+
+class CollectionListing(db.Model):
+    """
+    Represents the precomputed listing row of a collection.
+
+    A projection of `collections` and `articles_collections` maintained by
+    `refresh_collection_listings()`, so that the collections listing reads one
+    row per collection, in primary key order, without joining memberships.
+    Articles soft-deleted after the row was refreshed are still listed in
+    `article_ids` until the purge job refreshes it; `page()` filters them out.
+
+    Attributes:
+        collection_id (int): The ID of the collection, primary key.
+        title (str): The title of the collection.
+        description (str): A description of the collection.
+        version (int): The version of the collection.
+        article_count (int): The number of articles of the collection.
+        article_ids (list): The IDs of the articles of the collection, in order.
+
+    Methods:
+        page(page, per_page): Returns one page of the collections listing.
+        response(hidden): Returns a dictionary representation of the collection.
+    """
+
+    __tablename__ = "collection_listings"
+
+    collection_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    title = db.Column(db.String(120), nullable=False)
+    description = db.Column(db.Text, nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    article_count = db.Column(db.Integer, nullable=False)
+    article_ids = db.Column(db.JSON, nullable=False)
+
+    @classmethod
+    def page(cls, page, per_page):
+        """
+        Returns one page of the collections listing, with two indexed reads.
+
+        Only the articles listed on the page are checked for soft deletion,
+        by primary key, however many deleted articles await the purge.
+
+        Parameters:
+            page (int): The page number, starting at 1.
+            per_page (int): The number of collections per page.
+
+        Returns:
+            list: The dictionary representations of the collections.
+        """
+        listings = (
+            cls.query.order_by(cls.collection_id)
+            .limit(per_page)
+            .offset((page - 1) * per_page)
+            .all()
+        )
+        # Soft-deleted articles of the page not purged yet, usually none
+        listed = {
+            article_id for listing in listings for article_id in listing.article_ids
+        }
+        hidden = set()
+        if listed:
+            hidden = {
+                article_id
+                for (article_id,) in db.session.query(Article.id)
+                .filter(Article.id.in_(listed), Article.deleted_at.isnot(None))
+                .execution_options(include_deleted=True)
+            }
+        return [listing.response(hidden) for listing in listings]
+
+    def response(self, hidden=frozenset()):
+        """Returns a dictionary representation of the collection, without `hidden` articles."""
+        article_ids = [
+            article_id for article_id in self.article_ids if article_id not in hidden
+        ]
+        return {
+            "id": self.collection_id,
+            "title": self.title,
+            "description": self.description,
+            "article_count": len(article_ids),
+            "article_ids": article_ids,
+            "version": self.version,
+        }
+
+    def __repr__(self):
+        return f"<CollectionListing {self.collection_id} : {self.title}>"
+
+
+def create_tenant(name):
+    """
+    Registers a blog and creates its tables.
+
+    In schema mode the schema of the blog is created in the application
+    database. In database mode the database at `TENANT_DATABASE_URL` must
+    already exist, only its tables are created.
+
+    Parameters:
+        name (str): The tenant, a valid name (see `valid_tenant_name`).
+    """
+    mode = tenant_mode()
+    engine = tenant_engine(db.engine, name)
+    if mode == "schema":
+        with db.engine.begin() as connection:
+            connection.execute(
+                text(f'CREATE SCHEMA IF NOT EXISTS "{tenant_schema(name)}"')
+            )
+    tables = [
+        table for table in db.metadata.sorted_tables if table.name not in SHARED_TABLES
+    ]
+    db.metadata.create_all(bind=engine, tables=tables)
+
+    db.session.execute(_insert_ignore(Tenant).values(name=name))
+    db.session.commit()
+    _known_tenants.pop(name, None)
+
+
+# Seconds a lookup of the tenant registry is trusted, when the blog exists
+# and when it does not: other processes only see a new blog once its miss
+# expired, so misses are kept just long enough to absorb floods
+TENANT_CACHE_TTL = 60
+TENANT_MISS_CACHE_TTL = 1
+TENANT_CACHE_SIZE = 10_000
+_known_tenants = {}
+
+
+def activate_tenant(name):
+    """
+    Selects a registered blog for the current request or job.
+
+    Lookups of the registry are cached for `TENANT_CACHE_TTL` seconds, so
+    resolving the tenant of a request does not cost a query. Unknown names
+    are only cached for `TENANT_MISS_CACHE_TTL` seconds: requests for unknown
+    hosts cost at most one query per name and second in each process, and a
+    blog created by another process is found at most that late.
+
+    Parameters:
+        name (str): The tenant named by the request.
+
+    Returns:
+        bool: Whether the tenant exists and was selected.
+    """
+    if not valid_tenant_name(name):
+        return False
+
+    now = time.monotonic()
+    cached = _known_tenants.get(name)
+    if cached is not None and cached[0] > now:
+        exists = cached[1]
+    else:
+        exists = db.session.get(Tenant, name) is not None
+        if len(_known_tenants) >= TENANT_CACHE_SIZE:
+            _known_tenants.clear()
+        ttl = TENANT_CACHE_TTL if exists else TENANT_MISS_CACHE_TTL
+        _known_tenants[name] = (now + ttl, exists)
+
+    if exists:
+        set_tenant(name)
+    return exists
+
+
+class Tenant(db.Model):
+    """
+    Represents a blog hosted by a multi-tenant deployment.
+
+    The registry lives in the application database (see `SHARED_TABLES`);
+    requests for a tenant that is not registered are rejected before any
+    connection to its database is opened.
+
+    Attributes:
+        name (str): The name of the tenant, primary key.
+        created_at (datetime): The timestamp when the tenant was created.
+    """
+
+    __tablename__ = "tenants"
+
+    name = db.Column(db.String(40), primary_key=True)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    def __repr__(self):
+        return f"<Tenant {self.name}>"
+
+
+class Tag(db.Model):
+    """
+    Represents a tag of articles.
+
+    `article_count` is maintained by `record_tags()` and `Article.delete()`
+    in the transaction of each write, so listings of tags and facet counts
+    of the unfiltered listing read it instead of counting `article_tags`.
+
+    Attributes:
+        id (int): The unique identifier for the tag.
+        name (str): The normalized name of the tag, unique.
+        article_count (int): The number of live articles with the tag.
+
+    Methods:
+        response(): Returns a dictionary representation of the tag.
+    """
+
+    __tablename__ = "tags"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False, unique=True)
+    article_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0", index=True
+    )
+
+    def response(self):
+        """Returns a dictionary representation of the tag."""
+        return {"name": self.name, "article_count": self.article_count}
+
+    def __repr__(self):
+        return f"<Tag {self.id} : {self.name}>"
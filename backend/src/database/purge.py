@@ -0,0 +1,134 @@
+"""
+Background purge of soft-deleted articles.
+
+Deleting an article only sets its `deleted_at` column, so the DELETE request
+does not depend on how many collections the article belongs to. This module
+removes the `articles_collections` rows of soft-deleted articles in bounded
+batches, each in its own short transaction, and then the article rows
+themselves. It runs as a job of the background queue (`src.jobs.tasks`).
+Renderings no article points to anymore are removed with `flask purge-articles`.
+
+Functions:
+- purge_article(article_id, batch_size): Purges one soft-deleted article.
+- purge_deleted_articles(batch_size): Purges every soft-deleted article.
+- purge_unused_renderings(): Removes the renderings of replaced contents.
+"""
+
+from sqlalchemy import delete, select
+
+from src.database.models import (
+    db,
+    Article,
+    ArticleRevision,
+    RenderedContent,
+    article_tags,
+    articles_collections,
+    refresh_collection_listings,
+)
+
+PURGE_BATCH_SIZE = 500
+
+
+def purge_article(article_id, batch_size=PURGE_BATCH_SIZE):
+    """
+    Removes a soft-deleted article and its collection memberships.
+
+    Memberships are deleted at most `batch_size` rows per transaction, so
+    locks are held briefly even for articles that belong to thousands of
+    collections, and the listing rows of these collections are refreshed in
+    the same transaction. The article row, its revisions and its tags are
+    deleted once no membership is left.
+    Articles that are not soft-deleted are left untouched.
+
+    Parameters:
+        article_id (int): The ID of the soft-deleted article.
+        batch_size (int, optional): Maximum number of association rows
+            deleted per transaction.
+
+    Returns:
+        bool: Whether the article was purged.
+    """
+    deleted = (
+        db.session.query(Article.id)
+        .filter(Article.id == article_id, Article.deleted_at.isnot(None))
+        .execution_options(include_deleted=True)
+        .scalar()
+    )
+    if deleted is None:
+        return False
+
+    while True:
+        collection_ids = (
+            db.session.execute(
+                select(articles_collections.c.collection_id)
+                .where(articles_collections.c.article_id == article_id)
+                .limit(batch_size)
+            )
+            .scalars()
+            .all()
+        )
+        if not collection_ids:
+            break
+        db.session.execute(
+            delete(articles_collections).where(
+                articles_collections.c.article_id == article_id,
+                articles_collections.c.collection_id.in_(collection_ids),
+            )
+        )
+        refresh_collection_listings(collection_ids)
+        db.session.commit()
+
+    db.session.execute(
+        delete(ArticleRevision).where(ArticleRevision.article_id == article_id)
+    )
+    # Tag counts already left the article out when it was soft-deleted
+    db.session.execute(
+        delete(article_tags).where(article_tags.c.article_id == article_id)
+    )
+    db.session.execute(
+        delete(Article).where(Article.id == article_id, Article.deleted_at.isnot(None))
+    )
+    db.session.commit()
+    return True
+
+
+def purge_deleted_articles(batch_size=PURGE_BATCH_SIZE):
+    """
+    Removes every soft-deleted article and its collection memberships.
+
+    Parameters:
+        batch_size (int, optional): Maximum number of association rows
+            deleted per transaction.
+
+    Returns:
+        int: The number of articles purged.
+    """
+    article_ids = (
+        db.session.query(Article.id)
+        .filter(Article.deleted_at.isnot(None))
+        .order_by(Article.id)
+        .execution_options(include_deleted=True)
+        .all()
+    )
+    return sum(purge_article(article_id, batch_size) for (article_id,) in article_ids)
+
+
+def purge_unused_renderings():
+    """
+    Removes the cached renderings that no article points to.
+
+    Every edit of a content leaves the rendering of the previous content
+    behind. Renderings are cheap to recompute, so the ones still referenced
+    by a soft-deleted article are removed as well.
+
+    Returns:
+        int: The number of renderings removed.
+    """
+    used = select(Article.content_hash).where(
+        Article.content_hash.isnot(None), Article.deleted_at.is_(None)
+    )
+    result = db.session.execute(
+        delete(RenderedContent).where(RenderedContent.content_hash.not_in(used))
+    )
+    db.session.commit()
+    return result.rowcount
@@ -0,0 +1,77 @@
+"""
+Server-side rendering of article content.
+
+Articles are written in Markdown. This module turns the content into
+sanitized HTML, a plain text excerpt and an estimated reading time. The
+result only depends on the content, so it is cached by `content_hash` in the
+`rendered_contents` table (see `record_rendering` in `src.database.models`).
+
+Functions:
+- content_hash(content): Returns the cache key of a content.
+- render_content(content): Returns the HTML, excerpt and reading time of a content.
+"""
+
+import hashlib
+import math
+import re
+from html import unescape
+
+# Part of the cache key. When the output of `render_content` changes, bump it
+# and reset `articles.content_hash` to NULL so that rows are rendered again
+RENDER_VERSION = 1
+MARKDOWN_EXTENSIONS = ["fenced_code", "tables", "sane_lists"]
+EXCERPT_LENGTH = 200
+WORDS_PER_MINUTE = 200
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def content_hash(content):
+    """
+    Returns the cache key of a content.
+
+    Parameters:
+        content (str): The Markdown content of an article.
+
+    Returns:
+        str: The hex SHA-256 of the content and of `RENDER_VERSION`.
+    """
+    key = f"{RENDER_VERSION}\0{content}".encode("utf-8")
+    return hashlib.sha256(key).hexdigest()
+
+
+def _excerpt(text):
+    """Returns the start of a plain text, cut at a word boundary."""
+    if len(text) <= EXCERPT_LENGTH:
+        return text
+    cut = text[:EXCERPT_LENGTH].rsplit(" ", 1)[0]
+    return cut.rstrip(" .,;:") + "…"
+
+
+def render_content(content):
+    """
+    Renders Markdown content to sanitized HTML.
+
+    The HTML is cleaned with an allow-list of tags and attributes, so raw
+    HTML or scripts in the content never reach the readers' browsers.
+
+    Parameters:
+        content (str): The Markdown content of an article.
+
+    Returns:
+        dict: The `html`, the plain text `excerpt` and the `reading_time`
+            in minutes (at least 1).
+    """
+    # Imported here so that loading the app does not pay for the parsers
+    import markdown
+    import nh3
+
+    html = nh3.clean(markdown.markdown(content, extensions=MARKDOWN_EXTENSIONS))
+    text = unescape(_WHITESPACE.sub(" ", nh3.clean(html, tags=set()))).strip()
+    words = len(text.split())
+
+    return {
+        "html": html,
+        "excerpt": _excerpt(text),
+        "reading_time": max(1, math.ceil(words / WORDS_PER_MINUTE)),
+    }
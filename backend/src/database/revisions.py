@@ -0,0 +1,135 @@
+"""
+Revision history of articles, stored as compressed deltas.
+
+Every write records the new content of the article as a compressed full
+copy (see `record_revision` in `src.database.models`). A background job then
+compacts the history: each revision that is not a snapshot is replaced by
+the delta against the previous revision. Revisions 1, 1 + N, 1 + 2N, ...
+(N = `SNAPSHOT_INTERVAL`) stay full, so rebuilding any revision reads at most
+N rows and applies at most N - 1 deltas, whatever the length of the history.
+
+Functions:
+- is_snapshot(number): Whether a revision is kept as a full snapshot.
+- get_revision_content(article_id, number): Rebuilds the content of a revision.
+- compact_revisions(article_id): Replaces full copies by deltas.
+"""
+
+from src.database.delta import apply_delta, decompress, make_delta
+from src.database.models import db, ArticleRevision
+
+SNAPSHOT_INTERVAL = 20
+
+
+def is_snapshot(number):
+    """Whether revision `number` is kept as a full snapshot."""
+    return (number - 1) % SNAPSHOT_INTERVAL == 0
+
+
+def _snapshot_before(number):
+    """Returns the number of the closest snapshot at or before `number`."""
+    return (number - 1) // SNAPSHOT_INTERVAL * SNAPSHOT_INTERVAL + 1
+
+
+def _contents(revisions):
+    """Yields each revision with its content, walking forward from a full copy."""
+    content = None
+    for revision in revisions:
+        if revision.kind == "full":
+            content = decompress(revision.data)
+        else:
+            content = apply_delta(content, revision.data)
+        yield revision, content
+
+
+def get_revision_content(article_id, number):
+    """
+    Rebuilds the content of a revision.
+
+    Parameters:
+        article_id (int): The ID of the article.
+        number (int): The revision number.
+
+    Returns:
+        str: The content of the revision, or None when it does not exist.
+    """
+    revisions = (
+        ArticleRevision.query.filter(
+            ArticleRevision.article_id == article_id,
+            ArticleRevision.number.between(_snapshot_before(number), number),
+        )
+        .order_by(ArticleRevision.number)
+        .all()
+    )
+    if not revisions or revisions[-1].number != number:
+        return None
+
+    # Start from the last full copy, the snapshot or a not yet compacted revision
+    start = max(
+        (index for index, revision in enumerate(revisions) if revision.kind == "full"),
+        default=None,
+    )
+    if start is None:
+        return None
+    content = None
+    for _, content in _contents(revisions[start:]):
+        pass
+    return content
+
+
+def compact_revisions(article_id):
+    """
+    Replaces the full copies of non-snapshot revisions by deltas and commits.
+
+    Only the revisions from the snapshot preceding the first full copy to
+    compact are read, so the work per call is bounded by the edits since the
+    last compaction. The first revision of an article stays full whatever its
+    number: articles written before the history existed start above 1.
+
+    Parameters:
+        article_id (int): The ID of the article.
+
+    Returns:
+        int: The number of revisions compacted.
+    """
+    oldest = (
+        db.session.query(db.func.min(ArticleRevision.number))
+        .filter(ArticleRevision.article_id == article_id)
+        .scalar_subquery()
+    )
+    first = (
+        db.session.query(db.func.min(ArticleRevision.number))
+        .filter(
+            ArticleRevision.article_id == article_id,
+            ArticleRevision.kind == "full",
+            ArticleRevision.number > oldest,
+            (ArticleRevision.number - 1) % SNAPSHOT_INTERVAL != 0,
+        )
+        .scalar()
+    )
+    if first is None:
+        return 0
+
+    revisions = (
+        ArticleRevision.query.filter(
+            ArticleRevision.article_id == article_id,
+            ArticleRevision.number >= _snapshot_before(first - 1),
+        )
+        .order_by(ArticleRevision.number)
+        .all()
+    )
+
+    compacted = 0
+    previous = None
+    for revision, content in _contents(revisions):
+        if (
+            revision.kind == "full"
+            and previous is not None
+            and not is_snapshot(revision.number)
+        ):
+            revision.data = make_delta(previous, content)
+            revision.kind = "delta"
+            compacted += 1
+        previous = content
+
+    db.session.commit()
+    return compacted
@@ -0,0 +1,136 @@
+"""
+Tag filters and facets of the articles listing.
+
+`article_tags` is an inverted index from tags to articles. A filter on
+several tags is resolved by the database with set operations on the index,
+one indexed range per tag:
+- all: the articles having every tag, an INTERSECT of the ranges.
+- any: the articles having at least one of the tags, a UNION of the ranges.
+
+Facets count, for each tag, the articles of the current filter that have
+it. Without a filter they are the precomputed `Tag.article_count`.
+
+Functions:
+- parse_tags(names): Returns normalized tag names.
+- tagged_article_ids(names, match): Returns a select of the matching articles.
+- tag_facets(article_ids, limit): Returns the tags of a set of articles, with counts.
+- refresh_tag_counts(): Recomputes the precomputed counts of every tag.
+"""
+
+from sqlalchemy import func, intersect, select, union, update
+
+from src.database.models import db, Article, Tag, article_tags
+
+TAG_MATCHES = ("all", "any")
+TAG_MAX_LENGTH = 50
+TAG_FILTER_MAX = 10
+TAG_FACETS_LIMIT = 20
+
+
+def parse_tags(names):
+    """
+    Returns normalized tag names: trimmed, lowercase, whitespace collapsed.
+
+    Parameters:
+        names (list): The tag names given by a client.
+
+    Returns:
+        list: The distinct names, in their first order.
+
+    Raises:
+        ValueError: When a name is not a string, is empty, holds a comma or
+            is longer than `TAG_MAX_LENGTH`.
+    """
+    tags = []
+    for name in names:
+        if not isinstance(name, str):
+            raise ValueError("Tags must be strings")
+        name = " ".join(name.split()).lower()
+        if not name or "," in name or len(name) > TAG_MAX_LENGTH:
+            raise ValueError(
+                f"Tags must be 1 to {TAG_MAX_LENGTH} characters, without commas"
+            )
+        if name not in tags:
+            tags.append(name)
+    return tags
+
+
+def tagged_article_ids(names, match="all"):
+    """
+    Returns a select of the IDs of the articles tagged with `names`.
+
+    Soft-deleted articles are not filtered out here, select the articles
+    whose ID is in the result.
+
+    Parameters:
+        names (list): Normalized tag names.
+        match (str): "all" to match every tag, "any" to match at least one.
+
+    Returns:
+        Select: The select of the article IDs, empty when no tag matches.
+    """
+    tag_ids = [
+        tag_id
+        for (tag_id,) in db.session.execute(select(Tag.id).where(Tag.name.in_(names)))
+    ]
+    if not tag_ids or (match == "all" and len(tag_ids) < len(names)):
+        # An unknown tag matches nothing
+        return select(article_tags.c.article_id).where(False)
+
+    ranges = [
+        select(article_tags.c.article_id).where(article_tags.c.tag_id == tag_id)
+        for tag_id in tag_ids
+    ]
+    if len(ranges) == 1:
+        return ranges[0]
+    return (intersect if match == "all" else union)(*ranges)
+
+
+def tag_facets(article_ids=None, limit=TAG_FACETS_LIMIT):
+    """
+    Returns the most frequent tags of a set of articles.
+
+    Parameters:
+        article_ids (Select, optional): The select of the IDs of live articles,
+            None for every article, in which case the precomputed counts are read.
+        limit (int, optional): The maximum number of tags returned.
+
+    Returns:
+        list: The `name` and `count` of the tags, most frequent first.
+    """
+    if article_ids is None:
+        counts = (
+            select(Tag.name, Tag.article_count)
+            .where(Tag.article_count > 0)
+            .order_by(Tag.article_count.desc(), Tag.name)
+        )
+    else:
+        count = func.count(article_tags.c.article_id)
+        counts = (
+            select(Tag.name, count)
+            .join(article_tags, article_tags.c.tag_id == Tag.id)
+            .where(article_tags.c.article_id.in_(article_ids))
+            .group_by(Tag.id, Tag.name)
+            .order_by(count.desc(), Tag.name)
+        )
+    return [
+        {"name": name, "count": count}
+        for name, count in db.session.execute(counts.limit(limit))
+    ]
+
+
+def refresh_tag_counts():
+    """
+    Recomputes `Tag.article_count` from `article_tags`, in the current session.
+
+    The counts are maintained by every write, this repairs them after
+    changes made outside of the models, e.g. by hand in the database.
+    """
+    live = (
+        select(func.count())
+        .select_from(article_tags)
+        .join(Article, Article.id == article_tags.c.article_id)
+        .where(article_tags.c.tag_id == Tag.id, Article.deleted_at.is_(None))
+        .scalar_subquery()
+    )
+    db.session.execute(update(Tag).values(article_count=live))
@@ -0,0 +1,263 @@
+"""
+Routing of database sessions to the blog (tenant) being served.
+
+One deployment can host many blogs. The tenant of the current request or
+job is held in a context variable, and the session picks the database of
+that tenant each time it needs a connection. `TENANT_MODE` selects where
+the data of a tenant lives:
+- single (default): one blog, every table in the application database.
+- schema: one PostgreSQL schema per tenant (`blog_<tenant>`) in the
+  application database. All tenants share the connection pool, statements
+  are rewritten with `schema_translate_map`.
+- database: one database per tenant, at `TENANT_DATABASE_URL` formatted with
+  the tenant name. Engines are kept in an LRU of `TENANT_ENGINES_MAX`
+  entries with `TENANT_POOL_SIZE` connections each, so a worker never holds
+  more than their product, whatever the number of tenants.
+
+The tables in `SHARED_TABLES` (the tenant registry and the job queue) always
+live in the application database.
+
+Classes:
+- NoTenantSelected: Raised when a tenant table is used without a tenant.
+- EngineLRU: Bounded cache of the engines of the tenants.
+- TenantSession: Session routing every statement to the current tenant.
+
+Functions:
+- multi_tenant(): Whether the deployment hosts several blogs.
+- current_tenant(): Returns the tenant of the current context.
+- set_tenant(name): Sets the tenant of the current context.
+- tenant_context(name): Context manager running a block for a tenant.
+- valid_tenant_name(name): Whether a string can name a tenant.
+- tenant_from_host(host): Returns the tenant named by a host name.
+- tenant_schema(name): Returns the PostgreSQL schema of a tenant.
+- tenant_engine(default_engine, name): Returns the engine of a tenant.
+- dispose_tenant_engines(close): Drops the cached engines.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import sqlalchemy as sa
+from flask_sqlalchemy.session import Session
+
+from src.settings import getenv
+
+TENANT_MODES = ("single", "schema", "database")
+TENANT_SCHEMA_PREFIX = "blog_"
+SHARED_TABLES = frozenset({"tenants", "jobs"})
+
+_TENANT_NAME = re.compile(r"^[a-z][a-z0-9_]{0,39}$")
+
+_current_tenant = ContextVar("tenant", default=None)
+
+
+def tenant_mode():
+    """Returns the `TENANT_MODE` of the deployment."""
+    mode = getenv("TENANT_MODE", "single")
+    if mode not in TENANT_MODES:
+        raise ValueError(f"Unknown TENANT_MODE {mode}, use one of {TENANT_MODES}")
+    return mode
+
+
+def multi_tenant():
+    """Whether the deployment hosts several blogs."""
+    return tenant_mode() != "single"
+
+
+def current_tenant():
+    """Returns the tenant of the current context, or None."""
+    return _current_tenant.get()
+
+
+def set_tenant(name):
+    """Sets the tenant of the current context, None to clear it."""
+    _current_tenant.set(name)
+
+
+@contextmanager
+def tenant_context(name):
+    """Runs the enclosed block for the tenant `name`, e.g. in a job."""
+    token = _current_tenant.set(name)
+    try:
+        yield
+    finally:
+        _current_tenant.reset(token)
+
+
+def valid_tenant_name(name):
+    """Whether `name` can name a tenant, and hence a schema or a database."""
+    return isinstance(name, str) and _TENANT_NAME.match(name) is not None
+
+
+def tenant_from_host(host):
+    """
+    Returns the tenant named by the `Host` of a request.
+
+    With `TENANT_HOST_SUFFIX` set to ".blogs.example.com", the host
+    "my-blog.blogs.example.com" names the tenant "my_blog".
+
+    Returns:
+        str: The tenant name, or None when the host names no tenant.
+    """
+    suffix = getenv("TENANT_HOST_SUFFIX")
+    host = host.split(":", 1)[0].lower()
+    if not suffix or not host.endswith(suffix):
+        return None
+    label = host[: -len(suffix)]
+    if "." in label:
+        return None
+    name = label.replace("-", "_")
+    return name if valid_tenant_name(name) else None
+
+
+def tenant_schema(name):
+    """Returns the PostgreSQL schema holding the tables of the tenant `name`."""
+    return f"{TENANT_SCHEMA_PREFIX}{name}"
+
+
+class NoTenantSelected(Exception):
+    """Raised when a tenant table is used before a tenant is selected."""
+
+
+class EngineLRU:
+    """
+    Bounded cache of the engines of the tenants, least recently used first out.
+
+    Evicted engines are disposed: idle connections are closed at once and the
+    ones in use are closed when they are returned.
+
+    Attributes:
+        max_size (int): The maximum number of engines kept.
+        dispose (bool): Whether evicted engines own their pool and are disposed.
+
+    Methods:
+        get(name, factory): Returns the engine of a tenant, creating it if needed.
+        clear(close): Disposes every engine.
+    """
+
+    def __init__(self, max_size, dispose=True):
+        self.max_size = max_size
+        self.dispose = dispose
+        self._engines = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name, factory):
+        """Returns the engine of the tenant `name`, created by `factory(name)` on a miss."""
+        with self._lock:
+            engine = self._engines.get(name)
+            if engine is not None:
+                self._engines.move_to_end(name)
+                return engine
+
+        engine = factory(name)
+        evicted = []
+        with self._lock:
+            if name in self._engines:
+                # Another thread created it first, keep a single pool
+                evicted.append(engine)
+                engine = self._engines[name]
+                self._engines.move_to_end(name)
+            else:
+                self._engines[name] = engine
+                while len(self._engines) > self.max_size:
+                    evicted.append(self._engines.popitem(last=False)[1])
+        if self.dispose:
+            for stale in evicted:
+                stale.dispose()
+        return engine
+
+    def clear(self, close=True):
+        """Disposes every engine, `close=False` after a fork."""
+        with self._lock:
+            engines = list(self._engines.values())
+            self._engines.clear()
+        if self.dispose:
+            for engine in engines:
+                engine.dispose(close=close)
+
+    def __len__(self):
+        return len(self._engines)
+
+
+_engines = EngineLRU(int(getenv("TENANT_ENGINES_MAX", "32")))
+# Views of the default engine, sharing its pool; reused so that a session
+# keeps one connection per tenant
+_schema_engines = EngineLRU(1024, dispose=False)
+
+
+def _create_tenant_engine(name):
+    """Creates the engine of a tenant in database mode."""
+    return sa.create_engine(
+        getenv("TENANT_DATABASE_URL").format(tenant=name),
+        pool_size=int(getenv("TENANT_POOL_SIZE", "2")),
+        max_overflow=0,
+        pool_pre_ping=True,
+    )
+
+
+def tenant_engine(default_engine, name):
+    """
+    Returns the engine holding the tables of a tenant.
+
+    Parameters:
+        default_engine (Engine): The engine of the application database.
+        name (str): The tenant.
+
+    Returns:
+        Engine: The engine to use for the tenant.
+    """
+    mode = tenant_mode()
+    if mode == "schema":
+        # Shares the pool of the default engine, only the schema differs
+        return _schema_engines.get(
+            (default_engine, name),
+            lambda key: default_engine.execution_options(
+                schema_translate_map={None: tenant_schema(name)}
+            ),
+        )
+    if mode == "database":
+        return _engines.get(name, _create_tenant_engine)
+    return default_engine
+
+
+def dispose_tenant_engines(close=True):
+    """Drops the cached engines of the tenants, `close=False` after a fork."""
+    _engines.clear(close=close)
+    _schema_engines.clear(close=close)
+
+
+def _table_of(mapper, clause):
+    """Returns the table a statement is about, when known."""
+    if mapper is not None:
+        return sa.inspect(mapper).local_table
+    if isinstance(clause, sa.Table):
+        return clause
+    if isinstance(clause, sa.UpdateBase) and isinstance(clause.table, sa.Table):
+        return clause.table
+    return None
+
+
+class TenantSession(Session):
+    """
+    Session routing every statement to the database of the current tenant.
+
+    Statements on `SHARED_TABLES` keep the application database. Outside of
+    a multi-tenant deployment the session behaves like the default one.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or not multi_tenant():
+            return engine
+
+        table = _table_of(mapper, clause)
+        if table is not None and table.name in SHARED_TABLES:
+            return engine
+
+        name = current_tenant()
+        if name is None:
+            raise NoTenantSelected(f"No tenant selected to access {table}")
+        return tenant_engine(engine, name)
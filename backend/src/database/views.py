@@ -0,0 +1,161 @@
+"""
+Coalesced view counters of the articles.
+
+Counting each read of an article with its own UPDATE would turn every read
+into a write, and every read of a popular article into a wait on the same
+row lock. Views are instead added up in memory, per process, and flushed
+every `VIEWS_FLUSH_INTERVAL` seconds with one batched
+`UPDATE articles SET views = views + :delta WHERE id = :id` per blog.
+
+`Article.views` is therefore up to one interval behind. Pending views are
+flushed when the counter is stopped: by gunicorn's `worker_exit` hook (see
+`src/gunicorn_conf.py`) and at interpreter exit, so only a killed process
+loses them.
+
+Classes:
+- ViewCounter: Adds up the views of articles and flushes them periodically.
+
+Functions:
+- flush_views(deltas): Adds views to articles in the current session.
+- drain_view_counters(): Stops every counter of the process, flushing its views.
+"""
+
+import atexit
+import os
+import threading
+import weakref
+from collections import defaultdict
+
+from loguru import logger
+from sqlalchemy import bindparam, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.database.models import db, Article
+from src.database.tenants import current_tenant, tenant_context
+from src.settings import getenv
+
+VIEWS_FLUSH_INTERVAL = float(getenv("VIEWS_FLUSH_INTERVAL", "5"))
+
+# Counters to drain when the process exits
+_counters = weakref.WeakSet()
+
+
+def flush_views(deltas):
+    """
+    Adds views to articles in the current session, with one batched UPDATE.
+
+    Rows are updated in ID order, so concurrent flushes of several workers
+    lock them in the same order and never deadlock. `updated_at` is left as
+    is: a view does not modify the article.
+
+    Parameters:
+        deltas (dict): The number of new views of each article, by article ID.
+    """
+    articles = Article.__table__
+    db.session.execute(
+        update(articles)
+        .where(articles.c.id == bindparam("article_id"))
+        .values(
+            views=articles.c.views + bindparam("delta"),
+            updated_at=articles.c.updated_at,
+        ),
+        [
+            {"article_id": article_id, "delta": delta}
+            for article_id, delta in sorted(deltas.items())
+        ],
+    )
+
+
+class ViewCounter:
+    """
+    Adds up the views of articles in memory and flushes them periodically.
+
+    Attributes:
+        app (Flask): The application whose database holds the articles.
+        flush_interval (float): Seconds between two flushes.
+
+    Methods:
+        record(article_id): Counts one view of an article.
+        flush(): Writes the pending views to the database.
+        stop(): Stops the flushing thread and flushes the pending views.
+    """
+
+    def __init__(self, app, flush_interval=VIEWS_FLUSH_INTERVAL):
+        self.app = app
+        self.flush_interval = flush_interval
+        self._pending = defaultdict(int)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._pid = None
+        _counters.add(self)
+
+    def record(self, article_id):
+        """Counts one view of an article of the current blog."""
+        if self._pid != os.getpid():
+            self._start()
+        with self._lock:
+            self._pending[(current_tenant(), article_id)] += 1
+
+    def _start(self):
+        """Starts the flushing thread once per process."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Views counted before a fork are flushed by the parent
+            self._pending.clear()
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="view-counter", daemon=True).start()
+
+    def _run(self):
+        """Flushes the pending views every `flush_interval` seconds until stopped."""
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the pending views to the database, one transaction per blog.
+
+        Views that could not be written are kept for the next flush.
+
+        Returns:
+            int: The number of views written.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+
+        deltas = defaultdict(dict)
+        for (tenant, article_id), delta in pending.items():
+            deltas[tenant][article_id] = delta
+
+        flushed = 0
+        with self.app.app_context():
+            for tenant, tenant_deltas in deltas.items():
+                try:
+                    with tenant_context(tenant):
+                        flush_views(tenant_deltas)
+                        db.session.commit()
+                    flushed += sum(tenant_deltas.values())
+                except SQLAlchemyError as e:
+                    db.session.rollback()
+                    logger.error(f"Error trying to flush the article views, {e}")
+                    with self._lock:
+                        for article_id, delta in tenant_deltas.items():
+                            self._pending[(tenant, article_id)] += delta
+                finally:
+                    db.session.remove()
+        return flushed
+
+    def stop(self):
+        """Stops the flushing thread and flushes the pending views."""
+        self._stopped.set()
+        if self._pending:
+            self.flush()
+
+
+def drain_view_counters():
+    """Stops every counter of the process, flushing its pending views."""
+    for counter in list(_counters):
+        counter.stop()
+
+
+atexit.register(drain_view_counters)
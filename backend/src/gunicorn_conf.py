@@ -0,0 +1,60 @@
+"""
+Gunicorn configuration of the MyBlog backend.
+
+Usage:
+    gunicorn -c src/gunicorn_conf.py
+
+The worker class, the number of workers and threads come from the profile
+selected with `GUNICORN_PROFILE` (see `src/concurrency.py`), the other
+settings from the environment variables below.
+
+- PORT (default 5000): the port to bind.
+- GUNICORN_MAX_REQUESTS (default 1000): requests before a worker is recycled,
+  with up to GUNICORN_MAX_REQUESTS_JITTER (default 100) more so workers do not
+  all restart at once.
+- GUNICORN_KEEPALIVE (default 5): seconds an idle keep-alive connection is
+  kept, longer than the typical 1-2 s between SPA requests.
+- GUNICORN_TIMEOUT (default 30): seconds before a silent worker is restarted.
+- GUNICORN_PRELOAD (default 1): create the app in the master and fork workers.
+"""
+
+from src.concurrency import profile
+from src.settings import getenv
+
+_profile = profile()
+
+if _profile["worker_class"] == "gevent":
+    # Patch before the app is preloaded, so its locks and threads cooperate,
+    # and make psycopg2 yield to other greenlets while waiting on PostgreSQL
+    from gevent import monkey
+    from psycogreen.gevent import patch_psycopg
+
+    monkey.patch_all()
+    patch_psycopg()
+
+wsgi_app = "src.api.api:create_app()"
+bind = f"0.0.0.0:{getenv('PORT', '5000')}"
+
+worker_class = _profile["worker_class"]
+workers = _profile["workers"]
+threads = _profile["threads"]
+worker_connections = _profile["worker_connections"]
+
+max_requests = int(getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+keepalive = int(getenv("GUNICORN_KEEPALIVE", "5"))
+timeout = int(getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = timeout
+preload_app = getenv("GUNICORN_PRELOAD", "1") != "0"
+
+
+def when_ready(server):
+    """Logs the profile once the master is ready."""
+    server.log.info(f"Concurrency profile: {_profile}")
+
+
+def worker_exit(server, worker):
+    """Flushes the article views counted by the worker before it exits."""
+    from src.database.views import drain_view_counters
+
+    drain_view_counters()
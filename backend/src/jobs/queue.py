@@ -0,0 +1,289 @@
+"""
+Database-backed job queue for work that should not run inside a request.
+
+Write handlers enqueue jobs once their own transaction is committed, and a
+pool of worker threads runs them with retries. Jobs live in the `jobs` table
+of the application database, so no external broker is needed: on PostgreSQL
+workers claim jobs with `SELECT ... FOR UPDATE SKIP LOCKED`, elsewhere a
+conditional `UPDATE` makes sure a job is only claimed once.
+
+The pool runs either inside the web workers (`JOB_WORKERS` threads per
+process) or as a sidecar process started with `flask jobs-worker`.
+
+Classes:
+- JobWorkerPool: Threads claiming and running queued jobs.
+
+Functions:
+- task(name): Decorator registering a function as a runnable task.
+- enqueue(name, **payload): Adds a job to the queue and commits it.
+- claim_job(): Claims the next job ready to run.
+- run_job(job): Runs a claimed job and records its outcome.
+- queue_stats(): Returns the depth of the queue per status.
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from loguru import logger
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.database.models import db, Job
+from src.database.tenants import current_tenant, tenant_context
+from src.settings import getenv
+
+JOB_WORKERS = int(getenv("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(getenv("JOB_POLL_INTERVAL", "1"))
+JOB_VISIBILITY_TIMEOUT = int(getenv("JOB_VISIBILITY_TIMEOUT", "300"))
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE_DELAY = 2
+
+TASKS = {}
+
+
+def _utcnow():
+    """Returns the current UTC time as a naive datetime, as stored in `jobs`."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def task(name):
+    """
+    Registers the decorated function as the task `name`.
+
+    The function is called with the payload of the job as keyword arguments
+    inside an application context. Raising an exception schedules a retry.
+    """
+
+    def task_decorator(f):
+        TASKS[name] = f
+        return f
+
+    return task_decorator
+
+
+def enqueue(name, max_attempts=JOB_MAX_ATTEMPTS, delay=0, **payload):
+    """
+    Adds a job to the queue and commits it.
+
+    Call it after the transaction of the request is committed, so the job
+    never sees data that is later rolled back. The job runs for the blog of
+    the current request.
+
+    Parameters:
+        name (str): The name of a registered task.
+        max_attempts (int, optional): Attempts before the job is marked failed.
+        delay (float, optional): Seconds to wait before the job can run.
+        **payload: The keyword arguments passed to the task.
+
+    Returns:
+        int: The ID of the enqueued job.
+    """
+    if name not in TASKS:
+        raise KeyError(f"Unknown task {name}")
+
+    job = Job(
+        name=name,
+        payload=payload,
+        max_attempts=max_attempts,
+        run_at=_utcnow() + timedelta(seconds=delay),
+        tenant=current_tenant(),
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+def claim_job():
+    """
+    Claims the next job ready to run.
+
+    A job is ready when it is queued and its `run_at` is past, or when it is
+    running but was claimed longer than the visibility timeout ago and has
+    attempts left. Abandoned jobs without attempts left (their worker died,
+    or they always outlive the timeout) are marked failed instead.
+
+    Returns:
+        Job: The claimed job, or None when the queue is empty.
+    """
+    now = _utcnow()
+    abandoned = and_(
+        Job.status == "running",
+        Job.locked_at <= now - timedelta(seconds=JOB_VISIBILITY_TIMEOUT),
+    )
+    db.session.execute(
+        update(Job)
+        .where(abandoned, Job.attempts >= Job.max_attempts)
+        .values(
+            status="failed",
+            last_error=f"Still running after {JOB_VISIBILITY_TIMEOUT} s "
+            "on its last attempt",
+        )
+        .execution_options(synchronize_session=False)
+    )
+    ready = or_(
+        and_(Job.status == "queued", Job.run_at <= now),
+        and_(abandoned, Job.attempts < Job.max_attempts),
+    )
+    query = Job.query.filter(ready).order_by(Job.run_at, Job.id).limit(1)
+    if db.session.get_bind(mapper=Job).dialect.name == "postgresql":
+        query = query.with_for_update(skip_locked=True)
+
+    job = query.one_or_none()
+    if job is None:
+        db.session.commit()
+        return None
+
+    # Only one worker can flip the row from the state it was read in
+    claimed = db.session.execute(
+        update(Job)
+        .where(
+            Job.id == job.id,
+            Job.status == job.status,
+            Job.attempts == job.attempts,
+        )
+        .values(status="running", locked_at=now, attempts=Job.attempts + 1)
+    ).rowcount
+    db.session.commit()
+
+    return job if claimed else None
+
+
+def run_job(job):
+    """
+    Runs a claimed job and records its outcome.
+
+    Successful jobs are deleted. Failed attempts are retried with an
+    exponential backoff until `max_attempts` is reached, then the job is
+    kept with the "failed" status.
+
+    Returns:
+        bool: Whether the job succeeded.
+    """
+    try:
+        with tenant_context(job.tenant):
+            TASKS[job.name](**(job.payload or {}))
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(Job, job.id)
+        job.last_error = repr(e)
+        if job.attempts >= job.max_attempts:
+            job.status = "failed"
+            logger.error(f"Job {job.id} {job.name} failed for good, {e}")
+        else:
+            job.status = "queued"
+            job.run_at = _utcnow() + timedelta(
+                seconds=JOB_RETRY_BASE_DELAY**job.attempts
+            )
+            logger.warning(f"Job {job.id} {job.name} failed, retrying, {e}")
+        db.session.commit()
+        return False
+
+    db.session.execute(db.delete(Job).where(Job.id == job.id))
+    db.session.commit()
+    return True
+
+
+def queue_stats():
+    """
+    Returns the depth of the queue.
+
+    When a blog is selected, only its jobs are counted.
+
+    Returns:
+        dict: The number of jobs per status and the age in seconds of the
+            oldest job ready to run.
+    """
+    tenant = current_tenant()
+    scope = [Job.tenant == tenant] if tenant is not None else []
+    counts = dict(
+        db.session.query(Job.status, func.count(Job.id))
+        .filter(*scope)
+        .group_by(Job.status)
+        .all()
+    )
+    oldest = (
+        db.session.query(func.min(Job.run_at))
+        .filter(*scope, Job.status == "queued", Job.run_at <= _utcnow())
+        .scalar()
+    )
+    return {
+        "queued": counts.get("queued", 0),
+        "running": counts.get("running", 0),
+        "failed": counts.get("failed", 0),
+        "oldest_queued_age": (
+            (_utcnow() - oldest).total_seconds() if oldest is not None else 0
+        ),
+    }
+
+
+class JobWorkerPool:
+    """
+    Pool of daemon threads claiming and running queued jobs.
+
+    Attributes:
+        app (Flask): The application whose database holds the queue.
+        concurrency (int): The number of worker threads.
+        poll_interval (float): Seconds a worker sleeps when the queue is empty.
+
+    Methods:
+        ensure_started(): Starts the worker threads once per process.
+        start(): Starts the worker threads.
+        stop(timeout): Stops the workers after their current job.
+    """
+
+    def __init__(self, app, concurrency=JOB_WORKERS, poll_interval=JOB_POLL_INTERVAL):
+        self.app = app
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._stopped = threading.Event()
+        self._threads = []
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def ensure_started(self):
+        """
+        Starts the worker threads unless they already run in this process.
+
+        Threads do not survive a fork, so a pool created in the gunicorn
+        master (`--preload`) is started again in each worker.
+        """
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self._threads = []
+                self.start()
+
+    def start(self):
+        """Starts the worker threads."""
+        self._pid = os.getpid()
+        for number in range(self.concurrency):
+            thread = threading.Thread(
+                target=self._work, name=f"job-worker-{number}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """Stops the workers after their current job."""
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _work(self):
+        """Claims and runs jobs until stopped."""
+        while not self._stopped.is_set():
+            with self.app.app_context():
+                try:
+                    job = claim_job()
+                    if job is not None:
+                        run_job(job)
+                except SQLAlchemyError as e:
+                    db.session.rollback()
+                    logger.error(f"Error trying to run a job, {e}")
+                    job = None
+                finally:
+                    db.session.remove()
+            if job is None:
+                self._stopped.wait(self.poll_interval)
@@ -0,0 +1,29 @@
+"""
+Tasks run by the background job queue.
+
+`register_tasks()` registers them in the queue; `create_app` calls it, so
+both the web workers and the sidecar worker process can run them.
+
+Functions:
+- register_tasks(): Registers the tasks of this module in the job queue.
+"""
+
+from src.database.purge import purge_article
+from src.database.revisions import compact_revisions
+from src.jobs.queue import task
+
+
+def purge_article_task(article_id):
+    """Removes the collection memberships and the row of a soft-deleted article."""
+    purge_article(article_id)
+
+
+def compact_revisions_task(article_id):
+    """Replaces the full copies of the revisions of an article by deltas."""
+    compact_revisions(article_id)
+
+
+def register_tasks():
+    """Registers the tasks of this module in the job queue."""
+    task("purge_article")(purge_article_task)
+    task("compact_revisions")(compact_revisions_task)
@@ -0,0 +1,26 @@
+"""
+Environment settings of the MyBlog backend.
+
+The `.env` file is read once per process, the first time a setting is
+needed, instead of once by every module that reads the environment.
+
+Functions:
+- getenv(name, default): Returns an environment variable, loading `.env` first.
+"""
+
+import os
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+
+@lru_cache(maxsize=None)
+def load_env():
+    """Loads the `.env` file into the environment, once per process."""
+    load_dotenv()
+
+
+def getenv(name, default=None):
+    """Returns the environment variable `name`, loading `.env` first."""
+    load_env()
+    return os.getenv(name, default)
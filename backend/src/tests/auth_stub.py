@@ -0,0 +1,86 @@
+"""
+Local stand-in for the Auth0 domain in tests.
+
+Tokens are signed with the test-only RSA key `test_signing_key.pem`, whose
+public half is installed in `src.auth.auth` as the JWKS of the domain, so
+the real verification code runs without network access or live tokens.
+The key protects nothing: never trust it outside of tests.
+
+Functions:
+- install(): Makes `src.auth.auth` trust the test key.
+- make_token(permissions, key_id, **claims): Returns an access token signed with
+  the test key.
+"""
+
+import os
+import time
+
+from src.auth import auth
+
+KEY_ID = "test-signing-key"
+# Issuer of the tokens when no AUTH0_DOMAIN is configured
+TEST_DOMAIN = "myblog-tests.invalid"
+KEY_PATH = os.path.join(os.path.dirname(__file__), "test_signing_key.pem")
+
+# Permissions of the Managers role
+MANAGER_PERMISSIONS = [
+    "get:articles",
+    "post:articles",
+    "patch:articles",
+    "delete:articles",
+    "get:collections",
+    "post:collections",
+    "patch:collections",
+    "delete:collections",
+    "get:jobs",
+]
+
+
+def _private_key():
+    with open(KEY_PATH) as key_file:
+        return key_file.read()
+
+
+def install():
+    """Makes `src.auth.auth` verify tokens with the public test key."""
+    from jose import jwk
+
+    if not auth.AUTH0_DOMAIN:
+        auth.AUTH0_DOMAIN = TEST_DOMAIN
+    public_key = jwk.construct(_private_key(), auth.ALGORITHMS[0]).public_key()
+    auth.use_jwks(
+        {"keys": [{**public_key.to_dict(), "kid": KEY_ID, "use": "sig"}]}
+    )
+
+
+def make_token(permissions, key_id=KEY_ID, **claims):
+    """
+    Returns an access token signed with the test key.
+
+    Parameters:
+        permissions (list): The permissions granted by the token.
+        key_id (str, optional): The key ID in the header of the token.
+        **claims: Other claims of the token, e.g. the tenant claim.
+
+    Returns:
+        str: The encoded token, valid for an hour.
+    """
+    from jose import jwt
+
+    now = int(time.time())
+    payload = {
+        "iss": f"https://{auth.AUTH0_DOMAIN}/",
+        "sub": "auth0|tests",
+        "iat": now,
+        "exp": now + 3600,
+        "permissions": permissions,
+        **claims,
+    }
+    if auth.API_AUDIENCE:
+        payload["aud"] = auth.API_AUDIENCE
+    return jwt.encode(
+        payload,
+        _private_key(),
+        algorithm=auth.ALGORITHMS[0],
+        headers={"kid": key_id},
+    )
@@ -11,22 +11,46 @@ The tests cover the following functionalities:
 - Authorization checks with valid and invalid tokens.
 - Handling of error cases such as missing authorization and not found resources.
 
-Environment variables are used to configure the test database and authorization tokens.
+The tests run offline: tokens are signed with a local test key, trusted by
+`src.auth.auth` through `auth_stub`, and each test gets a fresh in-memory SQLite
+database unless `TEST_DATABASE_URL` points to another one. Tests share no
+state, so they can run in parallel (`python -m pytest -n auto src/tests`).
 """
 
+import os
+import shutil
+import tempfile
+import threading
+import time
 import unittest
 import json
-import os
-from dotenv import load_dotenv
+from datetime import datetime
+from unittest import mock
 
 from src.api.api import create_app
-
-# Loading env vars which will be used
-# in the database connection
-load_dotenv()
-VALID_AUTH0_TOKEN = os.getenv("VALID_AUTH0_TOKEN")
-VALID_NO_ROLE_AUTH0_TOKEN = os.getenv("VALID_NO_ROLE_AUTH0_TOKEN")
-DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+from sqlalchemy import select
+
+from src.database.models import (
+    db,
+    Article,
+    ArticleRevision,
+    ChangeEvent,
+    Collection,
+    CollectionListing,
+    Tag,
+    articles_collections,
+)
+from src.database.purge import purge_article
+from src.database.revisions import SNAPSHOT_INTERVAL, compact_revisions, is_snapshot
+from src.settings import getenv
+from src.tests import auth_stub
+
+# In memory by default, every app gets an empty database of its own
+DATABASE_URL = getenv("TEST_DATABASE_URL", "sqlite://")
+
+auth_stub.install()
+VALID_AUTH0_TOKEN = auth_stub.make_token(auth_stub.MANAGER_PERMISSIONS)
+VALID_NO_ROLE_AUTH0_TOKEN = auth_stub.make_token([])
 
 
 class MyBlogTestCase(unittest.TestCase):
@@ -53,6 +77,12 @@ class MyBlogTestCase(unittest.TestCase):
 
         self.no_auth_header = {}
 
+    def tearDown(self):
+        """Stop the threads of the app, which would otherwise outlive the test."""
+        for broadcaster in self.app.extensions["change_broadcasters"].values():
+            broadcaster.stop()
+        self.app.extensions["view_counter"].stop()
+
     def test_create_article(self):
         """Test the creation of a new article."""
         new_article = {
@@ -61,12 +91,12 @@ class MyBlogTestCase(unittest.TestCase):
             "author": "Author Name",
         }
         res = self.client().post(
-            "/articles", json=new_article, headers=self.valid_auth_header
+            "/api/articles", json=new_article, headers=self.valid_auth_header
         )
         data = json.loads(res.data)
 
         self.assertEqual(res.status_code, 200)
-        self.assertTrue(data["sucess"])
+        self.assertTrue(data["success"])
         self.assertTrue(data["id"])
 
     def test_get_articles(self):
@@ -75,18 +105,167 @@ class MyBlogTestCase(unittest.TestCase):
         data = json.loads(res.data)
 
         self.assertEqual(res.status_code, 200)
-        self.assertTrue(data["sucess"])
+        self.assertTrue(data["success"])
         self.assertTrue(len(data["articles"]))
 
+    def test_get_articles_count(self):
+        """Test the total of the article listing for every count mode."""
+        res = self.client().get("/api/articles")
+        data = json.loads(res.data)
+        self.assertNotIn("total", data)
+
+        res = self.client().get("/api/articles?count=exact")
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data["count"], "exact")
+        self.assertGreaterEqual(data["total"], len(data["articles"]))
+
+        res = self.client().get("/api/collections?count=estimate")
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertGreaterEqual(data["total"], len(data["collections"]))
+
+    def test_get_articles_invalid_count(self):
+        """Test an unknown count mode (422 error)."""
+        res = self.client().get("/api/articles?count=all")
+        self.assertEqual(res.status_code, 422)
+
+    def test_get_listings_invalid_page(self):
+        """Test that both listings reject a page below 1 (422 error)."""
+        for listing in ("articles", "collections"):
+            for page in (0, -1):
+                res = self.client().get(f"/api/{listing}?page={page}")
+                self.assertEqual(res.status_code, 422, listing)
+                self.assertFalse(json.loads(res.data)["success"])
+
+    def test_get_listings_past_last_page(self):
+        """Test that both listings answer an empty page past the last one."""
+        for listing in ("articles", "collections"):
+            res = self.client().get(f"/api/{listing}?page=1000")
+            self.assertEqual(res.status_code, 200, listing)
+            self.assertEqual(json.loads(res.data)[listing], [])
+
     def test_get_article(self):
         """Test retrieving a specific article by its ID."""
         res = self.client().get("/api/articles/1", headers=self.valid_auth_header)
         data = json.loads(res.data)
 
         self.assertEqual(res.status_code, 200)
-        self.assertTrue(data["sucess"])
+        self.assertTrue(data["success"])
         self.assertTrue(data["article"])
 
+    def test_get_article_rendered(self):
+        """Test retrieving an article with its content rendered to HTML."""
+        res = self.client().get("/api/articles/1?format=html")
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data["article"]["content_html"], "<p>about water</p>")
+        self.assertEqual(data["article"]["excerpt"], "about water")
+        self.assertEqual(data["article"]["reading_time"], 1)
+
+    def test_get_articles_excerpt(self):
+        """Test that listed articles come with an excerpt but no HTML."""
+        res = self.client().get("/api/articles")
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data["articles"][0]["excerpt"], "about water")
+        self.assertNotIn("content_html", data["articles"][0])
+
+    def test_get_articles_popular(self):
+        """Test that viewed articles come first when sorting by popularity."""
+        res = self.client().post(
+            "/api/articles",
+            json={"title": "Popular", "content": "Content", "author": "Author"},
+            headers=self.valid_auth_header,
+        )
+        article_id = json.loads(res.data)["id"]
+        for _ in range(3):
+            self.client().get(f"/api/articles/{article_id}")
+        self.client().get("/api/articles/1")
+        self.assertEqual(self.app.extensions["view_counter"].flush(), 4)
+
+        res = self.client().get("/api/articles?sort=popular")
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            [(article["id"], article["views"]) for article in data["articles"]],
+            [(article_id, 3), (1, 1)],
+        )
+
+    def test_get_articles_invalid_sort(self):
+        """Test an unknown sort order (422 error)."""
+        res = self.client().get("/api/articles?sort=views")
+        self.assertEqual(res.status_code, 422)
+
+    def test_get_articles_tags(self):
+        """Test filtering articles on tags, with the facets of the filter."""
+        article_ids = {}
+        for title, tags in [
+            ("First", ["Python", "web"]),
+            ("Second", ["python", " Data  Science "]),
+            ("Third", ["web"]),
+        ]:
+            res = self.client().post(
+                "/api/articles",
+                json={
+                    "title": title,
+                    "content": "Content",
+                    "author": "Author",
+                    "tags": tags,
+                },
+                headers=self.valid_auth_header,
+            )
+            article_ids[title] = json.loads(res.data)["id"]
+
+        res = self.client().get(f"/api/articles/{article_ids['Second']}")
+        data = json.loads(res.data)
+        self.assertEqual(data["article"]["tags"], ["data science", "python"])
+
+        res = self.client().get("/api/articles?tags=python,web&count=exact")
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            [article["id"] for article in data["articles"]], [article_ids["First"]]
+        )
+        self.assertEqual(data["total"], 1)
+        self.assertEqual(
+            data["facets"],
+            [{"name": "python", "count": 1}, {"name": "web", "count": 1}],
+        )
+
+        res = self.client().get("/api/articles?tags=python,web&match=any")
+        data = json.loads(res.data)
+        self.assertEqual(
+            sorted(article["id"] for article in data["articles"]),
+            sorted(article_ids.values()),
+        )
+        self.assertEqual(data["facets"][0], {"name": "python", "count": 2})
+
+        self.client().delete(
+            f"/api/articles/{article_ids['Third']}", headers=self.valid_auth_header
+        )
+        res = self.client().get("/api/tags")
+        data = json.loads(res.data)
+        self.assertEqual(
+            {tag["name"]: tag["article_count"] for tag in data["tags"]},
+            {"data science": 1, "python": 2, "web": 1},
+        )
+
+    def test_create_article_invalid_tags(self):
+        """Test creating an article with a tag holding a comma (422 error)."""
+        new_article = {
+            "title": "New Article",
+            "content": "Content of the new article",
+            "author": "Author Name",
+            "tags": ["a,b"],
+        }
+        res = self.client().post(
+            "/api/articles", json=new_article, headers=self.valid_auth_header
+        )
+        self.assertEqual(res.status_code, 422)
+
     def test_update_article(self):
         """Test updating an existing article."""
         updated_article = {
@@ -100,9 +279,146 @@ class MyBlogTestCase(unittest.TestCase):
         data = json.loads(res.data)
 
         self.assertEqual(res.status_code, 200)
-        self.assertTrue(data["sucess"])
+        self.assertTrue(data["success"])
         self.assertTrue(data["id"])
 
+    def test_update_article_version_conflict(self):
+        """Test updating an article with a stale If-Match version (412 error)."""
+        res = self.client().get("/api/articles/1")
+        etag = res.headers["ETag"]
+        self.assertEqual(res.status_code, 200)
+
+        updated_article = {
+            "title": "Updated Article",
+            "content": "Updated content",
+            "author": "Updated Author",
+        }
+        headers = {**self.valid_auth_header, "If-Match": etag}
+        res = self.client().patch(
+            "/api/articles/1", json=updated_article, headers=headers
+        )
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data["version"], 2)
+        self.assertEqual(res.headers["ETag"], '"2"')
+
+        res = self.client().patch(
+            "/api/articles/1", json=updated_article, headers=headers
+        )
+        self.assertEqual(res.status_code, 412)
+
+    def test_update_article_version_not_found(self):
+        """Test updating a missing article with an If-Match version (404 error)."""
+        updated_article = {
+            "title": "Updated Article",
+            "content": "Updated content",
+            "author": "Updated Author",
+        }
+        headers = {**self.valid_auth_header, "If-Match": '"1"'}
+        res = self.client().patch(
+            "/api/articles/1000", json=updated_article, headers=headers
+        )
+        self.assertEqual(res.status_code, 404)
+
+    def test_get_article_revisions(self):
+        """Test that every edit of an article adds a revision."""
+        updated_article = {
+            "title": "Updated Article",
+            "content": "Updated content",
+            "author": "Updated Author",
+        }
+        res = self.client().patch(
+            "/api/articles/1", json=updated_article, headers=self.valid_auth_header
+        )
+        self.assertEqual(res.status_code, 200)
+
+        res = self.client().get("/api/articles/1/revisions")
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([revision["number"] for revision in data["revisions"]], [1, 2])
+
+        res = self.client().get("/api/articles/1/revisions/1")
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data["revision"]["content"], "about water")
+
+        res = self.client().get("/api/articles/1/revisions/2")
+        data = json.loads(res.data)
+        self.assertEqual(data["revision"]["content"], "Updated content")
+
+    def edit_article(self, times):
+        """Edits the content of article 1 `times` times, returning the contents."""
+        contents = []
+        for n in range(times):
+            content = f"Paragraph {n}\n\n" + "Some text.\n" * n
+            res = self.client().patch(
+                "/api/articles/1",
+                json={"title": "Title", "content": content, "author": "Author"},
+                headers=self.valid_auth_header,
+            )
+            self.assertEqual(res.status_code, 200)
+            contents.append(content)
+        return contents
+
+    def assert_revisions(self, contents):
+        """Checks that every revision of article 1 rebuilds to its content."""
+        for number, content in contents.items():
+            res = self.client().get(f"/api/articles/1/revisions/{number}")
+            self.assertEqual(json.loads(res.data)["revision"]["content"], content)
+
+    def test_compact_revisions(self):
+        """Test that compacted revisions rebuild, with snapshots every interval."""
+        edits = self.edit_article(SNAPSHOT_INTERVAL * 2 + 5)
+        contents = {1: "about water"}
+        contents.update(enumerate(edits, start=2))
+
+        with self.app.app_context():
+            snapshots = sum(is_snapshot(number) for number in contents)
+            self.assertEqual(compact_revisions(1), len(contents) - snapshots)
+            self.assertEqual(compact_revisions(1), 0)
+            kinds = {
+                revision.number: revision.kind
+                for revision in ArticleRevision.query.filter_by(article_id=1)
+            }
+        self.assertEqual(
+            kinds,
+            {number: "full" if is_snapshot(number) else "delta" for number in contents},
+        )
+        self.assertEqual(kinds[SNAPSHOT_INTERVAL + 1], "full")
+        self.assert_revisions(contents)
+
+    def test_compact_revisions_legacy_article(self):
+        """Test that an article whose history starts above 1 still rebuilds."""
+        with self.app.app_context():
+            ArticleRevision.query.filter_by(article_id=1).delete()
+            Article.query.filter_by(id=1).update({"version": 5})
+            db.session.commit()
+        edits = self.edit_article(SNAPSHOT_INTERVAL + 5)
+        contents = dict(enumerate(edits, start=6))
+
+        with self.app.app_context():
+            compact_revisions(1)
+            kinds = {
+                revision.number: revision.kind
+                for revision in ArticleRevision.query.filter_by(article_id=1)
+            }
+            self.assertEqual(compact_revisions(1), 0)
+        self.assertEqual(kinds[6], "full")
+        self.assertEqual(kinds[SNAPSHOT_INTERVAL + 1], "full")
+        self.assertEqual(
+            [number for number, kind in kinds.items() if kind == "full"],
+            [6, SNAPSHOT_INTERVAL + 1],
+        )
+        self.assert_revisions(contents)
+
+    def test_get_article_revision_not_found(self):
+        """Test getting a revision that does not exist (404 error)."""
+        res = self.client().get("/api/articles/1/revisions/1000")
+        self.assertEqual(res.status_code, 404)
+
     def test_create_collection(self):
         """Test the creation of a new collection."""
         new_collection = {
@@ -116,8 +432,34 @@ class MyBlogTestCase(unittest.TestCase):
         data = json.loads(res.data)
 
         self.assertEqual(res.status_code, 200)
-        self.assertTrue(data["sucess"])
-        self.assertTrue(data["article"])
+        self.assertTrue(data["success"])
+        self.assertTrue(data["id"])
+
+    def test_create_collection_invalid_article_ids(self):
+        """Test creating a collection with article IDs that are not integers (422 error)."""
+        for article_ids in (["1"], "1", [1, None]):
+            res = self.client().post(
+                "/api/collections",
+                json={
+                    "title": "New Collection",
+                    "description": "Description",
+                    "article_ids": article_ids,
+                },
+                headers=self.valid_auth_header,
+            )
+            self.assertEqual(res.status_code, 422)
+
+    def test_update_collection_invalid_article_ids(self):
+        """Test updating a collection with article IDs that are not integers (422 error)."""
+        res = self.client().patch(
+            "/api/collections/1",
+            json={"title": "Title", "description": "Description", "article_ids": ["1"]},
+            headers=self.valid_auth_header,
+        )
+        self.assertEqual(res.status_code, 422)
+
+        res = self.client().get("/api/collections/1")
+        self.assertEqual(json.loads(res.data)["collection"]["article_ids"], [1])
 
     def test_get_collections(self):
         """Test retrieving a list of collections."""
@@ -125,16 +467,65 @@ class MyBlogTestCase(unittest.TestCase):
         data = json.loads(res.data)
 
         self.assertEqual(res.status_code, 200)
-        self.assertTrue(data["sucess"])
+        self.assertTrue(data["success"])
         self.assertTrue(len(data["collections"]))
 
+    def test_collection_listing_matches_orm(self):
+        """Test that the collections listing matches the collections read with the ORM."""
+        article_ids = []
+        for title in ["First", "Second", "Third"]:
+            res = self.client().post(
+                "/api/articles",
+                json={"title": title, "content": "Content", "author": "Author"},
+                headers=self.valid_auth_header,
+            )
+            article_ids.append(json.loads(res.data)["id"])
+        res = self.client().post(
+            "/api/collections",
+            json={
+                "title": "Listed",
+                "description": "Listed collection",
+                "article_ids": article_ids[:2],
+            },
+            headers=self.valid_auth_header,
+        )
+        collection_id = json.loads(res.data)["id"]
+        self.client().patch(
+            f"/api/collections/{collection_id}",
+            json={
+                "title": "Listed",
+                "description": "Listed collection",
+                "article_ids": article_ids[1:],
+            },
+            headers=self.valid_auth_header,
+        )
+        self.client().delete(
+            f"/api/articles/{article_ids[1]}", headers=self.valid_auth_header
+        )
+
+        res = self.client().get("/api/collections")
+        data = json.loads(res.data)
+
+        with self.app.app_context():
+            expected = {}
+            for collection in Collection.query.all():
+                response = collection.response()
+                response["article_count"] = len(response["article_ids"])
+                expected[collection.id] = response
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            {collection["id"]: collection for collection in data["collections"]},
+            expected,
+        )
+        self.assertEqual(expected[collection_id]["article_ids"], [article_ids[2]])
+
     def test_get_collection(self):
         """Test retrieving a specific collection by its ID."""
         res = self.client().get("/api/collections/1", headers=self.valid_auth_header)
         data = json.loads(res.data)
 
         self.assertEqual(res.status_code, 200)
-        self.assertTrue(data["sucess"])
+        self.assertTrue(data["success"])
         self.assertTrue(data["collection"])
 
     def test_update_collection(self):
@@ -152,9 +543,97 @@ class MyBlogTestCase(unittest.TestCase):
         data = json.loads(res.data)
 
         self.assertEqual(res.status_code, 200)
-        self.assertTrue(data["sucess"])
+        self.assertTrue(data["success"])
         self.assertTrue(data["id"])
 
+    def test_update_collection_keeps_articles(self):
+        """Test that updating a collection without article_ids keeps its articles."""
+        res = self.client().patch(
+            "/api/collections/1",
+            json={"title": "Updated Collection", "description": "Updated"},
+            headers=self.valid_auth_header,
+        )
+        self.assertEqual(res.status_code, 200)
+
+        res = self.client().get("/api/collections/1")
+        collection = json.loads(res.data)["collection"]
+        self.assertEqual(collection["title"], "Updated Collection")
+        self.assertEqual(collection["article_ids"], [1])
+
+    def test_order_collection(self):
+        """Test moving articles inside a collection."""
+        article_ids = []
+        for title in ["First", "Second", "Third"]:
+            res = self.client().post(
+                "/api/articles",
+                json={"title": title, "content": "Content", "author": "Author"},
+                headers=self.valid_auth_header,
+            )
+            article_ids.append(json.loads(res.data)["id"])
+        res = self.client().post(
+            "/api/collections",
+            json={
+                "title": "Ordered",
+                "description": "Ordered collection",
+                "article_ids": article_ids[::-1],
+            },
+            headers=self.valid_auth_header,
+        )
+        collection_id = json.loads(res.data)["id"]
+
+        res = self.client().get(f"/api/collections/{collection_id}")
+        data = json.loads(res.data)
+        self.assertEqual(data["collection"]["article_ids"], article_ids[::-1])
+
+        res = self.client().patch(
+            f"/api/collections/{collection_id}/order",
+            json={"article_id": article_ids[2], "after_id": article_ids[0]},
+            headers=self.valid_auth_header,
+        )
+        self.assertEqual(res.status_code, 200)
+        res = self.client().patch(
+            f"/api/collections/{collection_id}/order",
+            json={"article_id": article_ids[0], "after_id": None},
+            headers=self.valid_auth_header,
+        )
+        self.assertEqual(res.status_code, 200)
+
+        expected = [article_ids[0], article_ids[1], article_ids[2]]
+        res = self.client().get(f"/api/collections/{collection_id}")
+        data = json.loads(res.data)
+        self.assertEqual(data["collection"]["article_ids"], expected)
+        res = self.client().get("/api/collections")
+        data = json.loads(res.data)
+        listed = {collection["id"]: collection for collection in data["collections"]}
+        self.assertEqual(listed[collection_id]["article_ids"], expected)
+
+    def test_order_collection_not_member(self):
+        """Test moving an article that is not in the collection (422 error)."""
+        res = self.client().patch(
+            "/api/collections/1/order",
+            json={"article_id": 1000, "after_id": None},
+            headers=self.valid_auth_header,
+        )
+        self.assertEqual(res.status_code, 422)
+
+    def test_update_collection_version_conflict(self):
+        """Test updating a collection with a stale If-Match version (412 error)."""
+        updated_collection = {
+            "title": "Updated Collection",
+            "description": "Updated description",
+            "article_ids": [1],
+        }
+        headers = {**self.valid_auth_header, "If-Match": '"1"'}
+        res = self.client().patch(
+            "/api/collections/1", json=updated_collection, headers=headers
+        )
+        self.assertEqual(res.status_code, 200)
+
+        res = self.client().patch(
+            "/api/collections/1", json=updated_collection, headers=headers
+        )
+        self.assertEqual(res.status_code, 412)
+
     def test_delete_collection(self):
         """Test deleting a specific collection by its ID."""
         res = self.client().delete("/api/collections/1", headers=self.valid_auth_header)
@@ -173,6 +652,96 @@ class MyBlogTestCase(unittest.TestCase):
         self.assertTrue(data["success"])
         self.assertTrue(data["delete"])
 
+    def test_delete_article_concurrently(self):
+        """Test that of two deletes of an article, only the first one counts."""
+        res = self.client().post(
+            "/api/articles",
+            json={
+                "title": "Tagged",
+                "content": "Content",
+                "author": "Author",
+                "tags": ["web"],
+            },
+            headers=self.valid_auth_header,
+        )
+        article_id = json.loads(res.data)["id"]
+
+        with self.app.app_context():
+            # Read by a request before another one deleted the article
+            article = db.session.get(Article, article_id)
+            res = self.client().delete(
+                f"/api/articles/{article_id}", headers=self.valid_auth_header
+            )
+            self.assertEqual(res.status_code, 200)
+            head = ChangeEvent.head()
+
+            self.assertFalse(article.delete())
+            self.assertEqual(ChangeEvent.head(), head)
+            self.assertEqual(Tag.query.filter_by(name="web").one().article_count, 0)
+
+    def test_deleted_article_hidden_from_reads(self):
+        """Test that a soft-deleted article disappears from every read route."""
+        res = self.client().delete("/api/articles/1", headers=self.valid_auth_header)
+        self.assertEqual(res.status_code, 200)
+
+        res = self.client().get("/api/articles/1")
+        self.assertEqual(res.status_code, 404)
+
+        res = self.client().get("/api/articles")
+        data = json.loads(res.data)
+        self.assertNotIn(1, [article["id"] for article in data["articles"]])
+
+        res = self.client().get("/api/collections/1")
+        data = json.loads(res.data)
+        self.assertEqual(data["collection"]["article_ids"], [])
+
+        # Still in the precomputed listing until the purge job refreshes it
+        res = self.client().get("/api/collections")
+        listed = json.loads(res.data)["collections"][0]
+        self.assertEqual(listed["id"], 1)
+        self.assertEqual((listed["article_ids"], listed["article_count"]), ([], 0))
+
+        res = self.client().delete("/api/articles/1", headers=self.valid_auth_header)
+        self.assertEqual(res.status_code, 404)
+
+    def test_purge_article(self):
+        """Test that purging removes the memberships in batches, then the article."""
+        for n in range(3):
+            self.client().post(
+                "/api/collections",
+                json={
+                    "title": f"Collection {n}",
+                    "description": "Description",
+                    "article_ids": [1],
+                },
+                headers=self.valid_auth_header,
+            )
+        self.client().delete("/api/articles/1", headers=self.valid_auth_header)
+
+        with self.app.app_context():
+            listed = [
+                listing.collection_id
+                for listing in CollectionListing.query
+                if 1 in listing.article_ids
+            ]
+            self.assertGreater(len(listed), 2)
+
+            self.assertTrue(purge_article(1, batch_size=2))
+            memberships = db.session.execute(
+                select(articles_collections).where(
+                    articles_collections.c.article_id == 1
+                )
+            ).all()
+            self.assertEqual(memberships, [])
+            self.assertIsNone(
+                db.session.get(Article, 1, execution_options={"include_deleted": True})
+            )
+            for collection_id in listed:
+                listing = db.session.get(CollectionListing, collection_id)
+                self.assertNotIn(1, listing.article_ids)
+                self.assertEqual(listing.article_count, len(listing.article_ids))
+            self.assertFalse(purge_article(1))
+
     def test_get_article_not_found(self):
         """Test getting an article that does not exist (404 error)."""
         res = self.client().get("/api/articles/1000", headers=self.valid_auth_header)
@@ -214,6 +783,147 @@ class MyBlogTestCase(unittest.TestCase):
         )
         self.assertEqual(res.status_code, 401)
 
+    def test_get_changes(self):
+        """Test that mutations are recorded in the change feed."""
+        res = self.client().get("/api/changes")
+        data = json.loads(res.data)
+        last_seq = data["last_seq"]
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(data["success"])
+        self.assertTrue(len(data["changes"]))
+
+        res = self.client().delete("/api/articles/1", headers=self.valid_auth_header)
+        self.assertEqual(res.status_code, 200)
+
+        res = self.client().get(f"/api/changes?since={last_seq}")
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(data["changes"]), 1)
+        self.assertEqual(data["changes"][0]["entity"], "article")
+        self.assertEqual(data["changes"][0]["op"], "deleted")
+        self.assertEqual(data["last_seq"], data["changes"][0]["seq"])
+
+    def test_get_changes_long_poll_timeout(self):
+        """Test that a long-poll without new changes returns the same cursor."""
+        res = self.client().get("/api/changes?since=1000&wait=0.1")
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data["changes"], [])
+        self.assertEqual(data["last_seq"], 1000)
+
+    def test_get_changes_long_poll_wakes_up(self):
+        """Test that a waiting long-poll returns a change committed meanwhile."""
+        # Two threads write and read at once, give them a database file
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{directory}/db"})
+        self.addCleanup(lambda: app.extensions["change_broadcasters"][None].stop())
+        client = app.test_client()
+        last_seq = client.get("/api/changes").get_json()["last_seq"]
+
+        delete = threading.Timer(
+            0.5,
+            lambda: client.delete("/api/articles/1", headers=self.valid_auth_header),
+        )
+        delete.start()
+        started = time.monotonic()
+        res = client.get(f"/api/changes?since={last_seq}&wait=10")
+        delete.join()
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([change["op"] for change in data["changes"]], ["deleted"])
+        self.assertEqual(data["last_seq"], last_seq + 1)
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_prune_changes(self):
+        """Test that old changes are pruned, except the latest one."""
+        self.client().delete("/api/articles/1", headers=self.valid_auth_header)
+        with self.app.app_context():
+            head = ChangeEvent.head()
+            ChangeEvent.query.filter(ChangeEvent.seq < head).update(
+                {"created_at": datetime(2000, 1, 1)}
+            )
+            db.session.commit()
+
+            self.assertEqual(ChangeEvent.prune(datetime(1999, 12, 31)), 0)
+            self.assertEqual(ChangeEvent.prune(datetime.now(), batch_size=1), head - 1)
+            self.assertEqual([change.seq for change in ChangeEvent.query], [head])
+
+    def test_get_changes_invalid_cursor(self):
+        """Test requesting the change feed with a negative cursor (422 error)."""
+        res = self.client().get("/api/changes?since=-1")
+        self.assertEqual(res.status_code, 422)
+
+    def test_get_events(self):
+        """Test that the event stream replays the changes after a cursor."""
+        res = self.client().get("/api/events?since=0", buffered=False)
+        stream = res.response
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.content_type.startswith("text/event-stream"))
+        self.assertTrue(next(stream).startswith(b"retry:"))
+
+        message = next(stream).decode()
+        self.assertIn("id: 1\n", message)
+        self.assertIn("event: patch\n", message)
+        res.close()
+
+    def test_get_events_streams_full(self):
+        """Test that a worker refuses streams beyond its limit (503 error)."""
+        # An app of its own, created with the limit
+        self.tearDown()
+        with mock.patch.dict(os.environ, {"EVENTS_MAX_STREAMS": "1"}):
+            self.setUp()
+
+        first = self.client().get("/api/events", buffered=False)
+        self.assertEqual(first.status_code, 200)
+
+        res = self.client().get("/api/events")
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.headers["Retry-After"], "30")
+        self.assertFalse(json.loads(res.data)["success"])
+
+        # Closing a stream frees its slot
+        first.close()
+        res = self.client().get("/api/events", buffered=False)
+        self.assertEqual(res.status_code, 200)
+        res.close()
+
+    def test_listing_change_cursor(self):
+        """Test that listings return the change feed cursor to stream from."""
+        res = self.client().get("/api/articles")
+        last_seq = json.loads(res.data)["last_seq"]
+        res = self.client().get("/api/changes")
+        self.assertEqual(json.loads(res.data)["last_seq"], last_seq)
+
+        self.client().delete("/api/articles/1", headers=self.valid_auth_header)
+        res = self.client().get(f"/api/events?since={last_seq}", buffered=False)
+        stream = res.response
+        next(stream)
+        message = next(stream).decode()
+        self.assertIn(f"id: {last_seq + 1}\n", message)
+        self.assertIn("event: invalidate\n", message)
+        res.close()
+
+        res = self.client().get("/api/collections")
+        self.assertEqual(json.loads(res.data)["last_seq"], last_seq + 1)
+
+    def test_get_events_invalid_cursor(self):
+        """Test streaming events with an invalid cursor (422 error)."""
+        res = self.client().get(
+            "/api/events", headers={"Last-Event-ID": "not-a-number"}
+        )
+        self.assertEqual(res.status_code, 422)
+
+    def test_get_jobs_stats_no_auth(self):
+        """Test retrieving the job queue depth without authorization (401 error)."""
+        res = self.client().get("/api/jobs/stats", headers=self.no_auth_header)
+        self.assertEqual(res.status_code, 401)
+
 
 if __name__ == "__main__":
     unittest.main()
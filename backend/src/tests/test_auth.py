@@ -0,0 +1,65 @@
+"""
+Authentication Test Module
+
+This module contains the tests of the cache of the signing keys of the Auth0
+domain, with the fetches of the JWKS stubbed out.
+"""
+
+import io
+import json
+import unittest
+from unittest import mock
+
+from werkzeug.exceptions import HTTPException
+
+from src.auth import auth
+from src.tests import auth_stub
+
+
+class JwksCacheTestCase(unittest.TestCase):
+    """This class represents the signing key cache test case"""
+
+    def setUp(self):
+        auth_stub.install()
+        self.keys = auth.get_jwks()
+        self.retired_keys = {
+            "keys": [{**self.keys["keys"][0], "kid": "retired-signing-key"}]
+        }
+        # Fetched from the domain, as in production
+        auth.use_jwks(None)
+
+    def tearDown(self):
+        auth_stub.install()
+
+    def fetches(self, *key_sets):
+        """Stubs the JWKS endpoint, answering each fetch with the next key set."""
+        responses = [io.BytesIO(json.dumps(keys).encode()) for keys in key_sets]
+        return mock.patch.object(auth, "urlopen", side_effect=responses)
+
+    def test_cached_keys(self):
+        """Test that the keys are fetched once for many tokens."""
+        token = auth_stub.make_token(["get:jobs"])
+        with self.fetches(self.keys) as urlopen:
+            for _ in range(3):
+                self.assertEqual(
+                    auth.verify_decode_jwt(token)["permissions"], ["get:jobs"]
+                )
+        self.assertEqual(urlopen.call_count, 1)
+
+    def test_refetch_on_unknown_key(self):
+        """Test that a token signed with a rotated key fetches the keys again, once."""
+        token = auth_stub.make_token(["get:jobs"])
+        with self.fetches(self.retired_keys, self.keys) as urlopen:
+            self.assertEqual(auth.verify_decode_jwt(token)["permissions"], ["get:jobs"])
+            self.assertEqual(urlopen.call_count, 2)
+
+            # Made-up key IDs do not fetch again before JWKS_MIN_REFRESH
+            forged = auth_stub.make_token(["get:jobs"], key_id="unknown-signing-key")
+            with self.assertRaises(HTTPException) as error:
+                auth.verify_decode_jwt(forged)
+            self.assertEqual(error.exception.code, 400)
+            self.assertEqual(urlopen.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+Concurrency Profile Test Module
+
+This module contains the tests of the worker settings and database pool sizes
+derived from `GUNICORN_PROFILE`, on a host with 2 CPUs and no other setting.
+"""
+
+import os
+import unittest
+from unittest import mock
+
+from src import concurrency
+from src.concurrency import (
+    BACKGROUND_CONNECTIONS,
+    DEFAULT_GEVENT_POOL_SIZE,
+    db_engine_options,
+    max_event_streams,
+    profile,
+)
+from src.settings import load_env
+
+CPUS = 2
+JOB_WORKERS = 2
+
+
+class ConcurrencyProfileTestCase(unittest.TestCase):
+    """This class represents the concurrency profile test case"""
+
+    def setUp(self):
+        # Loaded now, so that `.env` never fills the patched environment
+        load_env()
+        self.cpu_count = mock.patch.object(concurrency, "cpu_count", return_value=CPUS)
+        self.cpu_count.start()
+
+    def tearDown(self):
+        self.cpu_count.stop()
+
+    def settings(self, **env):
+        """Returns the profile and pool settings with only `env` set."""
+        with mock.patch.dict(os.environ, env, clear=True):
+            return profile(), db_engine_options()
+
+    def test_sync_profile(self):
+        """Test that the sync profile runs many single-threaded workers."""
+        settings, options = self.settings(GUNICORN_PROFILE="sync")
+        self.assertEqual(settings["worker_class"], "sync")
+        self.assertEqual(settings["workers"], 2 * CPUS + 1)
+        self.assertEqual(settings["threads"], 1)
+        self.assertEqual(
+            options,
+            {"pool_size": 1 + JOB_WORKERS + BACKGROUND_CONNECTIONS, "max_overflow": 0},
+        )
+
+    def test_gthread_profile(self):
+        """Test that the default profile gets a connection per request thread."""
+        settings, options = self.settings()
+        self.assertEqual(settings["name"], "gthread")
+        self.assertEqual(settings["workers"], CPUS + 1)
+        self.assertEqual(settings["threads"], 4)
+        self.assertEqual(options["pool_size"], 4 + JOB_WORKERS + BACKGROUND_CONNECTIONS)
+
+        settings, options = self.settings(GUNICORN_THREADS="8", JOB_WORKERS="0")
+        self.assertEqual(settings["threads"], 8)
+        self.assertEqual(options["pool_size"], 8 + BACKGROUND_CONNECTIONS)
+
+    def test_gevent_profile(self):
+        """Test that gevent greenlets share a pool sized by DB_POOL_SIZE."""
+        settings, options = self.settings(GUNICORN_PROFILE="gevent")
+        self.assertEqual(settings["worker_class"], "gevent")
+        self.assertEqual(settings["workers"], CPUS)
+        self.assertEqual(settings["worker_connections"], 1000)
+        self.assertEqual(
+            options["pool_size"],
+            DEFAULT_GEVENT_POOL_SIZE + JOB_WORKERS + BACKGROUND_CONNECTIONS,
+        )
+
+        # GUNICORN_THREADS only applies to gthread
+        settings, options = self.settings(
+            GUNICORN_PROFILE="gevent", GUNICORN_THREADS="8", DB_POOL_SIZE="20"
+        )
+        self.assertEqual(settings["threads"], 1)
+        self.assertEqual(
+            options["pool_size"], 20 + JOB_WORKERS + BACKGROUND_CONNECTIONS
+        )
+
+    def test_max_connections_split(self):
+        """Test that the pools of all workers never exceed DB_MAX_CONNECTIONS."""
+        for name in concurrency.PROFILES:
+            for max_connections in (100, 20, 7):
+                settings, options = self.settings(
+                    GUNICORN_PROFILE=name, DB_MAX_CONNECTIONS=str(max_connections)
+                )
+                self.assertLessEqual(
+                    settings["workers"] * options["pool_size"], max_connections
+                )
+                self.assertGreaterEqual(options["pool_size"], 1)
+
+        # Below it, the pool is only sized by the profile
+        _, options = self.settings(DB_MAX_CONNECTIONS="100")
+        self.assertEqual(options["pool_size"], 4 + JOB_WORKERS + BACKGROUND_CONNECTIONS)
+        # Every worker keeps a connection, even past the cap
+        _, options = self.settings(DB_MAX_CONNECTIONS="2")
+        self.assertEqual(options["pool_size"], 1)
+
+    def test_unknown_profile(self):
+        """Test that a misspelled profile is refused."""
+        with self.assertRaises(ValueError):
+            self.settings(GUNICORN_PROFILE="threads")
+
+    def test_max_event_streams(self):
+        """Test that threaded profiles keep threads free of event streams."""
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertEqual(max_event_streams(), 2)
+        with mock.patch.dict(os.environ, {"GUNICORN_PROFILE": "sync"}, clear=True):
+            self.assertEqual(max_event_streams(), 0)
+        with mock.patch.dict(os.environ, {"GUNICORN_PROFILE": "gevent"}, clear=True):
+            self.assertIsNone(max_event_streams())
+        with mock.patch.dict(os.environ, {"EVENTS_MAX_STREAMS": "10"}, clear=True):
+            self.assertEqual(max_event_streams(), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
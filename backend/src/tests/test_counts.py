@@ -0,0 +1,73 @@
+"""
+Row Count Test Module
+
+This module contains the tests of the cache of the count estimates, with the
+planner of PostgreSQL stubbed out.
+"""
+
+import unittest
+from unittest import mock
+
+from sqlalchemy import select
+
+from src.api.api import create_app
+from src.database import counts
+from src.database.counts import COUNT_EXACT_BELOW, estimate_count
+from src.database.models import Article
+from src.settings import getenv
+
+DATABASE_URL = getenv("TEST_DATABASE_URL", "sqlite://")
+
+
+class EstimateCacheTestCase(unittest.TestCase):
+    """This class represents the count estimate cache test case"""
+
+    def setUp(self):
+        self.app = create_app({"SQLALCHEMY_DATABASE_URI": DATABASE_URL})
+        self.context = self.app.app_context()
+        self.context.push()
+        self.planner_rows = mock.patch.object(
+            counts, "_planner_rows", return_value=COUNT_EXACT_BELOW
+        )
+        # Every database plans like PostgreSQL here
+        self.dialect = mock.patch.object(
+            counts.db.session.get_bind().dialect, "name", "postgresql"
+        )
+        self.planner_rows.start()
+        self.dialect.start()
+        self.estimates = mock.patch.dict(counts._estimates, clear=True)
+        self.estimates.start()
+
+    def tearDown(self):
+        self.estimates.stop()
+        self.dialect.stop()
+        self.planner_rows.stop()
+        self.context.pop()
+        self.app.extensions["view_counter"].stop()
+
+    def test_cached_estimate(self):
+        """Test that an estimate is computed once per key until it expires."""
+        statement = select(Article.id)
+        self.assertEqual(estimate_count(statement, "articles"), COUNT_EXACT_BELOW)
+        self.assertEqual(estimate_count(statement, "articles"), COUNT_EXACT_BELOW)
+        self.assertEqual(counts._planner_rows.call_count, 1)
+
+    def test_cache_size(self):
+        """Test that the cache keeps the most recent estimates only."""
+        statement = select(Article.id)
+        with mock.patch.object(counts, "COUNT_ESTIMATE_CACHE_SIZE", 3):
+            for tag in range(5):
+                estimate_count(statement, f"articles:all:{tag}")
+            self.assertEqual(
+                [key for _, key in counts._estimates],
+                ["articles:all:2", "articles:all:3", "articles:all:4"],
+            )
+
+            # Expired entries go first, whatever the size
+            with mock.patch.object(counts.time, "monotonic", return_value=1e12):
+                estimate_count(statement, "articles")
+            self.assertEqual([key for _, key in counts._estimates], ["articles"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+"""
+Delta Codec Test Module
+
+This module contains unit tests for the compressed deltas used by the article
+revision history. They run without a database.
+"""
+
+import unittest
+
+from src.database.delta import apply_delta, compress, decompress, make_delta
+
+
+class DeltaTestCase(unittest.TestCase):
+    """This class represents the delta codec test case"""
+
+    def test_compress_round_trip(self):
+        """Test that a compressed text is restored unchanged."""
+        text = "# Title\n\nSome content with accents: é, ü.\n"
+        self.assertEqual(decompress(compress(text)), text)
+
+    def test_delta_round_trip(self):
+        """Test that applying a delta rebuilds the new version."""
+        old = "".join(f"line {number}\n" for number in range(100))
+        new = old.replace("line 10\n", "line ten\n") + "appended\n"
+        self.assertEqual(apply_delta(old, make_delta(old, new)), new)
+
+    def test_delta_edge_cases(self):
+        """Test deltas from and to empty texts and texts without final newline."""
+        texts = ["", "a", "a\n", "a\nb", "\n\n", "a\r\nb\r\n"]
+        for old in texts:
+            for new in texts:
+                self.assertEqual(apply_delta(old, make_delta(old, new)), new)
+
+    def test_delta_is_smaller_than_copy(self):
+        """Test that a small edit of a long text yields a small delta."""
+        old = "".join(f"paragraph {number} " * 10 + "\n" for number in range(500))
+        new = old.replace("paragraph 250 ", "paragraph two hundred fifty ", 1)
+        self.assertLess(len(make_delta(old, new)), len(compress(new)) / 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
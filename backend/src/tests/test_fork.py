@@ -0,0 +1,69 @@
+"""
+Fork Safety Test Module
+
+This module contains the test of the hook that drops the pooled database
+connections a worker inherits from a preloading master (`gunicorn --preload`).
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from flask import Flask
+from sqlalchemy import text
+
+from src.database.models import db, setup_db
+
+
+class ForkSafetyTestCase(unittest.TestCase):
+    """This class represents the fork safety test case"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.app = Flask(__name__)
+        setup_db(self.app, f"sqlite:///{self.directory}/fork.db", create_all=False)
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def test_child_drops_inherited_connections(self):
+        """Test that a forked child starts with an empty pool of its own."""
+        with self.app.app_context():
+            engine = db.engine
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+                inherited = connection.connection.dbapi_connection
+            parent_pool = engine.pool
+            self.assertEqual(parent_pool.checkedin(), 1)
+
+            read, write = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                # Child: report through the exit status, never run the test runner
+                status = 1
+                try:
+                    os.close(read)
+                    with engine.connect() as connection:
+                        reused = connection.connection.dbapi_connection is inherited
+                        connection.execute(text("SELECT 1"))
+                    status = 0 if engine.pool is not parent_pool and not reused else 2
+                finally:
+                    os.write(write, bytes([status]))
+                    os._exit(0)
+
+            os.close(write)
+            with os.fdopen(read, "rb") as child:
+                status = child.read()
+            os.waitpid(pid, 0)
+
+            self.assertEqual(status, bytes([0]))
+            # The parent keeps its own connection
+            self.assertIs(engine.pool, parent_pool)
+            self.assertEqual(parent_pool.checkedin(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
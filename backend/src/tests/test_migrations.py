@@ -0,0 +1,138 @@
+"""
+Schema Upgrade Test Module
+
+This module contains the tests of `flask upgrade-db` on a SQLite file holding
+the tables as the first release created them, with a row in each.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import sqlalchemy as sa
+
+from src.api.api import create_app
+from src.database.migrations import ADDED_COLUMNS, ADDED_INDEXES, upgrade_db
+from src.database.models import db
+
+# The tables of the first release, before any column was added
+BASELINE_SCHEMA = [
+    """CREATE TABLE articles (
+        id INTEGER NOT NULL PRIMARY KEY,
+        title VARCHAR(120) NOT NULL,
+        content TEXT NOT NULL,
+        author VARCHAR(80) NOT NULL,
+        created_at DATETIME,
+        updated_at DATETIME
+    )""",
+    """CREATE TABLE collections (
+        id INTEGER NOT NULL PRIMARY KEY,
+        title VARCHAR(120) NOT NULL,
+        description TEXT NOT NULL,
+        created_at DATETIME,
+        updated_at DATETIME
+    )""",
+    """CREATE TABLE articles_collections (
+        article_id INTEGER NOT NULL REFERENCES articles (id),
+        collection_id INTEGER NOT NULL REFERENCES collections (id),
+        PRIMARY KEY (article_id, collection_id)
+    )""",
+    "INSERT INTO articles VALUES (1, 'Legacy', '# Legacy', 'author', NULL, NULL)",
+    "INSERT INTO collections VALUES (1, 'Legacy', 'Description', NULL, NULL)",
+    "INSERT INTO articles_collections VALUES (1, 1)",
+]
+
+
+class UpgradeDbTestCase(unittest.TestCase):
+    """This class represents the schema upgrade test case"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        database_url = f"sqlite:///{self.directory}/legacy.db"
+        engine = sa.create_engine(database_url)
+        with engine.begin() as connection:
+            for statement in BASELINE_SCHEMA:
+                connection.execute(sa.text(statement))
+        engine.dispose()
+
+        self.env = mock.patch.dict(
+            os.environ,
+            {
+                "DATABASE_URL": database_url,
+                "DB_CREATE_ALL": "0",
+                "TENANT_MODE": "single",
+            },
+        )
+        self.env.start()
+        self.app = create_app()
+
+    def tearDown(self):
+        # Started by the first request, they would outlive the database file
+        if "job_pool" in self.app.extensions:
+            self.app.extensions["job_pool"].stop()
+        self.app.extensions["view_counter"].stop()
+        with self.app.app_context():
+            db.engine.dispose()
+        self.env.stop()
+        shutil.rmtree(self.directory)
+
+    def upgrade(self):
+        """Runs `flask upgrade-db` and returns its result."""
+        result = self.app.test_cli_runner().invoke(args=["upgrade-db"])
+        self.assertIsNone(result.exception)
+        return result
+
+    def test_upgrade_db_adds_columns(self):
+        """Test that the columns and indexes added since the first release exist."""
+        self.upgrade()
+        with self.app.app_context():
+            inspector = sa.inspect(db.engine)
+            for table, column in ADDED_COLUMNS:
+                columns = {c["name"] for c in inspector.get_columns(table)}
+                self.assertIn(column, columns)
+            for table, index in ADDED_INDEXES:
+                indexes = {i["name"] for i in inspector.get_indexes(table)}
+                self.assertIn(index, indexes)
+            self.assertIn("change_events", inspector.get_table_names())
+
+            legacy = db.session.execute(
+                sa.text(
+                    "SELECT deleted_at, version, content_hash FROM articles WHERE id = 1"
+                )
+            ).one()
+            # Renderings of legacy rows are computed when they are read
+            self.assertEqual(tuple(legacy), (None, 1, None))
+            # Legacy memberships share a position until a collection is renumbered
+            position = db.session.execute(
+                sa.text("SELECT position FROM articles_collections")
+            ).scalar()
+            self.assertEqual(position, 0)
+
+    def test_upgrade_db_matches_models(self):
+        """Test that the upgraded tables have every column and index of the models."""
+        self.upgrade()
+        with self.app.app_context():
+            inspector = sa.inspect(db.engine)
+            for table in db.metadata.sorted_tables:
+                columns = {c["name"] for c in inspector.get_columns(table.name)}
+                self.assertEqual(columns, set(table.columns.keys()), table.name)
+                indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+                self.assertLessEqual({i.name for i in table.indexes}, indexes)
+
+        res = self.app.test_client().get("/api/articles?sort=popular")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            [article["title"] for article in res.get_json()["articles"]], ["Legacy"]
+        )
+
+    def test_upgrade_db_is_idempotent(self):
+        """Test that a second upgrade finds nothing to create."""
+        self.upgrade()
+        with self.app.app_context():
+            self.assertEqual(upgrade_db(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
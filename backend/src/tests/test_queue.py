@@ -0,0 +1,140 @@
+"""
+Job Queue Test Module
+
+This module contains the tests of claiming and running the jobs of the
+background queue, called directly as the worker threads do.
+"""
+
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+from src.api.api import create_app
+from src.database.models import db, Job
+from src.jobs import queue
+from src.jobs.queue import (
+    JOB_RETRY_BASE_DELAY,
+    JOB_VISIBILITY_TIMEOUT,
+    claim_job,
+    enqueue,
+    run_job,
+    task,
+)
+from src.settings import getenv
+
+DATABASE_URL = getenv("TEST_DATABASE_URL", "sqlite://")
+
+calls = []
+
+
+@task("test_succeed")
+def succeed(**payload):
+    calls.append(payload)
+
+
+@task("test_fail")
+def fail(**payload):
+    raise ValueError("boom")
+
+
+class JobQueueTestCase(unittest.TestCase):
+    """This class represents the job queue test case"""
+
+    def setUp(self):
+        self.app = create_app({"SQLALCHEMY_DATABASE_URI": DATABASE_URL})
+        self.context = self.app.app_context()
+        self.context.push()
+        # Jobs enqueued by the demo data are not part of these tests
+        Job.query.delete()
+        db.session.commit()
+        calls.clear()
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+        self.app.extensions["view_counter"].stop()
+
+    def test_run_job_deletes_succeeded_job(self):
+        """Test that a successful job runs with its payload and is deleted."""
+        job_id = enqueue("test_succeed", value=1)
+
+        job = claim_job()
+        self.assertEqual(job.id, job_id)
+        self.assertTrue(run_job(job))
+        self.assertEqual(calls, [{"value": 1}])
+        self.assertIsNone(db.session.get(Job, job_id))
+
+    def test_run_job_retries_then_fails(self):
+        """Test that a failing job is retried with a backoff, then marked failed."""
+        job_id = enqueue("test_fail", max_attempts=2)
+
+        self.assertFalse(run_job(claim_job()))
+        job = db.session.get(Job, job_id)
+        self.assertEqual(job.status, "queued")
+        self.assertEqual(job.attempts, 1)
+        self.assertIn("boom", job.last_error)
+        backoff = job.run_at - queue._utcnow()
+        self.assertGreater(backoff, timedelta(seconds=JOB_RETRY_BASE_DELAY - 1))
+        self.assertLessEqual(backoff, timedelta(seconds=JOB_RETRY_BASE_DELAY))
+        # Not ready before the backoff is over
+        self.assertIsNone(claim_job())
+
+        job.run_at = queue._utcnow()
+        db.session.commit()
+        self.assertFalse(run_job(claim_job()))
+        job = db.session.get(Job, job_id)
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNone(claim_job())
+
+    def test_claim_job_after_visibility_timeout(self):
+        """Test that a job left running past the visibility timeout is claimed again."""
+        job_id = enqueue("test_succeed")
+        self.assertEqual(claim_job().id, job_id)
+        self.assertIsNone(claim_job())
+
+        job = db.session.get(Job, job_id)
+        job.locked_at = queue._utcnow() - timedelta(seconds=JOB_VISIBILITY_TIMEOUT + 1)
+        db.session.commit()
+        job = claim_job()
+        self.assertEqual(job.id, job_id)
+        self.assertEqual(db.session.get(Job, job_id).attempts, 2)
+
+    def test_abandoned_job_fails_after_max_attempts(self):
+        """Test that a job outliving the visibility timeout on its last attempt fails."""
+        job_id = enqueue("test_succeed", max_attempts=1)
+        self.assertEqual(claim_job().id, job_id)
+
+        job = db.session.get(Job, job_id)
+        job.locked_at = queue._utcnow() - timedelta(seconds=JOB_VISIBILITY_TIMEOUT + 1)
+        db.session.commit()
+        self.assertIsNone(claim_job())
+        db.session.expire_all()
+        job = db.session.get(Job, job_id)
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.attempts, 1)
+        self.assertIn("last attempt", job.last_error)
+
+    def test_claim_job_claimed_by_another_worker(self):
+        """Test that a job claimed between the read and the update is not claimed twice."""
+        job_id = enqueue("test_succeed")
+        claim = queue.update
+
+        def claimed_first(*args):
+            # Another worker, with a session of its own, flips the row after
+            # this one read it
+            db.session.execute(
+                claim(Job)
+                .where(Job.id == job_id)
+                .values(status="running", attempts=Job.attempts + 1)
+                .execution_options(synchronize_session=False)
+            )
+            return claim(*args)
+
+        with mock.patch.object(queue, "update", claimed_first):
+            self.assertIsNone(claim_job())
+        self.assertEqual(db.session.get(Job, job_id).attempts, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+"""
+Content Rendering Test Module
+
+This module contains unit tests for the server-side rendering of article
+contents. They run without a database.
+"""
+
+import unittest
+
+from src.database.render import EXCERPT_LENGTH, content_hash, render_content
+
+
+class RenderTestCase(unittest.TestCase):
+    """This class represents the content rendering test case"""
+
+    def test_render_markdown(self):
+        """Test that Markdown is rendered to HTML."""
+        rendering = render_content("# Title\n\nSome *text*.")
+        self.assertEqual(rendering["html"], "<h1>Title</h1>\n<p>Some <em>text</em>.</p>")
+        self.assertEqual(rendering["excerpt"], "Title Some text.")
+
+    def test_render_sanitizes_html(self):
+        """Test that scripts and dangerous links are removed."""
+        rendering = render_content(
+            'Hi <script>alert(1)</script><img src=x onerror="alert(1)"> '
+            "[link](javascript:alert(1))"
+        )
+        self.assertNotIn("script", rendering["html"])
+        self.assertNotIn("onerror", rendering["html"])
+        self.assertNotIn("javascript", rendering["html"])
+
+    def test_excerpt_and_reading_time(self):
+        """Test the excerpt of a long content and its reading time."""
+        rendering = render_content("word " * 1000)
+        self.assertLessEqual(len(rendering["excerpt"]), EXCERPT_LENGTH + 1)
+        self.assertTrue(rendering["excerpt"].endswith("word…"))
+        self.assertEqual(rendering["reading_time"], 5)
+
+    def test_content_hash(self):
+        """Test that the cache key only depends on the content."""
+        self.assertEqual(content_hash("a"), content_hash("a"))
+        self.assertNotEqual(content_hash("a"), content_hash("b"))
+
+
+if __name__ == "__main__":
+    unittest.main()
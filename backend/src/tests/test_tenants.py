@@ -0,0 +1,166 @@
+"""
+Multi-tenant Test Module
+
+This module contains the tests of the routing of sessions to the blog being
+served. The routing tests run in `database` mode on SQLite files, one per
+blog, in a temporary directory.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine, select
+
+from src.api.api import create_app
+from src.database import counts, models
+from src.database.models import db, Article, Job, create_tenant
+from src.database.tenants import (
+    EngineLRU,
+    NoTenantSelected,
+    dispose_tenant_engines,
+    tenant_context,
+    tenant_from_host,
+)
+
+
+class EngineLRUTestCase(unittest.TestCase):
+    """This class represents the engine cache test case"""
+
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently used engine is disposed first."""
+        engines = EngineLRU(2)
+        created = {}
+
+        def factory(name):
+            created[name] = create_engine("sqlite://")
+            return created[name]
+
+        engines.get("a", factory)
+        engines.get("b", factory)
+        engines.get("a", factory)
+        with mock.patch.object(created["b"], "dispose") as dispose:
+            engines.get("c", factory)
+            dispose.assert_called_once()
+        self.assertEqual(len(engines), 2)
+        self.assertIs(engines.get("a", factory), created["a"])
+
+
+class TenantFromHostTestCase(unittest.TestCase):
+    """This class represents the host resolution test case"""
+
+    def test_tenant_from_host(self):
+        """Test that the first label of the host names the tenant."""
+        with mock.patch.dict(os.environ, {"TENANT_HOST_SUFFIX": ".blogs.test"}):
+            self.assertEqual(tenant_from_host("my-blog.blogs.test:8080"), "my_blog")
+            self.assertIsNone(tenant_from_host("a.b.blogs.test"))
+            self.assertIsNone(tenant_from_host("blogs.test"))
+            self.assertIsNone(tenant_from_host("other.example.com"))
+            self.assertIsNone(tenant_from_host("1blog.blogs.test"))
+
+
+class PlannerRowsTestCase(unittest.TestCase):
+    """This class represents the count estimate test case"""
+
+    def test_planner_rows_of_schema(self):
+        """Test that the estimate explains the tables in the schema of the blog."""
+        engine = create_engine("sqlite://").execution_options(
+            schema_translate_map={None: "blog_alpha"}
+        )
+        plan = [{"Plan": {"Plan Rows": 42}}]
+        with mock.patch.object(
+            db.session, "get_bind", return_value=engine
+        ), mock.patch.object(db.session, "execute") as execute:
+            execute.return_value.scalar.return_value = plan
+            rows = counts._planner_rows(select(Article.id))
+
+        self.assertEqual(rows, 42)
+        sql = str(execute.call_args[0][0])
+        self.assertIn("FROM blog_alpha.articles", sql)
+
+
+class TenantRoutingTestCase(unittest.TestCase):
+    """This class represents the database routing test case"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.env = mock.patch.dict(
+            os.environ,
+            {
+                "TENANT_MODE": "database",
+                "TENANT_HOST_SUFFIX": ".blogs.test",
+                "TENANT_DATABASE_URL": f"sqlite:///{self.directory}/{{tenant}}.db",
+            },
+        )
+        self.env.start()
+        self.app = create_app(
+            {"SQLALCHEMY_DATABASE_URI": f"sqlite:///{self.directory}/app.db"}
+        )
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            create_tenant("alpha")
+            create_tenant("beta")
+            for name in ("alpha", "beta"):
+                with tenant_context(name):
+                    Article(
+                        title=f"Article of {name}", content="Content", author=name
+                    ).insert()
+            db.session.remove()
+
+    def tearDown(self):
+        dispose_tenant_engines()
+        self.env.stop()
+        shutil.rmtree(self.directory)
+
+    def test_get_articles_of_host(self):
+        """Test that a blog only lists its own articles."""
+        for name in ("alpha", "beta"):
+            res = self.client.get("/api/articles", headers={"Host": f"{name}.blogs.test"})
+            data = res.get_json()
+
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(
+                [article["title"] for article in data["articles"]],
+                [f"Article of {name}"],
+            )
+
+    def test_get_articles_unknown_host(self):
+        """Test that an unknown blog is not found."""
+        res = self.client.get("/api/articles", headers={"Host": "gamma.blogs.test"})
+
+        self.assertEqual(res.status_code, 404)
+        self.assertFalse(res.get_json()["success"])
+
+    def test_unknown_host_cached_briefly(self):
+        """Test that a blog created after a miss is found without waiting long."""
+        res = self.client.get("/api/articles", headers={"Host": "gamma.blogs.test"})
+        self.assertEqual(res.status_code, 404)
+        expires, exists = models._known_tenants["gamma"]
+        self.assertFalse(exists)
+        self.assertLessEqual(expires, time.monotonic() + models.TENANT_MISS_CACHE_TTL)
+
+        with self.app.app_context():
+            create_tenant("gamma")
+        res = self.client.get("/api/articles", headers={"Host": "gamma.blogs.test"})
+        self.assertEqual(res.status_code, 200)
+
+    def test_get_articles_without_tenant(self):
+        """Test that a public request selecting no blog is not found."""
+        res = self.client.get("/api/articles", headers={"Host": "localhost"})
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(res.get_json()["message"], "No blog selected")
+
+    def test_shared_tables_without_tenant(self):
+        """Test that shared tables are reachable without a tenant, others not."""
+        with self.app.app_context():
+            self.assertEqual(Job.query.count(), 0)
+            with self.assertRaises(NoTenantSelected):
+                Article.query.count()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import { reactive } from 'vue';
+import axios from 'axios';
+
+// Listings shared by every component, fetched once and then kept up to date
+// by the `/api/events` stream instead of being re-fetched on each mount.
+// `lastSeq` is the change feed cursor the fetched listing is up to date with.
+const listings = {
+    articles: reactive({ items: [], isLoaded: false, lastSeq: 0 }),
+    collections: reactive({ items: [], isLoaded: false, lastSeq: 0 }),
+};
+
+const entityListing = {
+    article: 'articles',
+    collection: 'collections',
+};
+
+let eventSource = null;
+// Sequence number of the last change streamed, to resume a refused stream from
+let streamSeq = 0;
+// A worker without a free stream answers 503, which browsers do not retry
+const REFUSED_RETRY_MS = 30000;
+const inFlight = {};
+// Changes received while a listing is still being fetched, replayed afterwards
+const pending = { articles: [], collections: [] };
+
+// Payloads only hold the fields a write knows about (no `views`, no `tags`
+// when they did not change), so they are merged into the listed item
+const merge = (item, payload) => {
+    const merged = { ...item, ...payload };
+    if (payload.article_ids) {
+        merged.article_count = payload.article_ids.length;
+    }
+    return merged;
+};
+
+const applyChange = (change) => {
+    const name = entityListing[change.entity];
+    const listing = listings[name];
+    if (!listing.isLoaded) {
+        // Listings that were never fetched will be up to date when they are
+        if (inFlight[name]) {
+            pending[name].push(change);
+        }
+        return;
+    }
+    if (change.seq <= listing.lastSeq) {
+        // Already part of the fetched listing
+        return;
+    }
+
+    const index = listing.items.findIndex((item) => item.id === change.entity_id);
+    if (change.op === 'deleted') {
+        if (index !== -1) {
+            listing.items.splice(index, 1);
+        }
+    } else if (index === -1) {
+        listing.items.push(merge({}, change.payload));
+    } else {
+        listing.items[index] = merge(listing.items[index], change.payload);
+    }
+};
+
+const connect = (since) => {
+    if (eventSource !== null || typeof EventSource === 'undefined') {
+        return;
+    }
+    // Streams from the cursor of the fetched listings, so the changes committed
+    // before the subscription are replayed instead of lost. The browser
+    // reconnects on its own and resumes with Last-Event-ID.
+    eventSource = new EventSource(
+        `${import.meta.env.VITE_API_ENDPOINT}/api/events?since=${since}`
+    );
+    streamSeq = since;
+    const receive = (event) => {
+        const change = JSON.parse(event.data);
+        streamSeq = change.seq;
+        applyChange(change);
+    };
+    eventSource.addEventListener('patch', receive);
+    eventSource.addEventListener('invalidate', receive);
+    eventSource.addEventListener('error', () => {
+        if (eventSource.readyState === EventSource.CLOSED) {
+            eventSource = null;
+            setTimeout(() => connect(streamSeq), REFUSED_RETRY_MS);
+        }
+    });
+};
+
+const load = async (name) => {
+    const listing = listings[name];
+    try {
+        const response = await axios.get(`${import.meta.env.VITE_API_ENDPOINT}/api/${name}`);
+        listing.items = response.data[name];
+        listing.lastSeq = response.data.last_seq;
+        listing.isLoaded = true;
+        pending[name].splice(0).forEach(applyChange);
+        if (Object.keys(inFlight).every((other) => other === name)) {
+            // Listings fetched together may answer out of order: start from
+            // the oldest cursor, applyChange skips what a listing already has
+            const loaded = Object.values(listings).filter((other) => other.isLoaded);
+            connect(Math.min(...loaded.map((other) => other.lastSeq)));
+        }
+    } finally {
+        delete inFlight[name];
+    }
+};
+
+export const useListing = async (name) => {
+    const listing = listings[name];
+
+    if (!listing.isLoaded) {
+        inFlight[name] = inFlight[name] || load(name);
+        await inFlight[name];
+    }
+    return listing;
+};